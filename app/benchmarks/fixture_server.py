@@ -0,0 +1,74 @@
+import hashlib
+import http.server
+import threading
+from typing import Callable
+
+from benchmarks.fixtures import fanatical_payload, humble_bundle_page, humble_choice_page, steamdb_page
+
+ROUTES: dict[str, tuple[str, Callable[[], str]]] = {
+    "/bundles": ("text/html; charset=utf-8", humble_bundle_page),
+    "/membership/": ("text/html; charset=utf-8", humble_choice_page),
+    "/api/all/": ("application/json", fanatical_payload),
+    "/upcoming/free/": ("text/html; charset=utf-8", steamdb_page),
+}
+
+
+class FixtureRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    bodies: dict[str, tuple[str, bytes]] = {}
+
+    def do_GET(self):
+        for prefix, (content_type, body) in self.bodies.items():
+            if self.path.startswith(prefix):
+                # Validated like the real stores, a client that sends the current ETag gets an empty 304
+                etag = get_etag(body)
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+class FixtureServer:
+    def __init__(self):
+        FixtureRequestHandler.bodies = {
+            prefix: (content_type, build_body().encode("utf-8"))
+            for prefix, (content_type, build_body) in ROUTES.items()
+        }
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def update(self, prefix: str, body: str):
+        content_type, _ = FixtureRequestHandler.bodies[prefix]
+        FixtureRequestHandler.bodies[prefix] = (content_type, body.encode("utf-8"))
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self) -> "FixtureServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,139 @@
+import json
+import os
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(__file__), "fixtures")
+
+FILLER = (
+    "<div class='tile'><a href='/store/product'><img src='/img/product.png' alt='Product'>"
+    "<span class='name'>Product name</span><span class='price'>$9.99</span></a></div>\n"
+)
+
+
+def load_fixture(name: str):
+    path = os.path.join(FIXTURES_FOLDER, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fixture_file:
+        return fixture_file.read()
+
+
+def humble_bundle_json(products: int) -> dict:
+    categories = {}
+    for category in ("books", "games", "software"):
+        categories[category] = {
+            "mosaic": [{
+                "products": [
+                    {
+                        "product_url": f"/{category}/bundle-{index}",
+                        "tile_name": f"{category.title()} Bundle {index}",
+                        "end_date|datetime": "2030-01-01T18:00:00",
+                        "short_marketing_blurb": "Pay what you want for a pile of great stuff " * 4,
+                    }
+                    for index in range(products)
+                ],
+            }],
+        }
+    return {"data": categories}
+
+
+def humble_choice_json(games: int) -> dict:
+    return {
+        "contentChoiceOptions": {
+            "contentChoiceData": {
+                "game_data": {
+                    f"game-{index}": {"title": f"Choice Game {index}", "description": "A great game " * 20}
+                    for index in range(games)
+                },
+            },
+        },
+    }
+
+
+def fanatical_json(bundles: int, other_products: int) -> dict:
+    return {
+        "bundles": [{"name": f"Bundle {index}", "slug": f"bundle-{index}"} for index in range(other_products)],
+        "pickandmix": [
+            {
+                "name": f"Pick and Mix {index}",
+                "slug": f"pick-and-mix-{index}",
+                "valid_until": "2030-01-01T18:00:00.000Z",
+                "products": [{"name": f"Game {product}"} for product in range(10)],
+            }
+            for index in range(bundles)
+        ],
+        "games": [{"name": f"Game {index}", "slug": f"game-{index}"} for index in range(other_products)],
+    }
+
+
+def steamdb_promotions(promotions: int) -> list[dict]:
+    return [
+        {
+            "appid": 1000 + index,
+            "name": f"Free Game {index}",
+            # Every fourth one is a free weekend, which the scraper skips
+            "type": "Weekend" if index % 4 == 3 else "Keep",
+            "start": "2030-01-01T17:00:00+00:00",
+            "end": "2030-01-08T17:00:00+00:00",
+        }
+        for index in range(promotions)
+    ]
+
+
+def steamdb_row(promotion: dict) -> str:
+    return (
+        f"<tr class=\"app\" data-appid=\"{promotion['appid']}\">"
+        f"<td><img src=\"/img/{promotion['appid']}.jpg\"></td>"
+        f"<td><a href=\"/app/{promotion['appid']}/\"><b>{promotion['name']}</b></a></td>"
+        f"<td>{promotion['type']}</td>"
+        f"<td data-time=\"{promotion['start']}\">Started</td>"
+        f"<td data-time=\"{promotion['end']}\">Ends</td>"
+        "</tr>"
+    )
+
+
+def steamdb_rendered_page(promotions: int = 20) -> str:
+    # What the browser hands back once the scripts of steamdb_page have run
+    rows = "".join(steamdb_row(promotion) for promotion in steamdb_promotions(promotions))
+    return f"<!DOCTYPE html><html><head><title>Fixture</title></head><body><table>{rows}</table></body></html>"
+
+
+def steamdb_page(promotions: int = 20) -> str:
+    # Rows only exist after a script runs, with the images, fonts and stylesheets the browser pool blocks
+    rows = json.dumps([steamdb_row(promotion) for promotion in steamdb_promotions(promotions)])
+    return (
+        "<!DOCTYPE html><html><head><title>Fixture</title>"
+        "<link rel=\"stylesheet\" href=\"/static/steamdb.css\">"
+        "<link rel=\"preload\" href=\"/static/font.woff2\" as=\"font\" crossorigin></head>"
+        "<body><img src=\"/static/logo.png\"><table id=\"promotions\"></table>"
+        "<script>document.addEventListener('DOMContentLoaded', () => setTimeout(() => {"
+        f"document.getElementById('promotions').innerHTML = {rows}.join('');"
+        "}, 50));</script></body></html>"
+    )
+
+
+def html_page(script_id: str, payload: dict, filler_tiles: int) -> str:
+    filler = FILLER * (filler_tiles // 2)
+    return (
+        "<!DOCTYPE html><html><head><title>Fixture</title>"
+        "<script>window.models = {};</script></head><body>"
+        f"{filler}"
+        f"<script id=\"{script_id}\" type=\"application/json\">{json.dumps(payload)}</script>"
+        f"{filler}"
+        "</body></html>"
+    )
+
+
+def humble_bundle_page(products: int = 50, filler_tiles: int = 5000) -> str:
+    return load_fixture("humble_bundle.html") or html_page(
+        "landingPage-json-data", humble_bundle_json(products), filler_tiles
+    )
+
+
+def humble_choice_page(games: int = 20, filler_tiles: int = 5000) -> str:
+    return load_fixture("humble_choice.html") or html_page(
+        "webpack-monthly-product-data", humble_choice_json(games), filler_tiles
+    )
+
+
+def fanatical_payload(bundles: int = 30, other_products: int = 5000) -> str:
+    return load_fixture("fanatical.json") or json.dumps(fanatical_json(bundles, other_products))
@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.fixtures import humble_bundle_page, humble_choice_page
+from parsing.script_extractor import extract_script_text, parse_script_text
+
+PAGES = {
+    "humble_bundle": ("landingPage-json-data", humble_bundle_page),
+    "humble_choice": ("webpack-monthly-product-data", humble_choice_page),
+}
+
+
+def extract_with_beautifulsoup(html: str, script_id: str) -> str:
+    import bs4
+
+    return bs4.BeautifulSoup(html, "html.parser").find("script", id=script_id).text
+
+
+EXTRACTORS = {
+    "beautifulsoup": extract_with_beautifulsoup,
+    "html_parser": parse_script_text,
+    "scan": extract_script_text,
+}
+
+
+def measure(extractor, html: str, script_id: str, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extractor(html, script_id)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extractor(html, script_id)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"best_seconds": min(timings), "mean_seconds": sum(timings) / len(timings), "peak_bytes": peak_memory}
+
+
+def run(repeat: int) -> list[dict]:
+    results = []
+    for page_name, (script_id, build_page) in PAGES.items():
+        html = build_page()
+        expected = json.loads(extract_with_beautifulsoup(html, script_id))
+        for extractor_name, extractor in EXTRACTORS.items():
+            assert json.loads(extractor(html, script_id)) == expected, f"{extractor_name} extracted different data"
+            result = measure(extractor, html, script_id, repeat)
+            results.append({"page": page_name, "page_bytes": len(html), "extractor": extractor_name, **result})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare script tag extraction strategies on fixture pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per extractor")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    benchmark_results = run(args.repeat)
+    if args.json:
+        print(json.dumps(benchmark_results, indent=2))
+    else:
+        for benchmark_result in benchmark_results:
+            print(
+                f"{benchmark_result['page']:<15} {benchmark_result['extractor']:<15} "
+                f"{benchmark_result['best_seconds'] * 1000:>10.2f} ms "
+                f"{benchmark_result['peak_bytes'] / 1024 / 1024:>10.2f} MiB"
+            )
@@ -0,0 +1,111 @@
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from items.item_batch import ItemBatch
+from items.scraped_item import ScrapedItem, compute_content_hash
+from scrapers.humble_bundle_scraper import HumbleBundleScraper
+
+DEFAULT_ITEMS = 1_000_000
+
+
+@dataclass
+class DictScrapedItem:
+    # The representation items had before they were slotted, kept here as the baseline
+    scraper: type
+    name: str
+    url: str
+    price: float = None
+    expiration_date: str = None
+
+    @property
+    def content_hash(self) -> str:
+        return compute_content_hash(self.name, self.scraper.__name__, self.url, self.price, self.expiration_date)
+
+
+def synthetic_fields(count: int):
+    for index in range(count):
+        # A new string per item like a parsed page gives, shared by many items once interned
+        expiration_date = "2030-01-%02dT18:00:00" % (index % 28 + 1)
+        yield f"Bundle {index}", f"https://www.humblebundle.com/games/bundle-{index}", expiration_date
+
+
+def build_dict_items(count: int) -> list:
+    return [
+        DictScrapedItem(scraper=HumbleBundleScraper, name=name, url=url, expiration_date=expiration_date)
+        for name, url, expiration_date in synthetic_fields(count)
+    ]
+
+
+def build_slotted_items(count: int) -> list:
+    return [
+        ScrapedItem(scraper=HumbleBundleScraper, name=name, url=url, expiration_date=expiration_date)
+        for name, url, expiration_date in synthetic_fields(count)
+    ]
+
+
+def build_batch(count: int) -> ItemBatch:
+    return ItemBatch.from_items(
+        ScrapedItem(scraper=HumbleBundleScraper, name=name, url=url, expiration_date=expiration_date)
+        for name, url, expiration_date in synthetic_fields(count)
+    )
+
+
+def measure(name: str, build: Callable[[int], object], count: int) -> dict:
+    gc.collect()
+    start = time.perf_counter()
+    built = build(count)
+    build_seconds = time.perf_counter() - start
+
+    # Dedup, storage and the notifiers each read the key of every item
+    items = built.content_hashes if isinstance(built, ItemBatch) else built
+    start = time.perf_counter()
+    for _ in range(3):
+        if isinstance(built, ItemBatch):
+            set(items)
+        else:
+            {item.content_hash for item in items}
+    dedup_key_seconds = time.perf_counter() - start
+    del built, items
+
+    gc.collect()
+    tracemalloc.start()
+    built = build(count)
+    current, peak = tracemalloc.get_traced_memory()
+    # Keys are derived on first use, a run reads every one of them in dedup
+    if not isinstance(built, ItemBatch):
+        for item in built:
+            item.content_hash
+    keyed, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+
+    return {
+        "representation": name,
+        "items": count,
+        "bytes_per_item": round(current / count, 1),
+        "keyed_bytes_per_item": round(keyed / count, 1),
+        "peak_megabytes": round(peak / 1024 / 1024, 1),
+        "build_seconds": round(build_seconds, 3),
+        "dedup_key_seconds": round(dedup_key_seconds, 3),
+    }
+
+
+def run(count: int) -> list[dict]:
+    return [
+        measure("dataclass", build_dict_items, count),
+        measure("slotted", build_slotted_items, count),
+        measure("columnar", build_batch, count),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory and key access cost of item representations")
+    parser.add_argument("--items", type=int, default=DEFAULT_ITEMS, help="Items built per representation")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.items), indent=2))
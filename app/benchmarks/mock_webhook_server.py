@@ -0,0 +1,124 @@
+import argparse
+import http.server
+import json
+import os
+import threading
+import time
+
+from benchmarks.scrape_pipeline import synthetic_items
+from notifications.discord_notifier import DiscordNotifier
+from scrapers.humble_bundle_scraper import HumbleBundleScraper
+
+
+class MockWebhookHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockWebhookHTTPServer"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, headers, response = self.server.handle_webhook(self.path.split("?")[0], json.loads(body))
+
+        content = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockWebhookHTTPServer(http.server.ThreadingHTTPServer):
+    # Mimics a Discord webhook route: a bucket of `limit` messages per `reset_after` seconds,
+    # 429 with retry_after once it is exhausted, and the same embed limits Discord validates
+    def __init__(self, limit: int, reset_after: float):
+        super().__init__(("127.0.0.1", 0), MockWebhookHandler)
+        self.limit = limit
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.buckets: dict[str, tuple[int, float]] = {}
+        self.messages: dict[str, list[dict]] = {}
+        self.rate_limited = 0
+
+    def handle_webhook(self, route: str, payload: dict) -> tuple[int, dict[str, str], dict]:
+        with self.lock:
+            now = time.monotonic()
+            remaining, reset_at = self.buckets.get(route, (self.limit, now + self.reset_after))
+            if now >= reset_at:
+                remaining, reset_at = self.limit, now + self.reset_after
+
+            if remaining == 0:
+                self.rate_limited += 1
+                retry_after = round(reset_at - now, 3)
+                return 429, {"Retry-After": str(retry_after)}, {"retry_after": retry_after, "global": False}
+
+            embeds = payload.get("embeds", [])
+            characters = sum(
+                len(embed.get("title", "")) + len(embed.get("description", "")) + len(embed["footer"]["text"])
+                for embed in embeds
+            )
+            if len(embeds) > 10 or characters > 6000 or len(payload.get("content", "")) > 2000:
+                return 400, {}, {"message": "Invalid Form Body"}
+
+            remaining -= 1
+            self.buckets[route] = (remaining, reset_at)
+            self.messages.setdefault(route, []).append(payload)
+            headers = {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset-After": f"{reset_at - now:.3f}",
+                "X-RateLimit-Bucket": route,
+            }
+            return 200, headers, {"id": str(len(self.messages[route]))}
+
+
+class MockWebhookServer:
+    def __init__(self, limit: int = 5, reset_after: float = 2.0):
+        self.server = MockWebhookHTTPServer(limit, reset_after)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def webhook_url(self, name: str = "webhook") -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/api/webhooks/{name}/token"
+
+    @property
+    def messages(self) -> dict[str, list[dict]]:
+        return self.server.messages
+
+    def __enter__(self) -> "MockWebhookServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(items: int, webhooks: int, limit: int, reset_after: float) -> dict:
+    scraped_data = {HumbleBundleScraper: synthetic_items(0, items)}
+    with MockWebhookServer(limit, reset_after) as server:
+        os.environ["DISCORD_WEBHOOK_URL"] = ",".join(server.webhook_url(f"webhook-{i}") for i in range(webhooks))
+        start = time.perf_counter()
+        delivered = DiscordNotifier().notify(scraped_data)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "items": items,
+            "delivered": len(delivered),
+            "messages": sum(len(messages) for messages in server.messages.values()),
+            "rate_limited": server.server.rate_limited,
+            "seconds": round(elapsed, 3),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a synthetic digest through DiscordNotifier to a mock webhook")
+    parser.add_argument("--items", type=int, default=200, help="Scraped items in the digest")
+    parser.add_argument("--webhooks", type=int, default=2, help="Webhooks the digest is sent to")
+    parser.add_argument("--limit", type=int, default=5, help="Messages per rate limit bucket")
+    parser.add_argument("--reset-after", type=float, default=1.0, help="Seconds until a bucket resets")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.items, args.webhooks, args.limit, args.reset_after), indent=2))
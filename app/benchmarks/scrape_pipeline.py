@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.fixtures import fanatical_payload, humble_bundle_page, humble_choice_page, steamdb_rendered_page
+from items.scraped_item import ScrapedItem, compute_content_hash, to_epoch
+from main import add_items_to_db, filter_new_items
+from network.browser_pool import BrowserPool
+from notifications.email_notifier import EmailNotifier
+from scrapers.base_scraper import BaseScraper
+from scrapers.fanatical_scraper import FanaticalScraper
+from scrapers.humble_bundle_scraper import HumbleBundleScraper
+from scrapers.humble_choice_scraper import HumbleChoiceScraper
+from scrapers.steamdb_scraper import SteamDBScraper
+from sent_filter import SentItemsFilter
+from sqlitedb import SQLiteDB
+
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000]
+BATCH_SIZE = 1_000
+EMAIL_ITEMS = 10_000
+POPULATE_CHUNK_SIZE = 50_000
+NOTIFIERS = ["EmailNotifier"]
+
+
+def point_to_server(scraper: BaseScraper, server_url: str) -> BaseScraper:
+    if isinstance(scraper, HumbleBundleScraper):
+        scraper.BUNDLES_URL = f"{server_url}/bundles"
+    elif isinstance(scraper, HumbleChoiceScraper):
+        scraper.BASE_URL = f"{server_url}/membership"
+    elif isinstance(scraper, FanaticalScraper):
+        scraper.BASE_URL = f"{server_url}/api/all"
+    elif isinstance(scraper, SteamDBScraper):
+        scraper.BASE_URL = f"{server_url}/upcoming/free/"
+    return scraper
+
+
+PARSERS: dict[type[BaseScraper], Callable[[BaseScraper], list]] = {
+    HumbleBundleScraper: lambda scraper: scraper.parse_response(humble_bundle_page()),
+    HumbleChoiceScraper: lambda scraper: scraper.parse_response(humble_choice_page()),
+    FanaticalScraper: lambda scraper: scraper.parse_response(json.loads(fanatical_payload())),
+    SteamDBScraper: lambda scraper: scraper.parse_response(steamdb_rendered_page()),
+}
+
+
+def measure(name: str, function: Callable[[int], object], repeat: int, **labels) -> dict:
+    timings = []
+    for iteration in range(repeat):
+        start = time.perf_counter()
+        function(iteration)
+        timings.append(time.perf_counter() - start)
+    return {
+        "stage": name,
+        **labels,
+        "best_seconds": min(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "repeat": repeat,
+    }
+
+
+def synthetic_row(index: int) -> tuple:
+    name = f"Bundle {index}"
+    scraper = HumbleBundleScraper.__name__
+    url = f"https://www.humblebundle.com/games/bundle-{index}"
+    expiration_date = "2030-01-01T18:00:00"
+    content_hash = compute_content_hash(name, scraper, url, None, expiration_date)
+    return name, scraper, url, None, expiration_date, to_epoch(expiration_date), content_hash
+
+
+def synthetic_items(start: int, count: int) -> list[ScrapedItem]:
+    return [
+        ScrapedItem(scraper=HumbleBundleScraper, name=name, url=url, price=price, expiration_date=expiration_date)
+        for name, _, url, price, expiration_date, _, _ in map(synthetic_row, range(start, start + count))
+    ]
+
+
+def populate_database(rows: int):
+    db = SQLiteDB()
+    query = """
+        INSERT OR IGNORE INTO scraped_items (name, scraper, url, price, expiration_date, expires_at, content_hash, sent)
+        VALUES (?, ?, ?, ?, ?, ?, ?, TRUE);
+    """
+    deliveries_query = "INSERT OR IGNORE INTO item_notifications (content_hash, notifier) VALUES (?, ?);"
+    for start in range(0, rows, POPULATE_CHUNK_SIZE):
+        chunk = [synthetic_row(index) for index in range(start, min(start + POPULATE_CHUNK_SIZE, rows))]
+
+        def write(conn):
+            conn.executemany(query, chunk)
+            conn.executemany(deliveries_query, ((row[-1], notifier) for row in chunk for notifier in NOTIFIERS))
+
+        db.writer.submit(write)
+    db.writer.submit(lambda conn: conn.execute("ANALYZE;"))
+
+
+def benchmark_scrapers(repeat: int) -> list[dict]:
+    results = []
+    with FixtureServer() as server:
+        for scraper_class, parse in PARSERS.items():
+            scraper = point_to_server(scraper_class(), server.url)
+            labels = {"scraper": scraper_class.__name__}
+            # Rendering needs Chrome, benchmark_browser measures it when asked to
+            if not scraper.USES_BROWSER:
+                results.append(measure("scrape", lambda _: scraper.scrape(), repeat, **labels))
+            results.append(measure("parse", lambda _: parse(scraper), repeat, **labels))
+    return results
+
+
+def benchmark_database(rows: int, repeat: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ["DATABASE_PATH"] = os.path.join(folder, "benchmark.sqlite3")
+        populate_database(rows)
+        SentItemsFilter.invalidate()
+
+        # Half of every batch was already sent, the other half is new
+        half = BATCH_SIZE // 2
+        batches = [
+            synthetic_items(rows - half, half) + synthetic_items(rows + iteration * half, half)
+            for iteration in range(repeat)
+        ]
+        labels = {"rows": rows, "items": BATCH_SIZE}
+        # A bloom filter is built once and then read back from disk, which is what every later run pays
+        SentItemsFilter.get(SQLiteDB().conn)
+        SentItemsFilter.save()
+        results.append(measure(
+            "sent_filter_load",
+            lambda _: SentItemsFilter.clear() or SentItemsFilter.get(SQLiteDB().conn),
+            repeat,
+            rows=rows,
+            mode=SentItemsFilter.get_mode(),
+        ))
+        results.append(measure(
+            "filter_new_items",
+            lambda i: filter_new_items(batches[i], NOTIFIERS),
+            repeat,
+            mode=SentItemsFilter.get_mode(),
+            **labels,
+        ))
+        results.append(measure("add_items_to_db", lambda i: add_items_to_db(batches[i][half:]), repeat, **labels))
+        # The next scale uses another database file
+        SQLiteDB.close()
+
+    return results
+
+
+def benchmark_browser(repeat: int) -> list[dict]:
+    # A cold render starts a new browser session, a warm one reuses the session of the previous page
+    with FixtureServer() as server:
+        scraper = point_to_server(SteamDBScraper(), server.url)
+        labels = {"scraper": SteamDBScraper.__name__}
+        results = [
+            measure("render_cold", lambda _: BrowserPool.close() or scraper.scrape(), repeat, **labels),
+            measure("render_warm", lambda _: scraper.scrape(), repeat, **labels),
+        ]
+        BrowserPool.close()
+    return results
+
+
+def benchmark_email_body(repeat: int) -> dict:
+    scraped_data = {HumbleBundleScraper: synthetic_items(0, EMAIL_ITEMS)}
+    return measure(
+        "create_email_body",
+        lambda _: EmailNotifier.create_email_body(scraped_data),
+        repeat,
+        items=EMAIL_ITEMS,
+    )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(scales: list[int], repeat: int, browser: bool = False) -> dict:
+    # Every request has to reach the fixture server, a conditional 304 would skip the parse
+    os.environ["HTTP_CACHE_FOLDER"] = ""
+    # Neither throttle the local server nor keep circuit state in the database under test
+    os.environ["HTTP_HOST_RATE"] = "0"
+    os.environ["HTTP_CIRCUIT_FAILURES"] = "0"
+
+    results = benchmark_scrapers(repeat)
+    if browser:
+        results.extend(benchmark_browser(repeat))
+    for rows in scales:
+        results.extend(benchmark_database(rows, repeat))
+    results.append(benchmark_email_body(repeat))
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return tuple(sorted((key, value) for key, value in result.items() if not key.endswith("_seconds")))
+
+
+def find_regressions(baseline: dict, current: dict, threshold: float) -> list[str]:
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_results.get(result_key(result))
+        if previous and result["best_seconds"] > previous["best_seconds"] * (1 + threshold):
+            regressions.append(
+                f"{result['stage']} {dict(result_key(result))}: "
+                f"{previous['best_seconds']:.4f}s -> {result['best_seconds']:.4f}s"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scrape, dedup, storage and email stages")
+    parser.add_argument("--scales", nargs="*", type=int, default=DEFAULT_SCALES, help="Rows in scraped_items")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--browser", action="store_true", help="Also render the SteamDB fixture in headless Chrome")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Previous JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing")
+    args = parser.parse_args()
+
+    benchmark = run(args.scales, args.repeat, args.browser)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(benchmark, output_file, indent=2)
+    else:
+        print(json.dumps(benchmark, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            found_regressions = find_regressions(json.load(baseline_file), benchmark, args.threshold)
+        for regression in found_regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if found_regressions else 0)
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Every scenario imports main and builds its scrapers and notifiers, which is what a cold run pays before scraping
+DEFAULT_SCENARIOS = [
+    "fanatical:email",
+    "humble_bundle:discord",
+    "humble_bundle,humble_choice,fanatical,steam_db:email,discord",
+]
+STARTUP_SCRIPT = """
+from factories.notifier_factory import NotifierFactory
+from factories.scraper_factory import ScraperFactory
+import main
+for scraper in {scrapers!r}:
+    ScraperFactory.get_scraper(scraper)
+NotifierFactory.get_notifiers({notifiers!r})
+"""
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+APP_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_import_times(output: str) -> dict[str, tuple[int, int]]:
+    # module -> (self µs, cumulative µs) as printed by -X importtime
+    return {
+        match.group(4): (int(match.group(1)), int(match.group(2)))
+        for match in map(IMPORT_TIME_LINE.match, output.splitlines())
+        if match
+    }
+
+
+def measure(scenario: str) -> dict:
+    scrapers, notifiers = (part.split(",") for part in scenario.split(":"))
+    script = STARTUP_SCRIPT.format(scrapers=scrapers, notifiers=notifiers)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=APP_FOLDER,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = parse_import_times(completed.stderr)
+    slowest = sorted(import_times.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    return {
+        "scenario": scenario,
+        "modules": len(import_times),
+        "import_seconds": sum(self_time for self_time, _ in import_times.values()) / 1_000_000,
+        "app_modules": sorted(
+            module for module in import_times
+            if module.split(".")[0] in ("scrapers", "notifications", "parsing")
+        ),
+        "slowest": {module: self_time / 1_000_000 for module, (self_time, _) in slowest},
+    }
+
+
+def run(scenarios: list[str], repeat: int) -> list[dict]:
+    results = []
+    for scenario in scenarios:
+        # The first run warms the bytecode cache, the best of the others is kept
+        measure(scenario)
+        results.append(min((measure(scenario) for _ in range(repeat)), key=lambda result: result["import_seconds"]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the imports a cold start pays with -X importtime")
+    parser.add_argument(
+        "--scenarios",
+        nargs="*",
+        default=DEFAULT_SCENARIOS,
+        help="scrapers:notifiers pairs, comma separated on each side",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    startup = run(args.scenarios, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(startup, output_file, indent=2)
+    else:
+        print(json.dumps(startup, indent=2))
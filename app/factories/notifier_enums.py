@@ -1,6 +1,11 @@
 from enum import Enum
+from typing import Union
 
 
 class NotifierEnum(Enum):
     EMAIL = "email"
     DISCORD = "discord"
+
+
+# Plugins registered through entry points are not enum members and are referred to by name
+NotifierKey = Union[NotifierEnum, str]
@@ -1,15 +1,46 @@
-from factories.notifier_enums import NotifierEnum
-from notifications.base_notifier import BaseNotifier
-from notifications.discord_notifier import DiscordNotifier
-from notifications.email_notifier import EmailNotifier
+import logging
+
+from factories.notifier_enums import NotifierEnum, NotifierKey
+from factories.plugin_registry import PluginRegistry
+from notifications.base_notifier import BaseNotifier, NotifierNotConfiguredError
+
+logger = logging.getLogger(__name__)
+
+# Out of tree notifiers register a BaseNotifier subclass under the "webhunter.notifiers" entry point group
+NOTIFIERS = PluginRegistry(
+    "webhunter.notifiers",
+    {
+        NotifierEnum.EMAIL.value: "notifications.email_notifier:EmailNotifier",
+        NotifierEnum.DISCORD.value: "notifications.discord_notifier:DiscordNotifier",
+    },
+)
 
 
 class NotifierFactory:
     @staticmethod
-    def get_notifier(notifier_type: NotifierEnum) -> BaseNotifier:
-        if notifier_type == NotifierEnum.EMAIL:
-            return EmailNotifier()
-        elif notifier_type == NotifierEnum.DISCORD:
-            return DiscordNotifier()
+    def get_notifier(notifier: NotifierKey) -> BaseNotifier:
+        return NOTIFIERS.resolve(getattr(notifier, "value", notifier))()
+
+    @staticmethod
+    def get_notifiers(notifiers: list[NotifierKey]) -> list[BaseNotifier]:
+        # A notifier that is not configured is reported once here and left out, the others still notify
+        configured = []
+        for notifier in notifiers:
+            try:
+                configured.append(NotifierFactory.get_notifier(notifier))
+            except NotifierNotConfiguredError as e:
+                logger.error(f"Skipping notifier {getattr(notifier, 'value', notifier)}: {e}")
+        return configured
+
+    @staticmethod
+    def get_names() -> list[str]:
+        return NOTIFIERS.names()
 
-        raise ValueError("Unknown site")
+    @staticmethod
+    def parse(name: str) -> NotifierKey:
+        # Built in names never trigger the entry point scan
+        if name in NotifierEnum._value2member_map_:
+            return NotifierEnum(name)
+        if name in NOTIFIERS.names():
+            return name
+        raise ValueError(f"Unknown notifier {name!r}, available: {', '.join(NOTIFIERS.names())}")
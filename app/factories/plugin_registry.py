@@ -0,0 +1,60 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
+
+logger = logging.getLogger(__name__)
+
+
+class PluginRegistry:
+    # Maps names to "module:Class" paths and only imports a module when its class is first requested.
+    # Out of tree plugins are discovered from the entry point group, the metadata scan also only happens on demand
+    def __init__(self, entry_point_group: str, targets: dict[str, str]):
+        self.entry_point_group = entry_point_group
+        self.targets: dict[str, Union[str, type]] = dict(targets)
+        self.entry_points: Optional[dict[str, "EntryPoint"]] = None
+        self.lock = threading.Lock()
+
+    def register(self, name: str, target: Union[str, type]):
+        with self.lock:
+            self.targets[name] = target
+
+    def names(self) -> list[str]:
+        return [*self.targets, *(name for name in self.get_entry_points() if name not in self.targets)]
+
+    def resolve(self, name: str) -> type:
+        with self.lock:
+            target = self.targets.get(name)
+        if target is None:
+            entry_point = self.get_entry_points().get(name)
+            if entry_point is None:
+                raise ValueError(f"Unknown plugin {name!r} in {self.entry_point_group}")
+            target = entry_point.value
+        if isinstance(target, str):
+            target = self.import_target(target)
+            with self.lock:
+                self.targets[name] = target
+        return target
+
+    def get_entry_points(self) -> dict[str, "EntryPoint"]:
+        with self.lock:
+            if self.entry_points is None:
+                # importlib.metadata and the scan of every installed distribution are only paid for plugins
+                from importlib.metadata import entry_points
+
+                self.entry_points = {
+                    entry_point.name: entry_point for entry_point in entry_points(group=self.entry_point_group)
+                }
+                for name in self.entry_points:
+                    logger.debug(f"Found {self.entry_point_group} plugin {name}")
+            return self.entry_points
+
+    @staticmethod
+    def import_target(path: str) -> type:
+        module_name, _, attribute = path.partition(":")
+        if not attribute:
+            module_name, _, attribute = path.rpartition(".")
+        # __import__ rather than importlib.import_module, only the former is reported by -X importtime
+        return getattr(__import__(module_name, fromlist=[attribute]), attribute)
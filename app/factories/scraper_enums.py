@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Union
 
 
 class ScraperEnum(Enum):
@@ -6,3 +7,7 @@ class ScraperEnum(Enum):
     HUMBLE_CHOICE = "humble_choice"
     FANATICAL = "fanatical"
     STEAM_DB = "steam_db"
+
+
+# Plugins registered through entry points are not enum members and are referred to by name
+ScraperKey = Union[ScraperEnum, str]
@@ -1,21 +1,33 @@
-from factories.scraper_enums import ScraperEnum
+from factories.plugin_registry import PluginRegistry
+from factories.scraper_enums import ScraperEnum, ScraperKey
 from scrapers.base_scraper import BaseScraper
-from scrapers.fanatical_scraper import FanaticalScraper
-from scrapers.humble_bundle_scraper import HumbleBundleScraper
-from scrapers.steamdb_scraper import SteamDBScraper
-from scrapers.humble_choice_scraper import HumbleChoiceScraper
+
+# Out of tree scrapers register a BaseScraper subclass under the "webhunter.scrapers" entry point group
+SCRAPERS = PluginRegistry(
+    "webhunter.scrapers",
+    {
+        ScraperEnum.HUMBLE_BUNDLE.value: "scrapers.humble_bundle_scraper:HumbleBundleScraper",
+        ScraperEnum.HUMBLE_CHOICE.value: "scrapers.humble_choice_scraper:HumbleChoiceScraper",
+        ScraperEnum.FANATICAL.value: "scrapers.fanatical_scraper:FanaticalScraper",
+        ScraperEnum.STEAM_DB.value: "scrapers.steamdb_scraper:SteamDBScraper",
+    },
+)
 
 
 class ScraperFactory:
     @staticmethod
-    def get_scraper(scraper_enum: ScraperEnum) -> BaseScraper:
-        if scraper_enum == ScraperEnum.HUMBLE_BUNDLE:
-            return HumbleBundleScraper()
-        elif scraper_enum == ScraperEnum.FANATICAL:
-            return FanaticalScraper()
-        elif scraper_enum == ScraperEnum.STEAM_DB:
-            return SteamDBScraper()
-        elif scraper_enum == ScraperEnum.HUMBLE_CHOICE:
-            return HumbleChoiceScraper()
+    def get_scraper(scraper: ScraperKey) -> BaseScraper:
+        return SCRAPERS.resolve(getattr(scraper, "value", scraper))()
+
+    @staticmethod
+    def get_names() -> list[str]:
+        return SCRAPERS.names()
 
-        raise ValueError("Unknown scraper")
+    @staticmethod
+    def parse(name: str) -> ScraperKey:
+        # Built in names never trigger the entry point scan
+        if name in ScraperEnum._value2member_map_:
+            return ScraperEnum(name)
+        if name in SCRAPERS.names():
+            return name
+        raise ValueError(f"Unknown scraper {name!r}, available: {', '.join(SCRAPERS.names())}")
@@ -5,6 +5,8 @@ if TYPE_CHECKING:
     from scrapers.base_scraper import BaseScraper
 
 
-@dataclass
+# Items are slotted and immutable: a run can hold a very large number of them and they are shared between threads.
+# scraper is the class itself, every item of a scraper points at the same object instead of carrying its name
+@dataclass(frozen=True, slots=True)
 class BaseItem:
     scraper: type["BaseScraper"]
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from items.base_item import BaseItem
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ErrorItem(BaseItem):
     message: str
     code: int = -1
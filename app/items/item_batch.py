@@ -0,0 +1,48 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from items.scraped_item import ScrapedItem
+
+
+# Column per field instead of an object per item, for bulk writes of large batches to the database
+@dataclass(slots=True)
+class ItemBatch:
+    names: list[str] = field(default_factory=list)
+    scrapers: list[str] = field(default_factory=list)
+    urls: list[str] = field(default_factory=list)
+    prices: list[Optional[float]] = field(default_factory=list)
+    expiration_dates: list[Optional[str]] = field(default_factory=list)
+    expires_at: list[Optional[int]] = field(default_factory=list)
+    content_hashes: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_items(cls, items: Iterable[ScrapedItem]) -> "ItemBatch":
+        batch = cls()
+        batch.extend(items)
+        return batch
+
+    def extend(self, items: Iterable[ScrapedItem]):
+        for item in items:
+            self.names.append(item.name)
+            # Class names are interned by Python, every row of a scraper shares the same string
+            self.scrapers.append(item.scraper.__name__)
+            self.urls.append(item.url)
+            self.prices.append(item.price)
+            self.expiration_dates.append(item.expiration_date)
+            self.expires_at.append(item.expires_at)
+            self.content_hashes.append(item.content_hash)
+
+    def __len__(self) -> int:
+        return len(self.content_hashes)
+
+    def rows(self) -> Iterator[tuple]:
+        # Same column order as the INSERT in SQLiteDB.add_scraped_items
+        return zip(
+            self.names,
+            self.scrapers,
+            self.urls,
+            self.prices,
+            self.expiration_dates,
+            self.expires_at,
+            self.content_hashes,
+        )
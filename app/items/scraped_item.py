@@ -1,11 +1,72 @@
-from dataclasses import dataclass
+import calendar
+import datetime
+import functools
+import hashlib
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
 
 from items.base_item import BaseItem
 
 
-@dataclass
+# json.dumps builds a new encoder on every call when given options, this one is shared
+encode_content = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def compute_content_digest(name: str, scraper: str, url: str, price: float, expiration_date: str) -> bytes:
+    price = float(price) if price is not None else None
+    content = encode_content([name, scraper, url, price, expiration_date])
+    return hashlib.sha1(content.encode("utf-8")).digest()
+
+
+def compute_content_hash(name: str, scraper: str, url: str, price: float, expiration_date: str) -> str:
+    return compute_content_digest(name, scraper, url, price, expiration_date).hex()
+
+
+@functools.lru_cache(maxsize=4096)
+def to_epoch(date_str: Optional[str]) -> Optional[int]:
+    # Naive dates are taken as they are written, which is also how SQLite's strftime('%s', ...) reads them
+    if not date_str:
+        return None
+    try:
+        date = datetime.datetime.fromisoformat(date_str)
+    except ValueError:
+        return None
+    return calendar.timegm(date.utctimetuple() if date.tzinfo else date.timetuple())
+
+
+@dataclass(frozen=True, slots=True)
 class ScrapedItem(BaseItem):
     name: str
     url: str
-    price: float = None
-    expiration_date: str = None
+    price: Optional[float] = None
+    expiration_date: Optional[str] = None
+    # Derived on first use and kept as the raw 20 bytes, items that are never keyed do not pay for
+    # hashing. Threads racing to set it compute the same value
+    content_digest: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Bundles of one store share a handful of expiration dates, keep a single copy of each
+        if self.expiration_date:
+            object.__setattr__(self, "expiration_date", sys.intern(self.expiration_date))
+
+    @property
+    def content_hash(self) -> str:
+        return self.get_content_digest().hex()
+
+    @property
+    def expires_at(self) -> Optional[int]:
+        return to_epoch(self.expiration_date)
+
+    def get_content_digest(self) -> bytes:
+        if self.content_digest is None:
+            object.__setattr__(
+                self,
+                "content_digest",
+                compute_content_digest(self.name, self.scraper.__name__, self.url, self.price, self.expiration_date),
+            )
+        return self.content_digest
+
+    def __hash__(self) -> int:
+        return hash(self.get_content_digest())
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from factories.scraper_enums import ScraperKey
+from factories.scraper_factory import ScraperFactory
+from items.base_item import BaseItem
+from items.error_item import ErrorItem
+from items.scraped_item import ScrapedItem
+from metrics import Metrics
+from pipeline import ScraperResult, ScraperRunner
+from scheduler import ScheduleEntry
+from scrapers.base_scraper import BaseScraper
+from sqlitedb import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobFailedError(Exception):
+    pass
+
+
+@dataclass
+class ScrapeJob:
+    # Same column order as SQLiteDB.get_scrape_jobs
+    id: int
+    scraper: str
+    state: str
+    attempts: int
+    worker: Optional[str] = None
+    listed_partially: bool = False
+    error: Optional[str] = None
+    cached_urls: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+
+def to_row(position: int, item: BaseItem) -> tuple:
+    # Same column order as SQLiteDB.complete_scrape_job, without the job id
+    if isinstance(item, ErrorItem):
+        return position, None, None, None, None, item.message, item.code
+    return position, item.name, item.url, item.price, item.expiration_date, None, None
+
+
+def to_item(scraper_class: type[BaseScraper], row: tuple) -> BaseItem:
+    _, name, url, price, expiration_date, error, error_code = row
+    if error is not None:
+        return ErrorItem(scraper=scraper_class, message=error, code=error_code)
+    return ScrapedItem(scraper=scraper_class, name=name, url=url, price=price, expiration_date=expiration_date)
+
+
+class JobCoordinator:
+    # Splits a run into one job per scraper and waits for the workers to report them. The results are then read back
+    # in the order the scrapers were given, so the rest of the run treats them as if the scrapers had run here
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        poll_interval: float = 1,
+        run_timeout: float = 1800,
+        chunk_size: Optional[int] = None,
+    ):
+        self.max_attempts = max(max_attempts, 1)
+        self.poll_interval = poll_interval
+        self.run_timeout = run_timeout
+        self.chunk_size = chunk_size or int(os.environ.get("PIPELINE_CHUNK_SIZE", 500))
+
+    @classmethod
+    def from_env(cls) -> "JobCoordinator":
+        return cls(
+            max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+            poll_interval=float(os.environ.get("JOB_POLL_INTERVAL", 1)),
+            run_timeout=float(os.environ.get("JOB_RUN_TIMEOUT", 1800)),
+        )
+
+    def enqueue(self, scraper_enums: list[ScraperKey]) -> str:
+        db = SQLiteDB()
+        # Jobs of a coordinator that died are past any run timeout by now and nobody will read their results
+        db.delete_scrape_jobs(enqueued_before=time.time() - self.run_timeout)
+        run_id = uuid.uuid4().hex
+        db.enqueue_scrape_jobs(run_id, [ScheduleEntry.get_name(scraper_enum) for scraper_enum in scraper_enums])
+        logger.info(f"Enqueued {len(scraper_enums)} scrape jobs for run {run_id}")
+        return run_id
+
+    def wait(self, run_id: str) -> list[ScrapeJob]:
+        db = SQLiteDB()
+        deadline = time.monotonic() + self.run_timeout
+        while True:
+            # A job whose workers all died while holding it would otherwise keep the run waiting until the deadline
+            error = f"Lease expired after {self.max_attempts} attempts"
+            expired = db.fail_scrape_jobs(run_id, error, self.max_attempts)
+            if expired:
+                logger.warning(f"{expired} jobs of run {run_id} failed: {error}")
+
+            jobs = [ScrapeJob(*row) for row in db.get_scrape_jobs(run_id)]
+            if all(job.finished for job in jobs):
+                return jobs
+            if time.monotonic() >= deadline:
+                db.fail_scrape_jobs(run_id, f"Not finished by a worker within {self.run_timeout} seconds")
+                return [ScrapeJob(*row) for row in db.get_scrape_jobs(run_id)]
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+
+    def results(self, jobs: list[ScrapeJob], scrapers: dict[str, BaseScraper]) -> Iterator[ScraperResult]:
+        db = SQLiteDB()
+        for job in jobs:
+            scraper = scrapers[job.scraper]
+            scraper.listed_partially = bool(job.listed_partially)
+            # The cache folder is shared with the workers, the run can then drop the pages of undelivered items
+            scraper.cached_urls.update(json.loads(job.cached_urls or "[]"))
+            if job.state == FAILED:
+                yield scraper, [], JobFailedError(f"{job.scraper}: {job.error}")
+                continue
+
+            scraper_class = type(scraper)
+            position = -1
+            while rows := db.get_scrape_job_items(job.id, position, self.chunk_size):
+                position = rows[-1][0]
+                yield scraper, [to_item(scraper_class, row) for row in rows], None
+
+    def cleanup(self, run_id: str):
+        SQLiteDB().delete_scrape_jobs(run_id=run_id)
+
+
+class JobWorker:
+    # Claims the jobs of its scrapers until stopped. While a job runs a heartbeat extends its lease, so a worker that
+    # dies stops renewing it and another worker claims the job again once the lease expires
+    def __init__(
+        self,
+        scraper_enums: list[ScraperKey],
+        slots: int = 1,
+        timeout: float = 300,
+        lease: float = 60,
+        max_attempts: int = 3,
+        poll_interval: float = 1,
+        name: Optional[str] = None,
+    ):
+        self.scrapers = {ScheduleEntry.get_name(scraper_enum): scraper_enum for scraper_enum in scraper_enums}
+        self.slots = max(slots, 1)
+        self.timeout = timeout
+        self.lease = lease
+        self.max_attempts = max(max_attempts, 1)
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, scraper_enums: list[ScraperKey], slots: int, timeout: float) -> "JobWorker":
+        return cls(
+            scraper_enums,
+            slots=slots,
+            timeout=timeout,
+            lease=float(os.environ.get("JOB_LEASE", 60)),
+            max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+            poll_interval=float(os.environ.get("JOB_POLL_INTERVAL", 1)),
+            name=os.environ.get("JOB_WORKER_NAME") or None,
+        )
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def stop(self, signum: int = None, frame=None):
+        if signum is not None:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping worker {self.name}")
+        self.stopping.set()
+
+    def run_forever(self):
+        logger.info(f"Worker {self.name} waiting for jobs of {', '.join(self.scrapers)}")
+        executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="job")
+        for _ in range(self.slots):
+            executor.submit(self.work)
+        self.stopping.wait()
+
+        logger.info("Waiting for running jobs to finish")
+        executor.shutdown(wait=True)
+
+    def work(self):
+        while not self.stopping.is_set():
+            try:
+                job = self.claim()
+                if job is None:
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                self.run_job(job)
+            except Exception as e:
+                # The job is left to its lease, another attempt picks it up once it expires
+                logger.exception(f"Error in worker {self.name}: {e}")
+                self.stopping.wait(self.poll_interval)
+
+    def claim(self) -> Optional[ScrapeJob]:
+        claimed = SQLiteDB().claim_scrape_job(self.name, list(self.scrapers), self.lease, self.max_attempts)
+        if claimed is None:
+            return None
+        job_id, run_id, scraper, attempts = claimed
+        logger.info(f"Claimed job {job_id} of run {run_id}: {scraper}, attempt {attempts}")
+        Metrics.increment("jobs_claimed", scraper=scraper)
+        return ScrapeJob(job_id, scraper, LEASED, attempts, self.name)
+
+    def run_job(self, job: ScrapeJob):
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, done), name=f"heartbeat-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            with Metrics.timer("job", scraper=job.scraper):
+                # A scraper per job, concurrent jobs must not share its listed_partially flag
+                scraper = ScraperFactory.get_scraper(self.scrapers[job.scraper])
+                rows = [to_row(position, item) for position, item in enumerate(self.scrape(scraper))]
+                completed = SQLiteDB().complete_scrape_job(
+                    job.id, self.name, rows, scraper.listed_partially, json.dumps(sorted(scraper.cached_urls))
+                )
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if completed:
+            logger.info(f"Reported job {job.id}: {len(rows)} items from {job.scraper}")
+            Metrics.increment("jobs_completed", scraper=job.scraper)
+        else:
+            logger.warning(f"Lost the lease of job {job.id} ({job.scraper}), its results were dropped")
+            Metrics.increment("jobs_lost", scraper=job.scraper)
+
+    def scrape(self, scraper: BaseScraper) -> list[BaseItem]:
+        # Errors are reported as items, the coordinator sees a failed scraper the same way a local run does
+        items = []
+        for _, chunk, error in ScraperRunner([scraper], 1, self.timeout).run():
+            items.extend(chunk)
+            if error is not None:
+                logger.error(f"Error during scraping from {scraper.__class__.__name__}: {error}", exc_info=error)
+                items.append(ErrorItem(scraper=type(scraper), message=str(error)))
+        return items
+
+    def heartbeat(self, job: ScrapeJob, done: threading.Event):
+        while not done.wait(self.lease / 3):
+            try:
+                if not SQLiteDB().renew_scrape_job_lease(job.id, self.name, self.lease):
+                    logger.warning(f"Job {job.id} ({job.scraper}) is no longer leased by {self.name}")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Error renewing the lease of job {job.id}: {e}")
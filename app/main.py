@@ -1,96 +1,360 @@
 import argparse
+import functools
 import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Optional
 
 from dotenv import load_dotenv
 
 from configuration.logger import setup_logger
-from factories.notifier_enums import NotifierEnum
+from factories.notifier_enums import NotifierEnum, NotifierKey
 from factories.notifier_factory import NotifierFactory
-from factories.scraper_enums import ScraperEnum
+from factories.scraper_enums import ScraperEnum, ScraperKey
 from factories.scraper_factory import ScraperFactory
 from items.scraped_item import ScrapedItem
 from items.base_item import BaseItem
 from items.error_item import ErrorItem
+from job_queue import JobCoordinator, JobWorker
+from metrics import Metrics
+from network.browser_pool import BrowserPool
+from network.session_factory import SessionFactory
 from notifications.base_notifier import BaseNotifier
+from pipeline import (
+    DedupStage,
+    ItemPipeline,
+    NotifyBufferStage,
+    PersistStage,
+    ScraperResult,
+    ScraperRunner,
+    SnapshotStage,
+)
+from scheduler import ScheduleEntry, Scheduler
+from sent_filter import SentItemsFilter
 from scrapers.base_scraper import BaseScraper
 from sqlitedb import SQLiteDB
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+DEFAULT_WORKERS = int(os.environ.get("SCRAPER_WORKERS", 4))
+DEFAULT_SCRAPER_TIMEOUT = float(os.environ.get("SCRAPER_TIMEOUT", 300))
+DEFAULT_NOTIFIER_TIMEOUT = float(os.environ.get("NOTIFIER_TIMEOUT", 120))
+DEFAULT_METRICS_FOLDER = os.environ.get("METRICS_FOLDER")
+DEFAULT_SCRAPER_INTERVAL = float(os.environ.get("SCRAPER_INTERVAL", 3600))
+DEFAULT_SCRAPER_JITTER = float(os.environ.get("SCRAPER_JITTER", 60))
 
-def main(scraper_enums: list[ScraperEnum], notifier_enums: list[NotifierEnum]) -> None:
+
+def main(
+    scraper_enums: list[ScraperKey],
+    notifier_enums: list[NotifierKey],
+    max_workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_SCRAPER_TIMEOUT,
+    metrics_folder: Optional[str] = DEFAULT_METRICS_FOLDER,
+    notifier_timeout: float = DEFAULT_NOTIFIER_TIMEOUT,
+) -> None:
     logger.info("Starting main application")
+    if metrics_folder:
+        Metrics.enable()
 
     scrapers = [ScraperFactory.get_scraper(scraper_enum) for scraper_enum in scraper_enums]
-    scraped_data = execute_scrapers(scrapers)
+    notifiers = NotifierFactory.get_notifiers(notifier_enums)
+    try:
+        run(scrapers, notifiers, max_workers, timeout, metrics_folder, notifier_timeout)
+    finally:
+        BrowserPool.close()
+    logger.info("Ending main application\n")
+
+
+def run_daemon(
+    scraper_enums: list[ScraperKey],
+    notifier_enums: list[NotifierKey],
+    max_workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_SCRAPER_TIMEOUT,
+    metrics_folder: Optional[str] = DEFAULT_METRICS_FOLDER,
+    notifier_timeout: float = DEFAULT_NOTIFIER_TIMEOUT,
+    interval: float = DEFAULT_SCRAPER_INTERVAL,
+    jitter: float = DEFAULT_SCRAPER_JITTER,
+) -> None:
+    logger.info("Starting daemon")
+    if metrics_folder:
+        Metrics.enable()
+
+    # Scrapers, notifiers, the HTTP session and cache are built once and reused by every run
+    scrapers = {scraper_enum: ScraperFactory.get_scraper(scraper_enum) for scraper_enum in scraper_enums}
+    notifiers = NotifierFactory.get_notifiers(notifier_enums)
+    browser_scrapers = sum(scraper.USES_BROWSER for scraper in scrapers.values())
+    if browser_scrapers:
+        BrowserPool.get().warm(browser_scrapers)
+
+    def run_scheduled(due: list[ScraperKey]):
+        run([scrapers[scraper_enum] for scraper_enum in due], notifiers, max_workers, timeout, metrics_folder,
+            notifier_timeout)
+
+    entries = [ScheduleEntry.from_env(scraper_enum, interval, jitter) for scraper_enum in scraper_enums]
+    scheduler = Scheduler(entries, run_scheduled)
+    scheduler.install_signal_handlers()
+    try:
+        scheduler.run_forever()
+    finally:
+        SessionFactory.close()
+        BrowserPool.close()
+        SQLiteDB.close()
+    logger.info("Daemon stopped\n")
+
+
+def run_coordinator(
+    scraper_enums: list[ScraperKey],
+    notifier_enums: list[NotifierKey],
+    metrics_folder: Optional[str] = DEFAULT_METRICS_FOLDER,
+    notifier_timeout: float = DEFAULT_NOTIFIER_TIMEOUT,
+) -> None:
+    logger.info("Starting coordinator")
+    if metrics_folder:
+        Metrics.enable()
+
+    # Workers only scrape, the snapshots, dedup, storage and notifications of the run all happen here
+    scrapers = {
+        ScheduleEntry.get_name(scraper_enum): ScraperFactory.get_scraper(scraper_enum) for scraper_enum in scraper_enums
+    }
+    notifiers = NotifierFactory.get_notifiers(notifier_enums)
+    coordinator = JobCoordinator.from_env()
+    run_id = coordinator.enqueue(scraper_enums)
+    try:
+        with Metrics.timer("wait_for_workers"):
+            jobs = coordinator.wait(run_id)
+        run(
+            list(scrapers.values()),
+            notifiers,
+            metrics_folder=metrics_folder,
+            notifier_timeout=notifier_timeout,
+            results=coordinator.results(jobs, scrapers),
+        )
+    finally:
+        coordinator.cleanup(run_id)
+    logger.info("Ending coordinator\n")
+
+
+def run_worker(
+    scraper_enums: list[ScraperKey],
+    max_workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_SCRAPER_TIMEOUT,
+    metrics_folder: Optional[str] = DEFAULT_METRICS_FOLDER,
+) -> None:
+    logger.info("Starting worker")
+    if metrics_folder:
+        Metrics.enable()
+
+    worker = JobWorker.from_env(scraper_enums, max_workers, timeout)
+    worker.install_signal_handlers()
+    try:
+        worker.run_forever()
+    finally:
+        SessionFactory.close()
+        BrowserPool.close()
+        SQLiteDB.close()
+        if metrics_folder:
+            export_metrics(metrics_folder)
+    logger.info("Worker stopped\n")
+
+
+def run(
+    scrapers: list[BaseScraper],
+    notifiers: list[BaseNotifier],
+    max_workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_SCRAPER_TIMEOUT,
+    metrics_folder: Optional[str] = DEFAULT_METRICS_FOLDER,
+    notifier_timeout: float = DEFAULT_NOTIFIER_TIMEOUT,
+    results: Optional[Iterable[ScraperResult]] = None,
+) -> None:
+    notifier_names = [notifier.__class__.__name__ for notifier in notifiers]
+    snapshot_stage = SnapshotStage()
+    with Metrics.timer("execute_scrapers"):
+        scraped_data = execute_scrapers(scrapers, max_workers, timeout, notifier_names, snapshot_stage, results)
 
+    undelivered = set()
     if scraped_data:
-        notifiers = [NotifierFactory.get_notifier(notifier_enum) for notifier_enum in notifier_enums]
-        execute_notifiers(notifiers, scraped_data)
+        undelivered = execute_notifiers(notifiers, scraped_data, notifier_timeout)
     else:
         logger.info("No new data found")
 
-    logger.info("Ending main application\n")
+    # Undelivered items must be scraped again next run instead of being skipped as not modified
+    for scraper in scrapers:
+        if any(
+            isinstance(item, ScrapedItem) and item.content_hash in undelivered
+            for item in scraped_data.get(type(scraper), [])
+        ):
+            scraper.invalidate_http_cache()
 
+    # Written once the notifiers are done, a run that dies before this point is diffed again by the next one
+    snapshot_stage.save(undelivered)
+    SentItemsFilter.save()
+    SessionFactory.log_host_metrics()
+    if metrics_folder:
+        export_metrics(metrics_folder)
 
-def execute_scrapers(scrapers: list[BaseScraper]) -> dict[type[BaseScraper], list[BaseItem]]:
-    new_scraped_data = {}
-    for scraper in scrapers:
+
+def execute_scrapers(
+    scrapers: list[BaseScraper],
+    max_workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_SCRAPER_TIMEOUT,
+    notifier_names: Optional[list[str]] = None,
+    snapshot_stage: Optional[SnapshotStage] = None,
+    results: Optional[Iterable[ScraperResult]] = None,
+) -> dict[type[BaseScraper], list[BaseItem]]:
+    # Without results the scrapers run here, otherwise they already ran elsewhere and set listed_partially there
+    if results is None:
+        for scraper in scrapers:
+            scraper.listed_partially = False
+        results = ScraperRunner(scrapers, max_workers, timeout).run()
+    notify_buffer = NotifyBufferStage(scraper.__class__ for scraper in scrapers)
+    stages = [DedupStage(notifier_names), PersistStage(), notify_buffer]
+    pipeline = ItemPipeline([snapshot_stage, *stages] if snapshot_stage else stages)
+
+    # Scrapers only do network and parsing work in the pool; chunks reach the database from this thread
+    for scraper, items_scraped, error in results:
         scraper_name = scraper.__class__.__name__
-        logger.info(f"Executing: {scraper_name}")
-        try:
-            items_scraped = scraper.scrape()
-            new_items = filter_new_items(items_scraped)
+        if error is not None:
+            logger.error(f"Error during scraping from {scraper_name}: {error}", exc_info=error)
+            items_scraped = [ErrorItem(scraper=type(scraper), message=str(error))]
 
+        try:
+            new_items = pipeline.process(items_scraped)
+            Metrics.increment("items_scraped", len(items_scraped), scraper=scraper_name)
             if new_items:
                 logger.info(f"New data scraped from {scraper_name}: {len(new_items)} items")
-                add_items_to_db(new_items)
-                new_scraped_data[scraper.__class__] = new_items
-
+                Metrics.increment("new_items", len(new_items), scraper=scraper_name)
         except Exception as e:
-            logger.exception(f"Error during scraping from {scraper_name}: {e}")
-            new_items = [ErrorItem(scraper=type(scraper), message=str(e))]
-            add_items_to_db(new_items)
-            new_scraped_data[scraper.__class__] = new_items
+            logger.exception(f"Error processing items from {scraper_name}: {e}")
+            if snapshot_stage:
+                snapshot_stage.discard(items_scraped)
+            scraper.invalidate_http_cache()
+            pipeline.process([ErrorItem(scraper=type(scraper), message=str(e))])
 
-    return new_scraped_data
+    if snapshot_stage:
+        for scraper in scrapers:
+            if not scraper.listed_partially:
+                snapshot_stage.complete(type(scraper))
+    return notify_buffer.scraped_data
 
 
 def add_items_to_db(new_items):
-    db = SQLiteDB()
+    PersistStage().process(new_items)
+
 
-    for item in new_items:
-        if isinstance(item, ScrapedItem):
-            db.add_scraped_item(item)
+def filter_new_items(items_scraped: list[BaseItem], notifier_names: Optional[list[str]] = None) -> list[BaseItem]:
+    return DedupStage(notifier_names).process(items_scraped)
 
 
-def filter_new_items(items_scraped: list[BaseItem]) -> list[BaseItem]:
+def execute_notifiers(
+    notifiers: list[BaseNotifier],
+    scraped_data: dict[type[BaseScraper], list[BaseItem]],
+    timeout: float = DEFAULT_NOTIFIER_TIMEOUT,
+) -> set[str]:
     db = SQLiteDB()
+    notifier_names = [notifier.__class__.__name__ for notifier in notifiers]
+    scraped_items = [item for items in scraped_data.values() for item in items if isinstance(item, ScrapedItem)]
+    previous_deliveries = db.get_deliveries(scraped_items, notifier_names)
 
-    return [
-        item
-        for item in items_scraped
-        if (isinstance(item, ScrapedItem) and not db.item_already_sent(item)) or isinstance(item, ErrorItem)
-    ]
+    executor = ThreadPoolExecutor(max_workers=max(len(notifiers), 1), thread_name_prefix="notifier")
+    futures = {}
+    for notifier, notifier_name in zip(notifiers, notifier_names):
+        # Each channel only gets what it has not delivered yet, errors are reported everywhere
+        pending_data = {}
+        for scraper_class, items in scraped_data.items():
+            pending_items = [
+                item for item in items
+                if not isinstance(item, ScrapedItem) or (item.content_hash, notifier_name) not in previous_deliveries
+            ]
+            if pending_items:
+                pending_data[scraper_class] = pending_items
 
+        if pending_data:
+            logger.info(f"Sending notification via {notifier_name}")
+            futures[notifier_name] = (pending_data, executor.submit(run_notifier, notifier, pending_data))
 
-def execute_notifiers(notifiers: list[BaseNotifier], scraped_data: dict[type[BaseScraper], list[BaseItem]]):
-    db = SQLiteDB()
+    deliveries = []
+    undelivered = set()
+    deadline = time.monotonic() + timeout
+    try:
+        for notifier_name, (pending_data, future) in futures.items():
+            pending_items = [
+                item for items in pending_data.values() for item in items if isinstance(item, ScrapedItem)
+            ]
+            try:
+                delivered_items = get_delivered_items(
+                    future.result(timeout=max(deadline - time.monotonic(), 0)), pending_items
+                )
+            except TimeoutError:
+                # The notifier keeps running, what it still delivers is recorded so the next run does not send it again
+                logger.error(f"{notifier_name} timed out after {timeout} seconds, late deliveries are still recorded")
+                future.add_done_callback(functools.partial(record_late_deliveries, notifier_name, pending_items))
+                delivered_items = []
+            except Exception as e:
+                logger.exception(f"Error sending notification via {notifier_name}: {e}", exc_info=True)
+                delivered_items = []
 
-    for notifier in notifiers:
-        notifier_name = notifier.__class__.__name__
-        logger.info(f"Sending notification via {notifier_name}")
-        try:
-            notifier.notify(scraped_data)
-            for scraper_class, items in scraped_data.items():
-                for item in items:
-                    if isinstance(item, ScrapedItem):
-                        db.mark_item_as_sent(item)
+            deliveries.extend((item, notifier_name) for item in delivered_items)
 
-        except Exception as e:
-            logger.exception(f"Error sending notification via {notifier_name}: {e}", exc_info=True)
-            raise
+            if len(delivered_items) < len(pending_items):
+                logger.warning(f"{notifier_name} delivered {len(delivered_items)}/{len(pending_items)} items")
+                delivered_hashes = {item.content_hash for item in delivered_items}
+                undelivered.update(
+                    item.content_hash for item in pending_items if item.content_hash not in delivered_hashes
+                )
+                Metrics.increment("notifier_errors", notifier=notifier_name)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        db.record_deliveries(deliveries)
+    return undelivered
+
+
+def get_delivered_items(
+    delivered_items: Optional[list[BaseItem]], pending_items: list[ScrapedItem]
+) -> list[ScrapedItem]:
+    # None means the notifier delivered everything it was given
+    if delivered_items is None:
+        return pending_items
+    return [item for item in delivered_items if isinstance(item, ScrapedItem)]
+
+
+def record_late_deliveries(notifier_name: str, pending_items: list[ScrapedItem], future: Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    delivered_items = get_delivered_items(future.result(), pending_items)
+    if delivered_items:
+        logger.warning(f"{notifier_name} delivered {len(delivered_items)} items after timing out")
+        SQLiteDB().record_deliveries([(item, notifier_name) for item in delivered_items])
+
+
+def run_notifier(notifier: BaseNotifier, scraped_data: dict[type[BaseScraper], list[BaseItem]]):
+    with Metrics.timer("notify", notifier=notifier.__class__.__name__):
+        return notifier.notify(scraped_data)
+
+
+def export_metrics(metrics_folder: str):
+    for host, host_metrics in SessionFactory.get_host_metrics().items():
+        Metrics.gauge("http_requests", host_metrics.requests, host=host)
+        Metrics.gauge("http_errors", host_metrics.errors, host=host)
+        Metrics.gauge("http_retries", host_metrics.retries, host=host)
+        Metrics.gauge("http_connections_opened", host_metrics.connections_opened, host=host)
+        Metrics.gauge("http_elapsed_seconds", host_metrics.elapsed_seconds, host=host)
+    Metrics.export(metrics_folder)
+
+
+def scraper_argument(name: str) -> ScraperKey:
+    try:
+        return ScraperFactory.parse(name)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def notifier_argument(name: str) -> NotifierKey:
+    try:
+        return NotifierFactory.parse(name)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
 if __name__ == "__main__":
@@ -100,19 +364,87 @@ if __name__ == "__main__":
     parser.add_argument(
         "--scrapers",
         nargs="*",
-        choices=[scraper.value for scraper in ScraperEnum],
-        help="List of scrapers to use",
+        type=scraper_argument,
+        help=f"List of scrapers to use: {', '.join(scraper.value for scraper in ScraperEnum)} or an installed plugin",
         required=True,
     )
     parser.add_argument(
         "--notifiers",
         nargs="*",
-        choices=[notifier.value for notifier in NotifierEnum],
-        help="List of notifiers to use",
-        default=[NotifierEnum.EMAIL.value],
+        type=notifier_argument,
+        help=f"List of notifiers to use: {', '.join(notifier.value for notifier in NotifierEnum)} or an installed plugin",
+        default=[NotifierEnum.EMAIL],
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of scrapers executed concurrently",
+        default=DEFAULT_WORKERS,
+    )
+    parser.add_argument(
+        "--scraper-timeout",
+        type=float,
+        help="Seconds a single scraper may run before it is reported as an error",
+        default=DEFAULT_SCRAPER_TIMEOUT,
+    )
+    parser.add_argument(
+        "--notifier-timeout",
+        type=float,
+        help="Seconds the notifiers may run in parallel before the remaining ones are given up on",
+        default=DEFAULT_NOTIFIER_TIMEOUT,
+    )
+
+    parser.add_argument(
+        "--metrics-folder",
+        help="Folder where the JSON run summary and the Prometheus textfile are written",
+        default=DEFAULT_METRICS_FOLDER,
+    )
+
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and scrape every scraper on its own interval until SIGTERM",
+    )
+    mode.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Enqueue a job per scraper for the workers, wait for them and notify the aggregated results",
+    )
+    mode.add_argument(
+        "--worker",
+        action="store_true",
+        help="Run the queued jobs of the given scrapers until SIGTERM, --workers of them at a time",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        help="Default seconds between two runs of a scraper in daemon mode",
+        default=DEFAULT_SCRAPER_INTERVAL,
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        help="Default random delay in seconds added to every interval in daemon mode",
+        default=DEFAULT_SCRAPER_JITTER,
     )
 
     args = parser.parse_args()
-    scrapers = [ScraperEnum(scraper) for scraper in args.scrapers]
-    notifiers = [NotifierEnum(notifier) for notifier in args.notifiers]
-    main(scrapers, notifiers)
+    if args.coordinator:
+        run_coordinator(args.scrapers, args.notifiers, args.metrics_folder, args.notifier_timeout)
+    elif args.worker:
+        run_worker(args.scrapers, args.workers, args.scraper_timeout, args.metrics_folder)
+    elif args.daemon:
+        run_daemon(
+            args.scrapers,
+            args.notifiers,
+            args.workers,
+            args.scraper_timeout,
+            args.metrics_folder,
+            args.notifier_timeout,
+            args.interval,
+            args.jitter,
+        )
+    else:
+        main(args.scrapers, args.notifiers, args.workers, args.scraper_timeout, args.metrics_folder, args.notifier_timeout)
@@ -0,0 +1,282 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional, TextIO
+
+from dotenv import load_dotenv
+
+from configuration.logger import setup_logger
+from metrics import Metrics
+from sent_filter import SentItemsFilter
+from sqlitedb import SQLiteDB
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+DEFAULT_RETENTION_DAYS = float(os.environ.get("RETENTION_DAYS", 365))
+DEFAULT_EXPIRED_DAYS = float(os.environ.get("RETENTION_EXPIRED_DAYS", 30))
+DEFAULT_ARCHIVE_FOLDER = os.environ.get("RETENTION_ARCHIVE_FOLDER", "archive")
+DEFAULT_CHUNK_SIZE = int(os.environ.get("RETENTION_CHUNK_SIZE", 5000))
+DEFAULT_VACUUM_PAGES = int(os.environ.get("RETENTION_VACUUM_PAGES", 1000))
+DEFAULT_PAUSE = float(os.environ.get("RETENTION_PAUSE", 0.05))
+DEFAULT_METRICS_FOLDER = os.environ.get("METRICS_FOLDER")
+
+AUTO_VACUUM_INCREMENTAL = 2
+ARCHIVED_COLUMNS = ("id", "name", "scraper", "url", "price", "expiration_date", "expires_at", "creation_date", "sent")
+
+
+@dataclass
+class MaintenanceReport:
+    archived: int = 0
+    deleted: int = 0
+    deliveries_deleted: int = 0
+    pages_vacuumed: int = 0
+    full_vacuum: bool = False
+
+
+class Maintenance:
+    # Every step works on a bounded window of rows in its own short transaction and pauses between windows,
+    # so a scrape run waiting on the write lock is only ever held back by a single chunk. Reads go through the
+    # connection of this thread and writes through the writer thread of SQLiteDB, like the rest of the application
+    def __init__(
+        self,
+        db: SQLiteDB,
+        retention_days: float = DEFAULT_RETENTION_DAYS,
+        expired_days: float = DEFAULT_EXPIRED_DAYS,
+        archive_folder: Optional[str] = DEFAULT_ARCHIVE_FOLDER,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        vacuum_pages: int = DEFAULT_VACUUM_PAGES,
+        pause: float = DEFAULT_PAUSE,
+    ):
+        self.db = db
+        self.conn = db.conn
+        self.retention_days = retention_days
+        self.expired_days = expired_days
+        self.archive_folder = archive_folder
+        self.chunk_size = chunk_size
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.report = MaintenanceReport()
+
+    def run(self, vacuum: bool = True, full_vacuum: bool = False) -> MaintenanceReport:
+        archive = self.open_archive()
+        try:
+            with Metrics.timer("maintenance_prune"):
+                self.prune(archive)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        with Metrics.timer("maintenance_prune_deliveries"):
+            self.prune_deliveries()
+        if self.report.deleted or self.report.deliveries_deleted:
+            # The bloom filter still holds the deleted deliveries and cannot forget them
+            SentItemsFilter.invalidate()
+
+        if full_vacuum:
+            with Metrics.timer("maintenance_full_vacuum"):
+                self.full_vacuum()
+        elif vacuum:
+            with Metrics.timer("maintenance_vacuum"):
+                self.vacuum()
+        with Metrics.timer("maintenance_analyze"):
+            self.analyze()
+
+        Metrics.increment("maintenance_archived_rows", self.report.archived)
+        Metrics.increment("maintenance_deleted_rows", self.report.deleted)
+        logger.info(
+            f"Maintenance archived {self.report.archived} rows, deleted {self.report.deleted} rows and "
+            f"{self.report.deliveries_deleted} deliveries, vacuumed {self.report.pages_vacuumed} pages"
+        )
+        return self.report
+
+    def open_archive(self) -> Optional[TextIO]:
+        if not self.archive_folder:
+            return None
+        os.makedirs(self.archive_folder, exist_ok=True)
+        path = os.path.join(self.archive_folder, f"scraped_items-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        logger.info(f"Archiving pruned rows to {path}")
+        return gzip.open(path, "at", encoding="utf-8")
+
+    def prune(self, archive: Optional[TextIO]):
+        # Rows past the retention horizon, expired for a while, or superseded by a newer row of the same bundle
+        query = f"""
+            SELECT {", ".join(ARCHIVED_COLUMNS)} FROM scraped_items s
+            WHERE s.id BETWEEN ? AND ?
+            AND (
+                s.creation_date < datetime('now', ?)
+                OR s.expires_at < CAST(strftime('%s', 'now', ?) AS INTEGER)
+                OR EXISTS (
+                    SELECT 1 FROM scraped_items n
+                    WHERE n.scraper = s.scraper AND n.name = s.name AND n.url IS s.url AND n.id > s.id
+                )
+            )
+            ORDER BY s.id;
+        """
+        retention = f"-{self.retention_days} days"
+        expired = f"-{self.expired_days} days"
+        first_id, last_id = self.conn.execute("SELECT MIN(id), MAX(id) FROM scraped_items;").fetchone()
+        if first_id is None:
+            return
+
+        for window_start in range(first_id, last_id + 1, self.chunk_size):
+            window_end = window_start + self.chunk_size - 1
+            rows = self.conn.execute(query, (window_start, window_end, retention, expired)).fetchall()
+            if not rows:
+                continue
+
+            if archive is not None:
+                # Written before the rows are deleted, a crash can only archive a row twice, never lose it
+                archive.writelines(
+                    f"{json.dumps(dict(zip(ARCHIVED_COLUMNS, row)), ensure_ascii=False)}\n" for row in rows
+                )
+                archive.flush()
+                self.report.archived += len(rows)
+
+            ids = [(row[0],) for row in rows]
+            self.db.writer.submit(lambda conn: conn.executemany("DELETE FROM scraped_items WHERE id = ?;", ids))
+            self.report.deleted += len(rows)
+            time.sleep(self.pause)
+
+    def prune_deliveries(self):
+        # Deliveries of content that is no longer in scraped_items can never be matched again
+        query = """
+            SELECT n.content_hash, n.notifier,
+                EXISTS (SELECT 1 FROM scraped_items s WHERE s.content_hash = n.content_hash)
+            FROM item_notifications n
+            WHERE (n.content_hash, n.notifier) > (?, ?)
+            ORDER BY n.content_hash, n.notifier
+            LIMIT ?;
+        """
+        last_key = ("", "")
+        while True:
+            rows = self.conn.execute(query, (*last_key, self.chunk_size)).fetchall()
+            if not rows:
+                break
+            orphans = [(content_hash, notifier) for content_hash, notifier, exists in rows if not exists]
+            if orphans:
+                self.report.deliveries_deleted += self.db.writer.submit(
+                    lambda conn: self.delete_orphan_deliveries(conn, orphans)
+                )
+                time.sleep(self.pause)
+            last_key = rows[-1][:2]
+
+    @staticmethod
+    def delete_orphan_deliveries(conn: sqlite3.Connection, orphans: list[tuple[str, str]]) -> int:
+        # Checked again in the write, the content may have been scraped again since it was read as orphaned
+        deleted = conn.total_changes
+        conn.executemany(
+            """
+            DELETE FROM item_notifications
+            WHERE content_hash = ? AND notifier = ?
+            AND NOT EXISTS (SELECT 1 FROM scraped_items s WHERE s.content_hash = item_notifications.content_hash);
+            """,
+            orphans,
+        )
+        return conn.total_changes - deleted
+
+    def vacuum(self):
+        if self.conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            logger.warning(
+                "Incremental auto_vacuum is not enabled, free pages are not returned to the file system. "
+                "Run once with --full-vacuum while no scraper is running to enable it"
+            )
+            return
+
+        free_pages = self.conn.execute("PRAGMA freelist_count;").fetchone()[0]
+        while free_pages > 0:
+            self.db.writer.submit(
+                lambda conn: conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages});").fetchall()
+            )
+            remaining_pages = self.conn.execute("PRAGMA freelist_count;").fetchone()[0]
+            self.report.pages_vacuumed += free_pages - remaining_pages
+            if remaining_pages >= free_pages:
+                break
+            free_pages = remaining_pages
+            time.sleep(self.pause)
+        self.conn.execute("PRAGMA wal_checkpoint(PASSIVE);")
+
+    def full_vacuum(self):
+        # Rewrites the whole file and locks out every other connection until it is done, so it is only run on request.
+        # Switching an existing database to incremental auto_vacuum needs one, later runs free pages in chunks
+        logger.info("Enabling incremental auto_vacuum and running a full VACUUM, the database is locked meanwhile")
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        self.conn.execute("VACUUM;")
+        self.report.full_vacuum = True
+
+    def analyze(self):
+        def write(conn: sqlite3.Connection):
+            # analysis_limit makes ANALYZE sample each index instead of reading all of it
+            conn.execute(f"PRAGMA analysis_limit = {self.chunk_size};")
+            conn.execute("ANALYZE;")
+
+        self.db.writer.submit(write)
+
+
+if __name__ == "__main__":
+    setup_logger()
+
+    parser = argparse.ArgumentParser(description="Archive and prune old scraped items, then compact the database")
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        help="Rows created longer ago than this are pruned, a bundle still listed afterwards is reported again",
+        default=DEFAULT_RETENTION_DAYS,
+    )
+    parser.add_argument(
+        "--expired-days",
+        type=float,
+        help="Rows whose expiration date passed longer ago than this are pruned",
+        default=DEFAULT_EXPIRED_DAYS,
+    )
+    parser.add_argument(
+        "--archive-folder",
+        help="Folder for the gzipped JSON lines archive of pruned rows, empty to delete without archiving",
+        default=DEFAULT_ARCHIVE_FOLDER,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Rows examined per transaction",
+        default=DEFAULT_CHUNK_SIZE,
+    )
+    parser.add_argument(
+        "--vacuum-pages",
+        type=int,
+        help="Free pages returned to the file system per incremental vacuum step",
+        default=DEFAULT_VACUUM_PAGES,
+    )
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip the vacuum step")
+    parser.add_argument(
+        "--full-vacuum",
+        action="store_true",
+        help="Rewrite the whole database with VACUUM and enable incremental vacuuming, blocks scrapers while it runs",
+    )
+    parser.add_argument(
+        "--metrics-folder",
+        help="Folder where the JSON summary and the Prometheus textfile of the maintenance run are written",
+        default=DEFAULT_METRICS_FOLDER,
+    )
+
+    args = parser.parse_args()
+    if args.metrics_folder:
+        Metrics.enable()
+    maintenance = Maintenance(
+        SQLiteDB(),
+        retention_days=args.retention_days,
+        expired_days=args.expired_days,
+        archive_folder=args.archive_folder,
+        chunk_size=args.chunk_size,
+        vacuum_pages=args.vacuum_pages,
+    )
+    try:
+        maintenance.run(vacuum=not args.no_vacuum, full_vacuum=args.full_vacuum)
+    finally:
+        SQLiteDB.close()
+    if args.metrics_folder:
+        Metrics.export(args.metrics_folder, name="webhunter_maintenance")
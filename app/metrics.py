@@ -0,0 +1,177 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+NULL_TIMER = nullcontext()
+PROMETHEUS_PREFIX = "webhunter"
+
+
+@dataclass
+class TimerStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class Metrics:
+    enabled = False
+    _timers: dict[tuple, TimerStats] = {}
+    _counters: dict[tuple, float] = {}
+    _gauges: dict[tuple, float] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def enable(cls):
+        cls.enabled = True
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._timers = {}
+            cls._counters = {}
+            cls._gauges = {}
+
+    @classmethod
+    def timer(cls, name: str, **labels):
+        if not cls.enabled:
+            return NULL_TIMER
+        return cls._time(name, labels)
+
+    @classmethod
+    @contextmanager
+    def _time(cls, name: str, labels: dict[str, str]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with cls._lock:
+                stats = cls._timers.setdefault(cls.key(name, labels), TimerStats())
+                stats.count += 1
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    @classmethod
+    def timed(cls, name: str) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not cls.enabled:
+                    return function(*args, **kwargs)
+                with cls._time(name, {}):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @classmethod
+    def increment(cls, name: str, value: float = 1, **labels):
+        if not cls.enabled:
+            return
+        with cls._lock:
+            key = cls.key(name, labels)
+            cls._counters[key] = cls._counters.get(key, 0) + value
+
+    @classmethod
+    def gauge(cls, name: str, value: float, **labels):
+        if not cls.enabled:
+            return
+        with cls._lock:
+            cls._gauges[cls.key(name, labels)] = value
+
+    @staticmethod
+    def key(name: str, labels: dict[str, str]) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    @classmethod
+    def summary(cls) -> dict:
+        with cls._lock:
+            return {
+                "timestamp": time.time(),
+                "timers": [
+                    {"name": name, "labels": dict(labels), **asdict(stats)}
+                    for (name, labels), stats in cls._timers.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in cls._counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in cls._gauges.items()
+                ],
+            }
+
+    @classmethod
+    def to_prometheus(cls) -> str:
+        summary = cls.summary()
+        lines = []
+        declared = set()
+
+        def declare(metric: str, metric_type: str):
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} {metric_type}")
+
+        # Samples of one metric family have to be contiguous in the exposition format
+        by_name = lambda entry: entry["name"]
+        for timer in sorted(summary["timers"], key=by_name):
+            metric = cls.prometheus_name(f"{timer['name']}_seconds")
+            labels = cls.prometheus_labels(timer["labels"])
+            declare(metric, "summary")
+            lines.append(f"{metric}_sum{labels} {timer['total_seconds']}")
+            lines.append(f"{metric}_count{labels} {timer['count']}")
+        for counter in sorted(summary["counters"], key=by_name):
+            metric = cls.prometheus_name(f"{counter['name']}_total")
+            declare(metric, "counter")
+            lines.append(f"{metric}{cls.prometheus_labels(counter['labels'])} {counter['value']}")
+        for gauge in sorted(summary["gauges"], key=by_name):
+            metric = cls.prometheus_name(gauge["name"])
+            declare(metric, "gauge")
+            lines.append(f"{metric}{cls.prometheus_labels(gauge['labels'])} {gauge['value']}")
+
+        metric = cls.prometheus_name("last_run_timestamp_seconds")
+        declare(metric, "gauge")
+        lines.append(f"{metric} {summary['timestamp']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def prometheus_name(name: str) -> str:
+        return f"{PROMETHEUS_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+    @staticmethod
+    def prometheus_labels(labels: dict[str, str]) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for key, value in labels.items():
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    @classmethod
+    def export(cls, folder: str, name: str = "webhunter"):
+        if not cls.enabled:
+            return
+        os.makedirs(folder, exist_ok=True)
+        cls.write_atomically(os.path.join(folder, f"{name}_metrics.json"), json.dumps(cls.summary(), indent=2))
+        # The textfile collector reads every *.prom file in its folder, a partial write must never be visible
+        cls.write_atomically(os.path.join(folder, f"{name}.prom"), cls.to_prometheus())
+        logger.info(f"Metrics exported to {folder}")
+
+    @staticmethod
+    def write_atomically(path: str, content: str):
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary_path, path)
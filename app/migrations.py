@@ -0,0 +1,174 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable
+
+from items.scraped_item import compute_content_hash
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    # PRAGMAs such as journal_mode cannot change inside a transaction
+    transactional: bool = True
+
+
+def create_scraped_items(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scraped_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            scraper TEXT NOT NULL,
+            url TEXT,
+            price REAL,
+            expiration_date TIMESTAMP,
+            creation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent BOOLEAN DEFAULT FALSE
+        );
+    """)
+
+
+def create_dedup_index(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scraped_items_dedup
+        ON scraped_items (scraper, name, url, price, expiration_date);
+    """)
+
+
+def enable_wal(conn: sqlite3.Connection):
+    conn.execute("PRAGMA journal_mode = WAL;")
+
+
+def add_content_hash(conn: sqlite3.Connection):
+    conn.execute("ALTER TABLE scraped_items ADD COLUMN content_hash TEXT;")
+
+    rows = conn.execute("SELECT id, name, scraper, url, price, expiration_date FROM scraped_items;")
+    conn.executemany(
+        "UPDATE scraped_items SET content_hash = ? WHERE id = ?;",
+        [(compute_content_hash(name, scraper, url, price, expiration_date), row_id)
+         for row_id, name, scraper, url, price, expiration_date in rows.fetchall()],
+    )
+
+    # Unsent items were inserted again on every run, keep a single row per content, preferring the sent one
+    conn.execute("""
+        DELETE FROM scraped_items
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY content_hash ORDER BY sent DESC, id ASC
+                ) AS row_number
+                FROM scraped_items
+            )
+            WHERE row_number = 1
+        );
+    """)
+    conn.execute("CREATE UNIQUE INDEX idx_scraped_items_content_hash ON scraped_items (content_hash);")
+
+
+def create_item_notifications(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE item_notifications (
+            content_hash TEXT NOT NULL,
+            notifier TEXT NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, notifier)
+        ) WITHOUT ROWID;
+    """)
+    # Until now a sent item had gone through every notifier of the run, the only ones that existed were these two
+    for notifier in ("EmailNotifier", "DiscordNotifier"):
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO item_notifications (content_hash, notifier, sent_at)
+            SELECT content_hash, ?, creation_date FROM scraped_items WHERE sent = TRUE;
+            """,
+            (notifier,),
+        )
+
+
+def add_expires_at(conn: sqlite3.Connection):
+    # Epoch seconds, so retention and expiry checks compare integers instead of parsing date strings
+    conn.execute("ALTER TABLE scraped_items ADD COLUMN expires_at INTEGER;")
+    conn.execute("""
+        UPDATE scraped_items SET expires_at = CAST(strftime('%s', expiration_date) AS INTEGER)
+        WHERE expiration_date IS NOT NULL;
+    """)
+
+
+def create_item_snapshots(conn: sqlite3.Connection):
+    # The last listing of every scraper, keyed by an integer hash of name and url
+    conn.execute("""
+        CREATE TABLE item_snapshots (
+            scraper TEXT NOT NULL,
+            item_key INTEGER NOT NULL,
+            price REAL,
+            expires_at INTEGER,
+            PRIMARY KEY (scraper, item_key)
+        ) WITHOUT ROWID;
+    """)
+
+
+def create_host_circuits(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE host_circuits (
+            host TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            failures INTEGER NOT NULL,
+            opened_until REAL NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def create_scrape_jobs(conn: sqlite3.Connection):
+    # Jobs of the coordinator and worker mode, leased by one worker at a time and deleted once their run is notified
+    conn.execute("""
+        CREATE TABLE scrape_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            scraper TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_until REAL,
+            listed_partially BOOLEAN DEFAULT FALSE,
+            error TEXT,
+            enqueued_at REAL NOT NULL,
+            finished_at REAL
+        );
+    """)
+    conn.execute("CREATE INDEX idx_scrape_jobs_state ON scrape_jobs (state, id);")
+    conn.execute("CREATE INDEX idx_scrape_jobs_run ON scrape_jobs (run_id);")
+    # What a worker scraped, in scrape order. Error rows only carry the message and code
+    conn.execute("""
+        CREATE TABLE scrape_job_items (
+            job_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            url TEXT,
+            price REAL,
+            expiration_date TIMESTAMP,
+            error TEXT,
+            error_code INTEGER,
+            PRIMARY KEY (job_id, position)
+        ) WITHOUT ROWID;
+    """)
+
+
+def add_scrape_job_cached_urls(conn: sqlite3.Connection):
+    # Pages a worker read through the HTTP cache, the coordinator drops them when the items of the job go undelivered
+    conn.execute("ALTER TABLE scrape_jobs ADD COLUMN cached_urls TEXT;")
+
+
+MIGRATIONS = [
+    Migration(1, "Create scraped_items table", create_scraped_items),
+    Migration(2, "Add composite dedup index", create_dedup_index),
+    Migration(3, "Enable WAL journal mode", enable_wal, transactional=False),
+    Migration(4, "Add unique content hash", add_content_hash),
+    Migration(5, "Track deliveries per notifier", create_item_notifications),
+    Migration(6, "Add epoch expiration", add_expires_at),
+    Migration(7, "Store scraper snapshots", create_item_snapshots),
+    Migration(8, "Store host circuit breakers", create_host_circuits),
+    Migration(9, "Create scrape job queue", create_scrape_jobs),
+    Migration(10, "Record cached pages of scrape jobs", add_scrape_job_cached_urls),
+]
@@ -0,0 +1,188 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from metrics import Metrics
+from network.host_limits import HostLimits
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+logger = logging.getLogger(__name__)
+
+# Matched by Chrome against every request URL, the page only needs its markup and scripts
+BLOCKED_RESOURCE_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "stylesheet": ["*.css"],
+    "media": ["*.mp4", "*.webm", "*.m3u8"],
+}
+
+
+class BrowserSession:
+    def __init__(self, driver: "WebDriver"):
+        self.driver = driver
+        self.pages = 0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing browser session: {e}")
+
+
+class BrowserPool:
+    # Headless Chrome sessions kept warm between pages and runs, starting one costs far more than rendering a page.
+    # A session is recycled after max_pages pages, or after any error, so a leaking page cannot grow it forever
+    _instance: Optional["BrowserPool"] = None
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        size: int = 2,
+        page_timeout: float = 30,
+        max_pages: int = 50,
+        blocked_resources: tuple[str, ...] = ("image", "font", "stylesheet", "media"),
+        lease_timeout: float = 60,
+    ):
+        self.size = max(size, 1)
+        self.page_timeout = page_timeout
+        self.max_pages = max(max_pages, 1)
+        self.blocked_patterns = [
+            pattern for resource in blocked_resources for pattern in BLOCKED_RESOURCE_PATTERNS.get(resource, [])
+        ]
+        self.lease_timeout = lease_timeout
+        # Most recently used first, the other sessions are only woken up when pages are rendered concurrently
+        self.idle: queue.LifoQueue[BrowserSession] = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.closed = False
+
+    @classmethod
+    def get(cls) -> "BrowserPool":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.from_env()
+            return cls._instance
+
+    @classmethod
+    def from_env(cls) -> "BrowserPool":
+        blocked_resources = os.environ.get("BROWSER_BLOCKED_RESOURCES", "image,font,stylesheet,media")
+        return cls(
+            size=int(os.environ.get("BROWSER_POOL_SIZE", 2)),
+            page_timeout=float(os.environ.get("BROWSER_PAGE_TIMEOUT", 30)),
+            max_pages=int(os.environ.get("BROWSER_MAX_PAGES", 50)),
+            blocked_resources=tuple(filter(None, (value.strip() for value in blocked_resources.split(",")))),
+            lease_timeout=float(os.environ.get("BROWSER_LEASE_TIMEOUT", 60)),
+        )
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            pool, cls._instance = cls._instance, None
+        if pool is not None:
+            pool.shutdown()
+
+    def warm(self, sessions: Optional[int] = None):
+        # Only spares the first pages a cold start, a browser that cannot start is reported by the scrapers rendering
+        try:
+            for _ in range(min(sessions or self.size, self.size) - self.idle.qsize()):
+                self.idle.put(self.start_session())
+        except Exception as e:
+            logger.error(f"Error starting browser sessions: {e}")
+
+    def render(self, url: str, wait_for: Optional[str] = None) -> str:
+        # Selenium is only imported by the scrapers that render pages
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # A page counts against the request cap of its host like any other request
+        with HostLimits.slot(url):
+            host = HostLimits.before_request(url)
+            try:
+                with self.session() as browser:
+                    with Metrics.timer("browser_render", host=host):
+                        browser.driver.get(url)
+                        if wait_for:
+                            WebDriverWait(browser.driver, self.page_timeout).until(
+                                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, wait_for))
+                            )
+                        browser.pages += 1
+                        page_source = browser.driver.page_source
+            except Exception as e:
+                HostLimits.record_failure(host, e)
+                raise
+        HostLimits.record_success(host)
+        return page_source
+
+    @contextmanager
+    def session(self) -> Iterator[BrowserSession]:
+        if not self.slots.acquire(timeout=self.lease_timeout):
+            raise TimeoutError(f"No browser session available within {self.lease_timeout} seconds")
+        browser = None
+        try:
+            try:
+                browser = self.idle.get_nowait()
+            except queue.Empty:
+                browser = self.start_session()
+            yield browser
+        except Exception:
+            if browser is not None:
+                Metrics.increment("browser_sessions_recycled")
+                browser.quit()
+                browser = None
+            raise
+        finally:
+            if browser is not None:
+                self.release(browser)
+            self.slots.release()
+
+    def release(self, browser: BrowserSession):
+        if self.closed or browser.pages >= self.max_pages:
+            logger.debug(f"Recycling browser session after {browser.pages} pages")
+            Metrics.increment("browser_sessions_recycled")
+            browser.quit()
+        else:
+            self.idle.put(browser)
+
+    def start_session(self) -> BrowserSession:
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--window-size=1280,1024")
+        if "*.png" in self.blocked_patterns:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+        # Waiting for the content is done per page with wait_for, the load event would also wait for subresources
+        options.page_load_strategy = "eager"
+        binary = os.environ.get("BROWSER_BINARY")
+        if binary:
+            options.binary_location = binary
+
+        with Metrics.timer("browser_start"):
+            driver = webdriver.Chrome(options=options)
+        try:
+            driver.set_page_load_timeout(self.page_timeout)
+            if self.blocked_patterns:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_patterns})
+        except Exception:
+            driver.quit()
+            raise
+        Metrics.increment("browser_sessions_started")
+        return BrowserSession(driver)
+
+    def shutdown(self):
+        # Sessions in use are quit when they are released
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().quit()
+            except queue.Empty:
+                break
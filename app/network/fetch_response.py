@@ -0,0 +1,30 @@
+import json
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Iterator, Optional
+
+
+@dataclass
+class FetchResponse:
+    url: str
+    status_code: int
+    content: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+    encoding: str = "utf-8"
+    stream: Optional[Iterator[bytes]] = None
+
+    @property
+    def unchanged(self) -> bool:
+        return self.status_code == HTTPStatus.NOT_MODIFIED
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self) -> Iterator[bytes]:
+        if self.stream is not None:
+            return self.stream
+        return iter([self.content])
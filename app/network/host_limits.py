@@ -0,0 +1,236 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import Metrics
+from sqlitedb import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class TokenBucket:
+    # Tokens are reserved under the lock and waited for outside of it, so callers are served in arrival order
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int,
+        cooldown: float,
+        state: str = CLOSED,
+        failures: int = 0,
+        opened_until: float = 0.0,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = state
+        self.failures = failures
+        self.opened_until = opened_until
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self, now: float) -> bool:
+        with self.lock:
+            if self.state == self.OPEN:
+                if now < self.opened_until:
+                    return False
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                # A single trial request decides whether the host is back, the others keep failing fast meanwhile
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> bool:
+        with self.lock:
+            changed = self.state != self.CLOSED or self.failures > 0
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+            return changed
+
+    def record_failure(self, now: float):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_until = now + self.cooldown
+                if opened:
+                    logger.warning(
+                        f"Circuit for {self.host} opened after {self.failures} failures, "
+                        f"retrying in {self.cooldown:.0f} seconds"
+                    )
+
+
+class HostLimits:
+    # Everything a scraper or the browser pool sends to one host goes through here, whichever scraper it comes from:
+    # - at most HTTP_HOST_CONCURRENCY requests in flight
+    # - HTTP_HOST_RATE requests per second with bursts of HTTP_HOST_BURST, 0 disables the limit
+    # - after HTTP_CIRCUIT_FAILURES failures in a row requests fail fast for HTTP_CIRCUIT_COOLDOWN seconds, then a
+    #   single trial request is let through. The breaker is stored in the database so cron runs share it
+    # Every setting can be overridden per host with a _<HOST> suffix, e.g. HTTP_HOST_RATE_WWW_HUMBLEBUNDLE_COM
+    _semaphores: dict[str, threading.BoundedSemaphore] = {}
+    _buckets: dict[str, Optional[TokenBucket]] = {}
+    _breakers: dict[str, Optional[CircuitBreaker]] = {}
+    _lock = threading.Lock()
+    # Hosts whose slot the current thread holds
+    _held = threading.local()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    @staticmethod
+    def get_setting(name: str, host: str, default: float) -> float:
+        suffix = "".join(character if character.isalnum() else "_" for character in host).upper()
+        return float(os.environ.get(f"{name}_{suffix}", os.environ.get(name, default)))
+
+    @classmethod
+    def get_semaphore(cls, host: str) -> threading.BoundedSemaphore:
+        with cls._lock:
+            semaphore = cls._semaphores.get(host)
+            if semaphore is None:
+                limit = max(int(cls.get_setting("HTTP_HOST_CONCURRENCY", host, 2)), 1)
+                semaphore = cls._semaphores[host] = threading.BoundedSemaphore(limit)
+            return semaphore
+
+    @classmethod
+    def get_bucket(cls, host: str) -> Optional[TokenBucket]:
+        with cls._lock:
+            if host not in cls._buckets:
+                rate = cls.get_setting("HTTP_HOST_RATE", host, 2)
+                burst = cls.get_setting("HTTP_HOST_BURST", host, 5)
+                cls._buckets[host] = TokenBucket(rate, burst) if rate > 0 else None
+            return cls._buckets[host]
+
+    @classmethod
+    def get_breaker(cls, host: str) -> Optional[CircuitBreaker]:
+        with cls._lock:
+            if host not in cls._breakers:
+                cls._breakers[host] = cls.load_breaker(host)
+            return cls._breakers[host]
+
+    @classmethod
+    def load_breaker(cls, host: str) -> Optional[CircuitBreaker]:
+        failure_threshold = int(cls.get_setting("HTTP_CIRCUIT_FAILURES", host, 3))
+        if failure_threshold <= 0:
+            return None
+        breaker = CircuitBreaker(host, failure_threshold, cls.get_setting("HTTP_CIRCUIT_COOLDOWN", host, 1800))
+        try:
+            saved = SQLiteDB().get_host_circuit(host)
+        except sqlite3.Error as e:
+            logger.warning(f"Error loading circuit state of {host}: {e}")
+            saved = None
+        if saved is not None:
+            breaker.state, breaker.failures, breaker.opened_until = saved
+        return breaker
+
+    @classmethod
+    def save_breaker(cls, breaker: CircuitBreaker):
+        # Losing a write only makes the next process start with an older state, it must not fail the scrape
+        try:
+            SQLiteDB().save_host_circuit(breaker.host, breaker.state, breaker.failures, breaker.opened_until)
+        except sqlite3.Error as e:
+            logger.warning(f"Error saving circuit state of {breaker.host}: {e}")
+
+    @classmethod
+    @contextmanager
+    def slot(cls, url: str) -> Iterator[None]:
+        # Every request takes a slot, and a scraper may also hold one around a whole target to cover a streamed body.
+        # A thread that already holds the slot of the host goes on with it, waiting for a second one could deadlock
+        host = cls.get_host(url)
+        held = cls._held.__dict__.setdefault("hosts", set())
+        if host in held:
+            yield
+            return
+
+        semaphore = cls.get_semaphore(host)
+        if not semaphore.acquire(blocking=False):
+            Metrics.increment("http_host_waits", host=host)
+            semaphore.acquire()
+        held.add(host)
+        try:
+            yield
+        finally:
+            held.discard(host)
+            semaphore.release()
+
+    @classmethod
+    def before_request(cls, url: str) -> str:
+        host = cls.get_host(url)
+        breaker = cls.get_breaker(host)
+        if breaker is not None and not breaker.allow(time.time()):
+            Metrics.increment("http_circuit_rejections", host=host)
+            opened_until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(breaker.opened_until))
+            raise CircuitOpenError(f"Circuit for {host} is open until {opened_until}")
+
+        bucket = cls.get_bucket(host)
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited:
+                Metrics.increment("http_rate_limit_wait_seconds", waited, host=host)
+        return host
+
+    @classmethod
+    def record_success(cls, host: str):
+        breaker = cls.get_breaker(host)
+        if breaker is not None and breaker.record_success():
+            cls.save_breaker(breaker)
+
+    @classmethod
+    def record_failure(cls, host: str, error: Exception):
+        breaker = cls.get_breaker(host)
+        if breaker is None:
+            return
+        if not cls.is_host_failure(error):
+            cls.record_success(host)
+            return
+        breaker.record_failure(time.time())
+        Metrics.increment("http_circuit_failures", host=host)
+        cls.save_breaker(breaker)
+
+    @staticmethod
+    def is_host_failure(error: Exception) -> bool:
+        # A 404 or 403 is an answer about the page, only errors, throttling and server faults count against the host
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+            return status_code == 429 or status_code >= 500
+        return True
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    final_url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    encoding: Optional[str]
+    stored_at: float
+
+
+class HTTPCache:
+    def __init__(self, folder: str, ttl: float, max_size: int):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.folder, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["HTTPCache"]:
+        # Next to the database by default, every process of one installation shares it whatever its working directory
+        folder = os.environ.get("HTTP_CACHE_FOLDER", f"{os.environ.get('DATABASE_PATH', 'db.sqlite3')}.http-cache")
+        if not folder:
+            return None
+
+        return cls(
+            folder=folder,
+            ttl=float(os.environ.get("HTTP_CACHE_TTL", 24 * 60 * 60)),
+            max_size=int(os.environ.get("HTTP_CACHE_MAX_SIZE", 100 * 1024 * 1024)),
+        )
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        entry = self.get(url)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        metadata_path, body_path = self.get_paths(url)
+        try:
+            with open(metadata_path, encoding="utf-8") as metadata_file:
+                entry = CacheEntry(**json.load(metadata_file))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Discarding unreadable cache entry for {url}: {e}")
+            self.invalidate(url)
+            return None
+
+        if time.time() - entry.stored_at > self.ttl or not os.path.exists(body_path):
+            self.invalidate(url)
+            return None
+
+        os.utime(metadata_path)
+        return entry
+
+    def read_body(self, url: str) -> Optional[bytes]:
+        _, body_path = self.get_paths(url)
+        try:
+            with open(body_path, "rb") as body_file:
+                return body_file.read()
+        except FileNotFoundError:
+            return None
+
+    def store(self, url: str, final_url: str, headers: dict[str, str], encoding: Optional[str], body: bytes):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        entry = CacheEntry(
+            url=url,
+            final_url=final_url,
+            etag=etag,
+            last_modified=last_modified,
+            encoding=encoding,
+            stored_at=time.time(),
+        )
+        metadata_path, body_path = self.get_paths(url)
+        self.write_atomically(body_path, body)
+        self.write_atomically(metadata_path, json.dumps(asdict(entry)).encode("utf-8"))
+        self.evict()
+
+    def store_stream(
+        self, url: str, final_url: str, headers: dict[str, str], encoding: Optional[str], chunks: Iterator[bytes]
+    ) -> Iterator[bytes]:
+        if not headers.get("ETag") and not headers.get("Last-Modified"):
+            yield from chunks
+            return
+
+        metadata_path, body_path = self.get_paths(url)
+        temporary_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        completed = False
+        try:
+            with open(temporary_path, "wb") as temporary_file:
+                for chunk in chunks:
+                    temporary_file.write(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            # A partially consumed stream must not leave validators pointing at a truncated body
+            if not completed:
+                self.remove_files(temporary_path)
+
+        self.remove_files(metadata_path)
+        os.replace(temporary_path, body_path)
+        entry = CacheEntry(
+            url=url,
+            final_url=final_url,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            encoding=encoding,
+            stored_at=time.time(),
+        )
+        self.write_atomically(metadata_path, json.dumps(asdict(entry)).encode("utf-8"))
+        self.evict()
+
+    def invalidate(self, url: Optional[str] = None):
+        self.remove_files(*(self.get_paths(url) if url else self.list_files()))
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        now = time.time()
+        for metadata_path in self.list_files(".json"):
+            body_path = metadata_path[:-len(".json")] + ".body"
+            try:
+                last_used = os.path.getmtime(metadata_path)
+                size = os.path.getsize(metadata_path) + os.path.getsize(body_path)
+            except FileNotFoundError:
+                continue
+
+            if now - last_used > self.ttl:
+                self.remove_files(metadata_path, body_path)
+                continue
+
+            entries.append((last_used, size, metadata_path, body_path))
+            total_size += size
+
+        for _, size, metadata_path, body_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self.remove_files(metadata_path, body_path)
+            total_size -= size
+
+    def get_paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base_path = os.path.join(self.folder, key)
+        return f"{base_path}.json", f"{base_path}.body"
+
+    def list_files(self, suffix: str = "") -> list[str]:
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.folder, name)
+            for name in names
+            if name.endswith((suffix,) if suffix else (".json", ".body"))
+        ]
+
+    @staticmethod
+    def remove_files(*paths: str):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def write_atomically(path: str, content: bytes):
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary_path, path)
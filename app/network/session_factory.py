@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    elapsed_seconds: float = 0.0
+    connections_opened: int = 0
+    status_codes: dict[int, int] = field(default_factory=dict)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def __init__(self, timeout: tuple[float, float], *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class SessionFactory:
+    _session: Optional[requests.Session] = None
+    _adapter: Optional[TimeoutHTTPAdapter] = None
+    _metrics: dict[str, HostMetrics] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                cls._session, cls._adapter = cls.create_session()
+            return cls._session
+
+    @classmethod
+    def create_session(cls) -> tuple[requests.Session, TimeoutHTTPAdapter]:
+        retry = Retry(
+            total=int(os.environ.get("HTTP_RETRIES", 3)),
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            backoff_factor=float(os.environ.get("HTTP_BACKOFF_FACTOR", 0.5)),
+            backoff_jitter=float(os.environ.get("HTTP_BACKOFF_JITTER", 0.5)),
+            backoff_max=float(os.environ.get("HTTP_BACKOFF_MAX", 30)),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        pool_size = int(os.environ.get("HTTP_POOL_SIZE", 10))
+        adapter = TimeoutHTTPAdapter(
+            timeout=(
+                float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)),
+                float(os.environ.get("HTTP_READ_TIMEOUT", 30)),
+            ),
+            max_retries=retry,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.hooks["response"].append(cls.record_response)
+        return session, adapter
+
+    @classmethod
+    def record_response(cls, response: requests.Response, *args, **kwargs):
+        host = urlsplit(response.url).netloc
+        retries = response.raw.retries if response.raw is not None else None
+        with cls._lock:
+            metrics = cls._metrics.setdefault(host, HostMetrics())
+            metrics.requests += 1
+            metrics.errors += 1 if response.status_code >= 400 else 0
+            metrics.retries += len(retries.history) if retries is not None else 0
+            metrics.elapsed_seconds += response.elapsed.total_seconds()
+            metrics.status_codes[response.status_code] = metrics.status_codes.get(response.status_code, 0) + 1
+
+    @classmethod
+    def get_host_metrics(cls) -> dict[str, HostMetrics]:
+        with cls._lock:
+            if cls._adapter is not None:
+                pools = cls._adapter.poolmanager.pools
+                for pool in filter(None, (pools.get(key) for key in pools.keys())):
+                    host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                    cls._metrics.setdefault(host, HostMetrics()).connections_opened = pool.num_connections
+            return dict(cls._metrics)
+
+    @classmethod
+    def log_host_metrics(cls):
+        for host, metrics in cls.get_host_metrics().items():
+            logger.info(
+                f"HTTP {host}: {metrics.requests} requests, {metrics.errors} errors, {metrics.retries} retries, "
+                f"{metrics.connections_opened} connections, {metrics.elapsed_seconds:.2f}s"
+            )
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+            cls._session = None
+            cls._adapter = None
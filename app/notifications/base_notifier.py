@@ -1,10 +1,16 @@
 import abc
+from typing import Optional
 
 from items.base_item import BaseItem
 from scrapers.base_scraper import BaseScraper
 
 
+class NotifierNotConfiguredError(Exception):
+    pass
+
+
 class BaseNotifier(abc.ABC):
     @abc.abstractmethod
-    def notify(self, scraped_data: dict[type[BaseScraper], list[BaseItem]]):
+    def notify(self, scraped_data: dict[type[BaseScraper], list[BaseItem]]) -> Optional[list[BaseItem]]:
+        # Returns the items that were actually delivered; None means everything was
         pass
@@ -1,7 +1,138 @@
-from notifications.base_notifier import BaseNotifier
+import datetime
+import logging
+import os
+
+from items.base_item import BaseItem
+from items.error_item import ErrorItem
+from items.scraped_item import ScrapedItem
+from network.session_factory import SessionFactory
+from notifications.base_notifier import BaseNotifier, NotifierNotConfiguredError
+from notifications.email_renderer import format_time_left, to_naive_epoch
+from notifications.webhook_delivery import WebhookMessage, WebhookSendQueue
+from scrapers.base_scraper import BaseScraper
+
+logger = logging.getLogger(__name__)
+
+# https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS = 6000
+MAX_CONTENT_LENGTH = 2000
+MAX_TITLE_LENGTH = 256
+MAX_DESCRIPTION_LENGTH = 4096
+MAX_FOOTER_LENGTH = 2048
+
+BUNDLE_COLOR = 0x2E8B57
+ERROR_COLOR = 0xDC143C
+
+
+def truncate(value: str, limit: int) -> str:
+    return value if len(value) <= limit else f"{value[:limit - 1]}…"
+
+
+def embed_length(embed: dict) -> int:
+    return len(embed.get("title", "")) + len(embed.get("description", "")) + len(embed["footer"]["text"])
+
+
+def pack_embeds(embeds: list[tuple[dict, BaseItem]]) -> list[list[tuple[dict, BaseItem]]]:
+    # Every embed fits on its own, so filling each message in order until the next embed would
+    # break a limit is what keeps the digest chronological and the message count minimal
+    batches = []
+    batch = []
+    batch_length = 0
+    for embed, item in embeds:
+        length = embed_length(embed)
+        if len(batch) == MAX_EMBEDS_PER_MESSAGE or batch_length + length > MAX_EMBED_CHARACTERS:
+            batches.append(batch)
+            batch = []
+            batch_length = 0
+        batch.append((embed, item))
+        batch_length += length
+    if batch:
+        batches.append(batch)
+    return batches
 
 
 class DiscordNotifier(BaseNotifier):
-    def notify(self, message):
-        # Implementation
-        pass
+    def __init__(self):
+        # Without a webhook every run would count as undelivered and be notified again forever
+        self.webhook_urls = self.get_webhook_urls()
+        if not self.webhook_urls:
+            raise NotifierNotConfiguredError("DISCORD_WEBHOOK_URL is not configured")
+
+    def notify(self, scraped_data: dict[type[BaseScraper], list[BaseItem]]) -> list[BaseItem]:
+        messages = self.create_messages(self.webhook_urls, scraped_data)
+
+        queue = WebhookSendQueue(
+            SessionFactory.get_session(),
+            max_attempts=int(os.getenv("DISCORD_MAX_ATTEMPTS", 5)),
+            max_wait=float(os.getenv("DISCORD_MAX_RATE_LIMIT_WAIT", 60)),
+        )
+        with queue:
+            results = queue.send(messages)
+
+        failed_items = {id(item) for result in results if not result.delivered for item in result.message.items}
+        logger.info(f"Delivered {sum(result.delivered for result in results)}/{len(results)} webhook messages")
+        return [item for items in scraped_data.values() for item in items if id(item) not in failed_items]
+
+    def create_messages(
+        self, webhook_urls: list[str], scraped_data: dict[type[BaseScraper], list[BaseItem]]
+    ) -> list[WebhookMessage]:
+        now = to_naive_epoch(datetime.datetime.now())
+        embeds = [
+            (self.create_embed(item, now), item)
+            for items in scraped_data.values() for item in items
+            if isinstance(item, (ScrapedItem, ErrorItem))
+        ]
+        batches = pack_embeds(embeds)
+        username = os.getenv("DISCORD_USERNAME", "WebHunter")
+
+        messages = []
+        for webhook_url in webhook_urls:
+            for index, batch in enumerate(batches):
+                payload = {"username": username, "embeds": [embed for embed, _ in batch]}
+                if index == 0:
+                    payload["content"] = truncate(self.create_summary(scraped_data), MAX_CONTENT_LENGTH)
+                messages.append(WebhookMessage(
+                    webhook_url=webhook_url,
+                    payload=payload,
+                    items=[item for _, item in batch],
+                ))
+        return messages
+
+    @staticmethod
+    def create_embed(item: BaseItem, now: int) -> dict:
+        footer = {"text": truncate(item.scraper.__name__, MAX_FOOTER_LENGTH)}
+        if isinstance(item, ErrorItem):
+            return {
+                "title": truncate(f"Error (Code: {item.code})", MAX_TITLE_LENGTH),
+                "description": truncate(item.message, MAX_DESCRIPTION_LENGTH),
+                "color": ERROR_COLOR,
+                "footer": footer,
+            }
+
+        details = []
+        if item.price is not None:
+            details.append(f"Price: {item.price}")
+        if item.expires_at is not None:
+            details.append(format_time_left(item.expires_at, now))
+        embed = {
+            "title": truncate(item.name, MAX_TITLE_LENGTH),
+            "url": item.url,
+            "color": BUNDLE_COLOR,
+            "footer": footer,
+        }
+        if details:
+            # Discord rejects empty descriptions
+            embed["description"] = truncate(" · ".join(details), MAX_DESCRIPTION_LENGTH)
+        return embed
+
+    @staticmethod
+    def create_summary(scraped_data: dict[type[BaseScraper], list[BaseItem]]) -> str:
+        bundles_count = sum(isinstance(item, ScrapedItem) for items in scraped_data.values() for item in items)
+        errors_count = sum(isinstance(item, ErrorItem) for items in scraped_data.values() for item in items)
+        summary = f"🌍 WebHunter Daily Digest: {bundles_count} bundles"
+        return f"{summary}, {errors_count} errors" if errors_count else summary
+
+    @staticmethod
+    def get_webhook_urls() -> list[str]:
+        return [url.strip() for url in os.getenv("DISCORD_WEBHOOK_URL", "").split(",") if url.strip()]
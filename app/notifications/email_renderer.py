@@ -0,0 +1,256 @@
+import base64
+import calendar
+import datetime
+import html
+import io
+import itertools
+import re
+import uuid
+from email.policy import compat32
+from dataclasses import dataclass, field
+from typing import Optional, TextIO
+
+from items.base_item import BaseItem
+from items.error_item import ErrorItem
+from items.scraped_item import ScrapedItem
+from scrapers.base_scraper import BaseScraper
+
+HTML_HEADER = "<html><body><h2 style='color: navy;'>🌍 WebHunter Daily Digest 🌍</h2>"
+HTML_BUNDLES_COUNT = "<h3 style='color: green;'>🎉 Total Bundles Discovered: {count}</h3>".format
+HTML_ERRORS_COUNT = "<h3 style='color: red;'>❌ Total Errors: {count}</h3>".format
+HTML_BUNDLES_START = "<h4>🎁 <u>Bundles:</u></h4><ul>"
+HTML_LINKED_SCRAPER_START = "<li><a href='{url}'><strong>{scraper}</strong></a>:<ul>".format
+HTML_SCRAPER_START = "<li><strong>{scraper}</strong>:<ul>".format
+HTML_NAME = "<li>{name}</li>".format
+HTML_BUNDLE = "<li><a href='{url}'>{name}</a> {time_left}</li>".format
+HTML_SCRAPER_END = "</ul></li><br>"
+HTML_ERRORS_START = "<h4>🐛 <u>Error Log:</u></h4><ul>"
+HTML_ERROR_SCRAPER_START = "<li><strong>{scraper} Issues:</strong><ul>".format
+HTML_ERROR = "<li style='color: crimson;'>Error: {message} (Code: {code})</li>".format
+HTML_ERROR_SCRAPER_END = "</ul></li>"
+HTML_LIST_END = "</ul>"
+HTML_FOOTER = "<p style='font-size: 16px;'>Until tomorrow! 🚀</p></body></html>"
+
+TEXT_HEADER = "WebHunter Daily Digest\n\n"
+TEXT_BUNDLES_COUNT = "Total Bundles Discovered: {count}\n".format
+TEXT_ERRORS_COUNT = "Total Errors: {count}\n".format
+TEXT_BUNDLES_START = "\nBundles:\n"
+TEXT_LINKED_SCRAPER_START = "\n{scraper} ({url}):\n".format
+TEXT_SCRAPER_START = "\n{scraper}:\n".format
+TEXT_NAME = "  - {name}\n".format
+TEXT_BUNDLE = "  - {name} {time_left}\n    {url}\n".format
+TEXT_ERRORS_START = "\nError Log:\n"
+TEXT_ERROR_SCRAPER_START = "\n{scraper} Issues:\n".format
+TEXT_ERROR = "  - Error: {message} (Code: {code})\n".format
+TEXT_FOOTER = "\nUntil tomorrow!\n"
+
+ESCAPED_CHARACTERS = re.compile(r"[&<>\"']")
+
+PART_HEADERS = (
+    "--{boundary}\nContent-Type: text/{subtype}; charset=\"utf-8\"\nMIME-Version: 1.0\n"
+    "Content-Transfer-Encoding: base64\n\n"
+).format
+
+
+@dataclass
+class DigestSection:
+    scraper: type[BaseScraper]
+    bundles: list[ScrapedItem] = field(default_factory=list)
+    errors: list[ErrorItem] = field(default_factory=list)
+
+
+@dataclass
+class Digest:
+    sections: list[DigestSection]
+    bundles_count: int
+    errors_count: int
+
+
+def format_time_left(expires_at: Optional[int], now: int) -> str:
+    if expires_at is None:
+        return ""
+    days, seconds = divmod(expires_at - now, 86400)
+    hours = seconds // 3600
+    return f"{days} days, {hours} hours left" if days >= 0 else "Expired"
+
+
+def to_naive_epoch(now: datetime.datetime) -> int:
+    # Same convention as ScrapedItem.expires_at, wall clock time read as UTC
+    return calendar.timegm(now.timetuple())
+
+
+def escape(value: Optional[str]) -> str:
+    # Most names and urls need no escaping, searching is much cheaper than html.escape's five replaces
+    if not value:
+        return ""
+    return html.escape(value) if ESCAPED_CHARACTERS.search(value) else value
+
+
+class Base64Writer:
+    # Encodes what is written into whole base64 lines of a MIME part as it goes, the body is never held as a string
+    LINE_BYTES = 57
+
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.pending = bytearray()
+
+    def write(self, text: str):
+        self.pending += text.encode("utf-8")
+        complete = len(self.pending) - len(self.pending) % self.LINE_BYTES
+        if complete >= 64 * self.LINE_BYTES:
+            self.out.write(base64.encodebytes(self.pending[:complete]).decode("ascii"))
+            del self.pending[:complete]
+
+    def close(self):
+        if self.pending:
+            self.out.write(base64.encodebytes(self.pending).decode("ascii"))
+            self.pending.clear()
+
+
+class EmailRenderer:
+    def __init__(self, now: Optional[datetime.datetime] = None):
+        self.now = to_naive_epoch(now or datetime.datetime.now())
+        self.time_left_cache: dict[Optional[int], str] = {}
+
+    def time_left(self, expires_at: Optional[int]) -> str:
+        # Bundles of one store usually share a handful of expiration dates
+        time_left = self.time_left_cache.get(expires_at)
+        if time_left is None:
+            time_left = format_time_left(expires_at, self.now)
+            self.time_left_cache[expires_at] = time_left
+        return time_left
+
+    @staticmethod
+    def group(scraped_data: dict[type[BaseScraper], list[BaseItem]]) -> Digest:
+        sections = []
+        bundles_count = 0
+        errors_count = 0
+        for scraper, items in scraped_data.items():
+            section = DigestSection(scraper=scraper)
+            for item in items:
+                if isinstance(item, ScrapedItem):
+                    section.bundles.append(item)
+                elif isinstance(item, ErrorItem):
+                    section.errors.append(item)
+
+            section.bundles.sort(key=lambda item: (item.expires_at is None, item.expires_at or 0))
+            bundles_count += len(section.bundles)
+            errors_count += len(section.errors)
+            sections.append(section)
+
+        return Digest(sections=sections, bundles_count=bundles_count, errors_count=errors_count)
+
+    def render_message(self, scraped_data: dict[type[BaseScraper], list[BaseItem]], headers: dict[str, str]) -> str:
+        # A multipart/alternative message with both bodies encoded straight into it. Clients show the last
+        # alternative they support, so the HTML part goes after the plain text one
+        digest = self.group(scraped_data)
+        boundary = f"==============={uuid.uuid4().hex}=="
+        headers = {
+            **headers,
+            "Content-Type": f'multipart/alternative; boundary="{boundary}"',
+            "MIME-Version": "1.0",
+        }
+
+        out = io.StringIO()
+        # Folded and encoded the way email.message.Message writes them
+        for name, value in headers.items():
+            out.write(compat32.fold(name, value))
+        out.write("\n")
+        for subtype, write_body in (("plain", self.write_text), ("html", self.write_html)):
+            out.write(PART_HEADERS(boundary=boundary, subtype=subtype))
+            body = Base64Writer(out)
+            write_body(digest, body)
+            body.close()
+        out.write(f"--{boundary}--\n")
+        return out.getvalue()
+
+    def render_html(self, scraped_data: dict[type[BaseScraper], list[BaseItem]]) -> str:
+        html_body = io.StringIO()
+        self.write_html(self.group(scraped_data), html_body)
+        return html_body.getvalue()
+
+    def write_html(self, digest: Digest, out: TextIO):
+        write = out.write
+
+        write(HTML_HEADER)
+        if digest.bundles_count > 0:
+            write(HTML_BUNDLES_COUNT(count=digest.bundles_count))
+        if digest.errors_count > 0:
+            write(HTML_ERRORS_COUNT(count=digest.errors_count))
+
+        if digest.bundles_count > 0:
+            write(HTML_BUNDLES_START)
+            for section in digest.sections:
+                if not section.bundles:
+                    continue
+                scraper_name = section.scraper.__name__
+                if section.scraper.SINGLE_PAGE:
+                    # One link per page, a scraper can list several of them, such as consecutive Choice months
+                    for url, items in itertools.groupby(section.bundles, key=lambda item: item.url):
+                        write(HTML_LINKED_SCRAPER_START(url=escape(url), scraper=scraper_name))
+                        for item in items:
+                            write(HTML_NAME(name=escape(item.name)))
+                        write(HTML_SCRAPER_END)
+                else:
+                    write(HTML_SCRAPER_START(scraper=scraper_name))
+                    for item in section.bundles:
+                        write(HTML_BUNDLE(
+                            url=escape(item.url),
+                            name=escape(item.name),
+                            time_left=self.time_left(item.expires_at),
+                        ))
+                    write(HTML_SCRAPER_END)
+            write(HTML_LIST_END)
+
+        if digest.errors_count > 0:
+            write(HTML_ERRORS_START)
+            for section in digest.sections:
+                if not section.errors:
+                    continue
+                write(HTML_ERROR_SCRAPER_START(scraper=section.scraper.__name__))
+                for item in section.errors:
+                    write(HTML_ERROR(message=escape(item.message), code=item.code))
+                write(HTML_ERROR_SCRAPER_END)
+            write(HTML_LIST_END)
+
+        write(HTML_FOOTER)
+
+    def write_text(self, digest: Digest, out: TextIO):
+        write = out.write
+
+        write(TEXT_HEADER)
+        if digest.bundles_count > 0:
+            write(TEXT_BUNDLES_COUNT(count=digest.bundles_count))
+        if digest.errors_count > 0:
+            write(TEXT_ERRORS_COUNT(count=digest.errors_count))
+
+        if digest.bundles_count > 0:
+            write(TEXT_BUNDLES_START)
+            for section in digest.sections:
+                if not section.bundles:
+                    continue
+                scraper_name = section.scraper.__name__
+                if section.scraper.SINGLE_PAGE:
+                    for url, items in itertools.groupby(section.bundles, key=lambda item: item.url):
+                        write(TEXT_LINKED_SCRAPER_START(url=url or "", scraper=scraper_name))
+                        for item in items:
+                            write(TEXT_NAME(name=item.name))
+                else:
+                    write(TEXT_SCRAPER_START(scraper=scraper_name))
+                    for item in section.bundles:
+                        write(TEXT_BUNDLE(
+                            url=item.url or "",
+                            name=item.name,
+                            time_left=self.time_left(item.expires_at),
+                        ))
+
+        if digest.errors_count > 0:
+            write(TEXT_ERRORS_START)
+            for section in digest.sections:
+                if not section.errors:
+                    continue
+                write(TEXT_ERROR_SCRAPER_START(scraper=section.scraper.__name__))
+                for item in section.errors:
+                    write(TEXT_ERROR(message=item.message, code=item.code))
+
+        write(TEXT_FOOTER)
@@ -0,0 +1,156 @@
+import logging
+import smtplib
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from items.base_item import BaseItem
+from notifications.smtp_parameters import SMTPParameters
+
+logger = logging.getLogger(__name__)
+
+# SMTPException is an OSError too, so anything else from smtplib is an answer of a live server, see is_connection_error
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+
+def is_connection_error(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+@dataclass
+class OutgoingEmail:
+    recipients: list[str]
+    message: str
+    items: list[BaseItem] = field(default_factory=list)
+
+
+@dataclass
+class DeliveryResult:
+    email: OutgoingEmail
+    refused: dict[str, tuple[int, bytes]] = field(default_factory=dict)
+    error: Optional[Exception] = None
+
+    @property
+    def delivered(self) -> bool:
+        return self.error is None
+
+
+class SMTPDeliveryEngine:
+    def __init__(
+        self,
+        smtp_parameters: SMTPParameters,
+        max_attempts: int = 3,
+        backoff_factor: float = 1,
+        backoff_max: float = 30,
+    ):
+        self.smtp_parameters = smtp_parameters
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.server: Optional[smtplib.SMTP] = None
+
+    def __enter__(self) -> "SMTPDeliveryEngine":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        parameters = self.smtp_parameters
+        server = smtplib.SMTP(parameters.host, parameters.port, timeout=parameters.timeout)
+        try:
+            if parameters.starttls:
+                server.starttls()
+            if parameters.password:
+                server.login(parameters.username, parameters.password)
+            server.ehlo_or_helo_if_needed()
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except CONNECTION_ERRORS:
+            self.server.close()
+        self.server = None
+
+    def drop(self):
+        # The session is dead, QUIT would only wait for the timeout
+        if self.server is None:
+            return
+        try:
+            self.server.close()
+        except OSError:
+            pass
+        self.server = None
+
+    def send(self, emails: list[OutgoingEmail]) -> list[DeliveryResult]:
+        return [self.send_one(email) for email in emails]
+
+    def send_one(self, email: OutgoingEmail) -> DeliveryResult:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if self.server is None:
+                    self.connect()
+                refused = self.sendmail(self.smtp_parameters.username, email.recipients, email.message)
+                for recipient, (code, response) in refused.items():
+                    logger.warning(f"Recipient {recipient} refused: {code} {response}")
+                return DeliveryResult(email=email, refused=refused)
+            except CONNECTION_ERRORS as e:
+                if not is_connection_error(e):
+                    logger.error(f"Error sending email to {', '.join(email.recipients)}: {e}")
+                    self.reset()
+                    return DeliveryResult(email=email, error=e)
+
+                # The session died (idle timeout, network blip...), open a new one and retry this message
+                logger.warning(f"SMTP connection lost on attempt {attempt}/{self.max_attempts}: {e}")
+                self.drop()
+                error = e
+                if attempt < self.max_attempts:
+                    time.sleep(min(self.backoff_factor * 2 ** (attempt - 1), self.backoff_max))
+
+        return DeliveryResult(email=email, error=error)
+
+    def sendmail(self, from_address: str, recipients: list[str], message: str) -> dict[str, tuple[int, bytes]]:
+        if not self.server.has_extn("pipelining"):
+            return self.server.sendmail(from_address, recipients, message)
+
+        # Send the envelope in one round trip and only then read the replies (RFC 2920)
+        commands = [f"MAIL FROM:{smtplib.quoteaddr(from_address)}"]
+        commands.extend(f"RCPT TO:{smtplib.quoteaddr(recipient)}" for recipient in recipients)
+        self.server.send("".join(f"{command}\r\n" for command in commands))
+
+        sender_code, sender_response = self.server.getreply()
+        refused = {}
+        for recipient in recipients:
+            code, response = self.server.getreply()
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+
+        if sender_code != 250:
+            self.reset()
+            raise smtplib.SMTPSenderRefused(sender_code, sender_response, from_address)
+        if len(refused) == len(recipients):
+            self.reset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, response = self.server.data(message)
+        if code != 250:
+            self.reset()
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+    def reset(self):
+        # Nothing to reset when connecting itself failed, e.g. on a refused login
+        if self.server is None:
+            return
+        try:
+            self.server.rset()
+        except CONNECTION_ERRORS:
+            self.drop()
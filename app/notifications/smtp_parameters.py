@@ -8,3 +8,5 @@ class SMTPParameters:
     username: str
     password: str
     to: list[str]
+    starttls: bool = True
+    timeout: float = 30
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import requests
+
+from items.base_item import BaseItem
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+@dataclass
+class WebhookMessage:
+    webhook_url: str
+    payload: dict
+    items: list[BaseItem] = field(default_factory=list)
+
+
+@dataclass
+class WebhookResult:
+    message: WebhookMessage
+    status_code: Optional[int] = None
+    error: Optional[Exception] = None
+
+    @property
+    def delivered(self) -> bool:
+        return self.error is None
+
+
+# Every webhook is its own rate limit route, a route waiting for its bucket to reset does not hold
+# back the others. The queue only waits when every pending route is blocked, on an event close() interrupts
+class WebhookSendQueue:
+    def __init__(
+        self,
+        session: requests.Session,
+        max_attempts: int = 5,
+        max_wait: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session = session
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.clock = clock
+        self.blocked_until: dict[str, float] = {}
+        self.global_blocked_until = 0.0
+        self.closed = threading.Event()
+
+    def __enter__(self) -> "WebhookSendQueue":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.closed.set()
+
+    def send(self, messages: list[WebhookMessage]) -> list[WebhookResult]:
+        routes: dict[str, deque[tuple[WebhookMessage, int]]] = {}
+        for message in messages:
+            routes.setdefault(message.webhook_url, deque()).append((message, 1))
+
+        results = []
+        while any(routes.values()):
+            now = self.clock()
+            waits = {route: self.wait_time(route, now) for route, pending in routes.items() if pending}
+            ready = [route for route, wait in waits.items() if wait <= 0]
+            if not ready:
+                wait = min(waits.values())
+                if wait > self.max_wait or self.closed.wait(wait):
+                    error = RateLimitExceeded(f"Rate limited for {wait:.1f} seconds")
+                    results.extend(
+                        WebhookResult(message=message, error=error)
+                        for pending in routes.values() for message, _ in pending
+                    )
+                    break
+                continue
+
+            for route in ready:
+                message, attempt = routes[route].popleft()
+                result = self.post(message)
+                if result.delivered or attempt >= self.max_attempts or not self.retryable(result):
+                    results.append(result)
+                else:
+                    logger.warning(f"Webhook attempt {attempt}/{self.max_attempts} failed: {result.error}")
+                    routes[route].appendleft((message, attempt + 1))
+
+        return results
+
+    def post(self, message: WebhookMessage) -> WebhookResult:
+        route = message.webhook_url
+        try:
+            # wait=true makes Discord confirm the message was created instead of just queued
+            response = self.session.post(route, json=message.payload, params={"wait": "true"})
+        except requests.RequestException as e:
+            self.block(route, 1.0)
+            return WebhookResult(message=message, error=e)
+
+        self.update_rate_limit(route, response)
+        if response.status_code == 429:
+            return WebhookResult(message=message, status_code=429, error=RateLimitExceeded(response.text))
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if response.status_code >= 500:
+                self.block(route, 1.0)
+            return WebhookResult(message=message, status_code=response.status_code, error=e)
+        return WebhookResult(message=message, status_code=response.status_code)
+
+    @staticmethod
+    def retryable(result: WebhookResult) -> bool:
+        return result.status_code is None or result.status_code == 429 or result.status_code >= 500
+
+    def wait_time(self, route: str, now: float) -> float:
+        return max(self.blocked_until.get(route, 0.0), self.global_blocked_until) - now
+
+    def block(self, route: str, seconds: float):
+        self.blocked_until[route] = max(self.blocked_until.get(route, 0.0), self.clock() + seconds)
+
+    def update_rate_limit(self, route: str, response: requests.Response):
+        headers = response.headers
+        if headers.get("X-RateLimit-Remaining") == "0":
+            self.block(route, float(headers.get("X-RateLimit-Reset-After", 1)))
+
+        if response.status_code != 429:
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        retry_after = float(body.get("retry_after") or headers.get("Retry-After") or 1)
+        if body.get("global") or headers.get("X-RateLimit-Global"):
+            self.global_blocked_until = max(self.global_blocked_until, self.clock() + retry_after)
+        else:
+            self.block(route, retry_after)
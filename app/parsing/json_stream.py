@@ -0,0 +1,154 @@
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Union
+
+WHITESPACE = " \t\n\r"
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING_END = re.compile(r'["\\]')
+SCALAR_END = re.compile(r"[,}\]\s]")
+COMPACT_THRESHOLD = 1024 * 1024
+
+
+class JSONStreamReader:
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+
+    def read_more(self) -> bool:
+        if self.exhausted:
+            return False
+
+        # Drop what was already consumed so memory stays bounded by the largest single value
+        if self.position > COMPACT_THRESHOLD:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.buffer += text
+                return True
+
+        self.buffer += self.decoder.decode(b"", final=True)
+        self.exhausted = True
+        return False
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def expect(self, character: str):
+        if self.peek() != character:
+            raise ValueError(f"Expected {character!r} at position {self.position} of the JSON stream")
+        self.position += 1
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+                # Containers and strings end on their own delimiter. A number or literal is only complete once what
+                # follows it is seen, "1." may still become 1.5 with the next chunk
+                if self.exhausted or isinstance(value, (dict, list, str)) or SCALAR_END.match(self.buffer, end):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.read_more()
+
+    def skip_value(self):
+        first = self.peek()
+        if first == '"':
+            self.position += 1
+            self.skip_string()
+        elif first in "[{":
+            self.skip_container()
+        else:
+            self.skip_scalar()
+
+    def skip_string(self):
+        while True:
+            match = STRING_END.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+            elif match.group() == "\\":
+                if match.end() < len(self.buffer):
+                    self.position = match.end() + 1
+                    continue
+                self.position = match.start()
+            else:
+                self.position = match.end()
+                return
+
+            if not self.read_more():
+                raise ValueError("Unterminated string in JSON stream")
+
+    def skip_container(self):
+        depth = 0
+        while True:
+            match = STRUCTURE.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+                if not self.read_more():
+                    raise ValueError("Unterminated container in JSON stream")
+                continue
+
+            self.position = match.end()
+            token = match.group()
+            if token == '"':
+                self.skip_string()
+            elif token in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def skip_scalar(self):
+        while True:
+            match = SCALAR_END.search(self.buffer, self.position)
+            if match is not None:
+                self.position = match.start()
+                return
+            self.position = len(self.buffer)
+            if not self.read_more():
+                return
+
+
+def iter_array_items(chunks: Iterable[Union[bytes, str]], key: str) -> Iterator:
+    # Like iterating over json.loads(...)[key]: a payload without the key raises KeyError instead of looking empty
+    reader = JSONStreamReader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        raise KeyError(key)
+
+    while True:
+        name = reader.decode_value()
+        reader.expect(":")
+        if name == key:
+            if reader.peek() != "[":
+                raise ValueError(f"Expected an array for {key!r} at position {reader.position} of the JSON stream")
+            reader.position += 1
+            if reader.peek() == "]":
+                return
+            while True:
+                yield reader.decode_value()
+                if reader.peek() == "]":
+                    return
+                reader.expect(",")
+
+        reader.skip_value()
+        if reader.peek() == "}":
+            raise KeyError(key)
+        reader.expect(",")
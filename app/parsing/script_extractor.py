@@ -0,0 +1,63 @@
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+CHUNK_SIZE = 64 * 1024
+SCRIPT_END = re.compile(r"</script\s*>", re.IGNORECASE)
+
+
+class ScriptFound(Exception):
+    pass
+
+
+class ScriptTextParser(HTMLParser):
+    def __init__(self, script_id: str):
+        super().__init__(convert_charrefs=False)
+        self.script_id = script_id
+        self.inside_script = False
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script" and dict(attrs).get("id") == self.script_id:
+            self.inside_script = True
+
+    def handle_data(self, data):
+        if self.inside_script:
+            self.parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self.inside_script:
+            raise ScriptFound()
+
+
+def extract_script_text(html: str, script_id: str) -> Optional[str]:
+    text = scan_script_text(html, script_id)
+    if text is None:
+        text = parse_script_text(html, script_id)
+    return text
+
+
+def scan_script_text(html: str, script_id: str) -> Optional[str]:
+    # Script contents cannot contain "</script", so once the opening tag is located the text is a plain slice
+    for quote in ('"', "'"):
+        needle = f"id={quote}{script_id}{quote}"
+        position = html.find(needle)
+        while position != -1:
+            tag_start = html.rfind("<", 0, position)
+            if html[tag_start:tag_start + 7].lower() == "<script":
+                content_start = html.find(">", position) + 1
+                content_end = SCRIPT_END.search(html, content_start)
+                if content_start and content_end:
+                    return html[content_start:content_end.start()]
+            position = html.find(needle, position + len(needle))
+    return None
+
+
+def parse_script_text(html: str, script_id: str) -> Optional[str]:
+    parser = ScriptTextParser(script_id)
+    try:
+        for start in range(0, len(html), CHUNK_SIZE):
+            parser.feed(html[start:start + CHUNK_SIZE])
+    except ScriptFound:
+        return "".join(parser.parts)
+    return None
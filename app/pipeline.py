@@ -0,0 +1,242 @@
+import abc
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from items.base_item import BaseItem
+from items.error_item import ErrorItem
+from items.item_batch import ItemBatch
+from items.scraped_item import ScrapedItem
+from metrics import Metrics
+from scrapers.base_scraper import BaseScraper
+from sent_filter import BloomFilter, SentItemsFilter
+from snapshots import ScraperSnapshots, SnapshotDiff
+from sqlitedb import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# A chunk of items of a scraper, or the error that stopped it
+ScraperResult = tuple[BaseScraper, list[BaseItem], Optional[Exception]]
+
+
+class PipelineStage(abc.ABC):
+    @abc.abstractmethod
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        pass
+
+
+class SnapshotStage(PipelineStage):
+    def __init__(self):
+        # Only items added or changed since the previous snapshot of their scraper go on to dedup and storage
+        self.diffs: dict[type[BaseScraper], SnapshotDiff] = {}
+        self.failed: set[type[BaseScraper]] = set()
+        self.discarded: set[str] = set()
+
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        changed_items = []
+        for item in items:
+            if isinstance(item, ScrapedItem) and self.get_diff(item.scraper).classify(item) is None:
+                continue
+            if isinstance(item, ErrorItem):
+                self.failed.add(item.scraper)
+            changed_items.append(item)
+        return changed_items
+
+    def get_diff(self, scraper_class: type[BaseScraper]) -> SnapshotDiff:
+        diff = self.diffs.get(scraper_class)
+        if diff is None:
+            diff = self.diffs[scraper_class] = ScraperSnapshots.diff(scraper_class.__name__)
+        return diff
+
+    def complete(self, scraper_class: type[BaseScraper]):
+        # A scraper that reported an error may have listed only part of its items, none of the rest is removed
+        if scraper_class not in self.failed:
+            self.get_diff(scraper_class).complete = True
+
+    def discard(self, items: list[BaseItem]):
+        # A chunk that failed after this stage was neither stored nor notified, it is kept out of the snapshot like
+        # an undelivered item so the next run sees it as changed again
+        self.discarded.update(item.content_hash for item in items if isinstance(item, ScrapedItem))
+
+    def save(self, undelivered: set[str]):
+        for diff in self.diffs.values():
+            ScraperSnapshots.save(diff, undelivered | self.discarded)
+
+
+class DedupStage(PipelineStage):
+    def __init__(self, notifiers: Optional[list[str]] = None):
+        # With notifiers, an item stays new until every one of them has delivered it
+        self.notifiers = notifiers
+
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        db = SQLiteDB()
+
+        scraped_items = [item for item in items if isinstance(item, ScrapedItem)]
+        sent_filter = SentItemsFilter.get(db.conn) if self.notifiers else None
+        if sent_filter is None:
+            unsent_items = {id(item) for item in db.filter_already_sent(scraped_items, self.notifiers)}
+        else:
+            # A filter has no false negatives, an item missing from it is new without asking the database. Only the
+            # positives of a bloom filter may be false and are confirmed there, the keys of a set are exact
+            unsent_items = set()
+            probably_sent = []
+            for item in scraped_items:
+                if SentItemsFilter.is_sent(sent_filter, item.content_hash, self.notifiers):
+                    probably_sent.append(item)
+                else:
+                    unsent_items.add(id(item))
+            if isinstance(sent_filter, BloomFilter):
+                unsent_items.update(id(item) for item in db.filter_already_sent(probably_sent, self.notifiers))
+
+        return [
+            item
+            for item in items
+            if (isinstance(item, ScrapedItem) and id(item) in unsent_items) or isinstance(item, ErrorItem)
+        ]
+
+
+class PersistStage(PipelineStage):
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        db = SQLiteDB()
+        db.add_scraped_items(ItemBatch.from_items(item for item in items if isinstance(item, ScrapedItem)))
+        return items
+
+
+class NotifyBufferStage(PipelineStage):
+    def __init__(self, scraper_classes: Iterable[type[BaseScraper]] = ()):
+        # Registering the scrapers upfront keeps the notifier dict in execution order, not completion order
+        self.buffers: dict[type[BaseScraper], list[BaseItem]] = {
+            scraper_class: [] for scraper_class in scraper_classes
+        }
+
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        for item in items:
+            self.buffers.setdefault(item.scraper, []).append(item)
+        return items
+
+    @property
+    def scraped_data(self) -> dict[type[BaseScraper], list[BaseItem]]:
+        return {scraper_class: items for scraper_class, items in self.buffers.items() if items}
+
+
+class ItemPipeline:
+    def __init__(self, stages: list[PipelineStage]):
+        self.stages = stages
+
+    def process(self, items: list[BaseItem]) -> list[BaseItem]:
+        for stage in self.stages:
+            if not items:
+                break
+            items = stage.process(items)
+        return items
+
+
+class ScraperRunner:
+    STARTED = "started"
+    CHUNK = "chunk"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        scrapers: list[BaseScraper],
+        max_workers: int,
+        timeout: float,
+        chunk_size: Optional[int] = None,
+    ):
+        self.scrapers = scrapers
+        self.max_workers = max(max_workers, 1)
+        self.timeout = timeout
+        self.chunk_size = chunk_size or int(os.environ.get("PIPELINE_CHUNK_SIZE", 500))
+        # Bounded so a fast source waits for the database instead of piling up in memory
+        self.events = queue.Queue(maxsize=self.max_workers * 4)
+        self.cancelled = [threading.Event() for _ in scrapers]
+
+    def run(self) -> Iterator[ScraperResult]:
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scraper")
+        for index, scraper in enumerate(self.scrapers):
+            executor.submit(self.run_scraper, index, scraper)
+
+        pending = set(range(len(self.scrapers)))
+        started_at = {}
+        last_progress = time.monotonic()
+        try:
+            while pending:
+                deadlines = {
+                    index: started_at.get(index, last_progress) + self.timeout
+                    for index in pending
+                }
+                try:
+                    kind, index, payload = self.events.get(
+                        timeout=max(min(deadlines.values()) - time.monotonic(), 0)
+                    )
+                except queue.Empty:
+                    now = time.monotonic()
+                    for index in sorted(pending):
+                        if deadlines[index] <= now:
+                            pending.discard(index)
+                            self.cancelled[index].set()
+                            yield self.scrapers[index], [], self.create_timeout_error(index, started_at)
+                    continue
+
+                # Late events of a scraper that already timed out are dropped
+                if index not in pending:
+                    continue
+
+                last_progress = time.monotonic()
+                if kind == self.STARTED:
+                    started_at[index] = last_progress
+                elif kind == self.CHUNK:
+                    yield self.scrapers[index], payload, None
+                elif kind == self.FINISHED:
+                    pending.discard(index)
+                elif kind == self.FAILED:
+                    pending.discard(index)
+                    yield self.scrapers[index], [], payload
+        finally:
+            for cancelled in self.cancelled:
+                cancelled.set()
+            # A timed out scraper keeps its worker thread busy until its socket gives up, so don't wait for it
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_scraper(self, index: int, scraper: BaseScraper):
+        self.put(self.STARTED, index)
+        logger.info(f"Executing: {scraper.__class__.__name__}")
+        chunk = []
+        try:
+            with Metrics.timer("scrape", scraper=scraper.__class__.__name__):
+                for item in scraper.scrape_iter():
+                    chunk.append(item)
+                    if len(chunk) >= self.chunk_size:
+                        if not self.put(self.CHUNK, index, chunk):
+                            return
+                        chunk = []
+        except Exception as e:
+            # Items yielded before the failure are still delivered
+            if chunk:
+                self.put(self.CHUNK, index, chunk)
+            self.put(self.FAILED, index, e)
+            return
+
+        if chunk:
+            self.put(self.CHUNK, index, chunk)
+        self.put(self.FINISHED, index)
+
+    def put(self, kind: str, index: int, payload=None) -> bool:
+        while not self.cancelled[index].is_set():
+            try:
+                self.events.put((kind, index, payload), timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def create_timeout_error(self, index: int, started_at: dict[int, float]) -> TimeoutError:
+        scraper_name = self.scrapers[index].__class__.__name__
+        if index not in started_at:
+            return TimeoutError(f"{scraper_name} did not start within {self.timeout} seconds")
+        return TimeoutError(f"{scraper_name} timed out after {self.timeout} seconds")
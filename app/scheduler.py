@@ -0,0 +1,109 @@
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from factories.scraper_enums import ScraperKey
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduleEntry:
+    scraper_enum: ScraperKey
+    interval: float
+    jitter: float
+    next_run: float = 0.0
+
+    def reschedule(self, now: float):
+        self.next_run = now + self.interval + random.uniform(0, self.jitter)
+
+    @classmethod
+    def from_env(cls, scraper_enum: ScraperKey, interval: float, jitter: float) -> "ScheduleEntry":
+        # SCRAPER_INTERVAL_<NAME> / SCRAPER_JITTER_<NAME> override the defaults for a single scraper
+        suffix = cls.get_name(scraper_enum).upper()
+        return cls(
+            scraper_enum=scraper_enum,
+            interval=float(os.environ.get(f"SCRAPER_INTERVAL_{suffix}", interval)),
+            jitter=float(os.environ.get(f"SCRAPER_JITTER_{suffix}", jitter)),
+        )
+
+    @staticmethod
+    def get_name(scraper_enum: ScraperKey) -> str:
+        return getattr(scraper_enum, "value", scraper_enum)
+
+    @property
+    def name(self) -> str:
+        return self.get_name(self.scraper_enum)
+
+
+class Scheduler:
+    def __init__(self, entries: list[ScheduleEntry], run: Callable[[list[ScraperKey]], None], max_runs: int = 1):
+        self.entries = entries
+        self.run = run
+        # Runs share the scraper and notifier instances of the daemon, so by default they are executed one at a time
+        self.executor = ThreadPoolExecutor(max_workers=max_runs, thread_name_prefix="run")
+        self.in_flight: dict[ScraperKey, Future] = {}
+        self.stopping = threading.Event()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def stop(self, signum: int = None, frame=None):
+        if signum is not None:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping the scheduler")
+        self.stopping.set()
+
+    def run_forever(self):
+        # Spread the first runs over the jitter window instead of hitting every site at start up
+        now = time.monotonic()
+        for entry in self.entries:
+            entry.next_run = now + random.uniform(0, entry.jitter)
+
+        while not self.stopping.is_set():
+            self.run_due(time.monotonic())
+            next_run = min(entry.next_run for entry in self.entries)
+            self.stopping.wait(max(next_run - time.monotonic(), 0))
+
+        self.shutdown()
+
+    def run_due(self, now: float):
+        due = []
+        for entry in self.entries:
+            if entry.next_run > now:
+                continue
+            entry.reschedule(now)
+            if self.is_in_flight(entry.scraper_enum):
+                logger.warning(f"Skipping {entry.name}, its previous run is still queued or in flight")
+                Metrics.increment("scheduler_skipped_runs", scraper=entry.name)
+                continue
+            due.append(entry.scraper_enum)
+
+        if due:
+            logger.info(f"Scheduling run for {', '.join(map(ScheduleEntry.get_name, due))}")
+            future = self.executor.submit(self.run_safely, due)
+            for scraper_enum in due:
+                self.in_flight[scraper_enum] = future
+
+    def is_in_flight(self, scraper_enum: ScraperKey) -> bool:
+        future = self.in_flight.get(scraper_enum)
+        return future is not None and not future.done()
+
+    def run_safely(self, scraper_enums: list[ScraperKey]):
+        try:
+            self.run(scraper_enums)
+        except Exception as e:
+            # A failing run must not take the daemon down, the scrapers are simply tried again next interval
+            logger.exception(f"Error during scheduled run: {e}")
+            Metrics.increment("scheduler_failed_runs")
+
+    def shutdown(self):
+        logger.info("Waiting for in flight runs to finish")
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -1,9 +1,183 @@
 import abc
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Iterable, Iterator, Optional
+
+import requests
 
 from items.base_item import BaseItem
+from items.error_item import ErrorItem
+from items.scraped_item import ScrapedItem
+from metrics import Metrics
+from network.fetch_response import FetchResponse
+from network.host_limits import HostLimits
+from network.http_cache import HTTPCache
+from network.session_factory import SessionFactory
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ScrapeTarget:
+    url: str
+    locale: Optional[str] = None
+    category: Optional[str] = None
+    page: Optional[int] = None
 
 
 class BaseScraper(abc.ABC):
+    # All items share one page, notifications link the scraper once instead of every item
+    SINGLE_PAGE = False
+    # Pages are rendered by the shared headless browser pool instead of fetched with requests
+    USES_BROWSER = False
+    # Targets of one scraper fetched at once, HostLimits caps every host on top of this
+    TARGET_WORKERS = int(os.environ.get("SCRAPER_TARGET_WORKERS", 4))
+    # Set when a page was not modified and skipped, the run then misses its items and nothing counts as removed
+    listed_partially = False
+
+    _http_cache: Optional[HTTPCache] = None
+    _http_cache_loaded = False
+
     @abc.abstractmethod
     def scrape(self) -> list[BaseItem]:
         pass
+
+    def scrape_iter(self) -> Iterator[BaseItem]:
+        # Scrapers that can produce items incrementally override this; the rest are adapted from scrape()
+        yield from self.scrape()
+
+    def get_targets(self) -> list[ScrapeTarget]:
+        return []
+
+    def scrape_target(self, target: ScrapeTarget) -> Iterable[BaseItem]:
+        raise NotImplementedError
+
+    def scrape_targets(self) -> Iterator[BaseItem]:
+        # Targets are fetched concurrently and merged in the order they were declared, an item listed by several
+        # targets, such as a bundle offered in every locale, is only yielded once
+        targets = self.get_targets()
+        seen_hashes = set()
+        with ThreadPoolExecutor(
+            max_workers=max(min(len(targets), self.TARGET_WORKERS), 1),
+            thread_name_prefix=f"{type(self).__name__}-target",
+        ) as executor:
+            futures = [executor.submit(self.fetch_target, target) for target in targets]
+            for future in futures:
+                for item in future.result():
+                    if isinstance(item, ScrapedItem):
+                        if item.content_hash in seen_hashes:
+                            continue
+                        seen_hashes.add(item.content_hash)
+                    yield item
+
+    def fetch_target(self, target: ScrapeTarget) -> list[BaseItem]:
+        try:
+            with HostLimits.slot(target.url):
+                return list(self.scrape_target(target))
+        except Exception as e:
+            # One failing target is reported without dropping the items of the others
+            logger.exception(f"Error scraping {target.url}: {e}")
+            return [ErrorItem(scraper=type(self), message=f"{target.url}: {e}")]
+
+    @classmethod
+    def get_http_cache(cls) -> Optional[HTTPCache]:
+        if not BaseScraper._http_cache_loaded:
+            BaseScraper._http_cache = HTTPCache.from_env()
+            BaseScraper._http_cache_loaded = True
+        return BaseScraper._http_cache
+
+    @property
+    def cached_urls(self) -> set[str]:
+        # Pages this scraper read through the HTTP cache, kept here since not every scraper calls the constructor
+        return self.__dict__.setdefault("_cached_urls", set())
+
+    def invalidate_http_cache(self):
+        # Items that failed to be processed must be scraped again next run instead of being skipped as not modified
+        http_cache = self.get_http_cache()
+        if http_cache:
+            for url in list(self.cached_urls):
+                http_cache.invalidate(url)
+        self.cached_urls.clear()
+
+    def fetch(self, url: str, stream: bool = False) -> FetchResponse:
+        session = SessionFactory.get_session()
+        http_cache = self.get_http_cache()
+        headers = http_cache.conditional_headers(url) if http_cache else {}
+        if http_cache:
+            self.cached_urls.add(url)
+
+        with Metrics.timer("fetch", scraper=type(self).__name__):
+            response = self.request(session, url, headers=headers, stream=stream)
+
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            response.close()
+            entry = http_cache.get(url)
+            body = http_cache.read_body(url)
+            if entry is not None and body is not None:
+                logger.info(f"{type(self).__name__}: {url} not modified since last run")
+                self.listed_partially = True
+                return FetchResponse(
+                    url=entry.final_url,
+                    status_code=response.status_code,
+                    content=body,
+                    headers=dict(response.headers),
+                    encoding=entry.encoding,
+                )
+
+            # The entry vanished between the two requests, fetch the full body again
+            response = self.request(session, url, stream=stream)
+
+        if stream:
+            chunks = self.iter_response_chunks(response)
+            if http_cache:
+                chunks = http_cache.store_stream(url, response.url, response.headers, response.encoding, chunks)
+            return FetchResponse(
+                url=response.url,
+                status_code=response.status_code,
+                content=b"",
+                headers=dict(response.headers),
+                encoding=response.encoding,
+                stream=chunks,
+            )
+
+        if http_cache:
+            http_cache.store(url, response.url, response.headers, response.encoding, response.content)
+
+        return FetchResponse(
+            url=response.url,
+            status_code=response.status_code,
+            content=response.content,
+            headers=dict(response.headers),
+            encoding=response.encoding,
+        )
+
+    @staticmethod
+    def request(session: requests.Session, url: str, **kwargs) -> requests.Response:
+        # Capped, rate limited and guarded by the circuit breaker of the host.
+        # CircuitOpenError is a RequestException too
+        with HostLimits.slot(url):
+            host = HostLimits.before_request(url)
+            try:
+                response = session.get(url, **kwargs)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                HostLimits.record_failure(host, e)
+                raise
+        HostLimits.record_success(host)
+        return response
+
+    @staticmethod
+    def iter_response_chunks(response: requests.Response) -> Iterator[bytes]:
+        try:
+            yield from response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        finally:
+            response.close()
+
+    @staticmethod
+    def get_status_code(error: requests.RequestException) -> int:
+        return error.response.status_code if error.response is not None else -1
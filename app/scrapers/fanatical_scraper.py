@@ -1,50 +1,89 @@
 import logging
+import os
 from datetime import datetime
+from typing import Iterable, Iterator
 
 import requests
 
 from items.base_item import BaseItem
 from items.error_item import ErrorItem
 from items.scraped_item import ScrapedItem
-from scrapers.base_scraper import BaseScraper
+from network.host_limits import HostLimits
+from parsing.json_stream import iter_array_items
+from scrapers.base_scraper import BaseScraper, ScrapeTarget
 
 logger = logging.getLogger(__name__)
 
 
 class FanaticalScraper(BaseScraper):
-    BASE_URL = "https://www.fanatical.com/api/all/en"
+    BASE_URL = "https://www.fanatical.com/api/all"
+    STREAM_RESPONSE = True
+
+    def __init__(self):
+        # Catalogs differ per region, a bundle offered in several of them is reported once
+        self.locales = [
+            locale.strip() for locale in os.environ.get("FANATICAL_LOCALES", "en").split(",") if locale.strip()
+        ]
 
     def scrape(self) -> list[BaseItem]:
+        return list(self.scrape_iter())
+
+    def get_targets(self) -> list[ScrapeTarget]:
+        return [ScrapeTarget(url=f"{self.BASE_URL}/{locale}", locale=locale) for locale in self.locales]
+
+    def scrape_iter(self) -> Iterator[BaseItem]:
+        if len(self.locales) > 1:
+            yield from self.scrape_targets()
+            return
+        # A single catalog is streamed straight through instead of being collected per target
+        target = self.get_targets()[0]
+        with HostLimits.slot(target.url):
+            yield from self.scrape_target(target)
+
+    def scrape_target(self, target: ScrapeTarget) -> Iterator[BaseItem]:
         try:
-            response = requests.get(self.BASE_URL)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            logger.error(f"Error fetching Humble Bundle data: {e}")
-            return [ErrorItem(scraper=type(self), code=response.status_code, message=str(e))]
+            response = self.fetch(target.url, stream=self.STREAM_RESPONSE)
+            if response.unchanged:
+                return
 
-        return self.parse_response(response.json())
+            if not self.STREAM_RESPONSE:
+                yield from self.parse_response(response.json())
+                return
+
+            chunks = response.iter_content()
+            yield from self.iter_items(iter_array_items(chunks, "pickandmix"))
+            # Read the rest of the catalog so the body and its validators reach the HTTP cache
+            for _ in chunks:
+                pass
+        except requests.RequestException as e:
+            logger.error(f"Error fetching Fanatical data: {e}")
+            yield ErrorItem(scraper=type(self), code=self.get_status_code(e), message=str(e))
+        except ValueError as e:
+            logger.error(f"Error parsing JSON data: {e}")
+            yield ErrorItem(scraper=type(self), message="JSON parsing error")
 
     def parse_response(self, response_json: dict) -> list[BaseItem]:
-        items = []
-
-        for bundle in response_json["pickandmix"]:
-            name = bundle["name"]
-            slug = bundle["slug"]
-            valid_until_str = bundle.get("valid_until")
-            url = f"https://www.fanatical.com/en/pick-and-mix/{slug}"
-
-            if valid_until_str:
-                valid_until = datetime.strptime(valid_until_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-                valid_until_formatted = valid_until.strftime('%Y-%m-%dT%H:%M:%S')
-            else:
-                valid_until_formatted = None
-
-            item = ScrapedItem(
-                name=name,
-                scraper=type(self),
-                url=url,
-                expiration_date=valid_until_formatted,
-            )
-            items.append(item)
-
-        return items
+        return list(self.iter_items(response_json["pickandmix"]))
+
+    def iter_items(self, bundles: Iterable[dict]) -> Iterator[BaseItem]:
+        for bundle in bundles:
+            yield self.parse_bundle(bundle)
+
+    def parse_bundle(self, bundle: dict) -> ScrapedItem:
+        name = bundle["name"]
+        slug = bundle["slug"]
+        valid_until_str = bundle.get("valid_until")
+        url = f"https://www.fanatical.com/en/pick-and-mix/{slug}"
+
+        if valid_until_str:
+            valid_until = datetime.strptime(valid_until_str, '%Y-%m-%dT%H:%M:%S.%fZ')
+            valid_until_formatted = valid_until.strftime('%Y-%m-%dT%H:%M:%S')
+        else:
+            valid_until_formatted = None
+
+        return ScrapedItem(
+            name=name,
+            scraper=type(self),
+            url=url,
+            expiration_date=valid_until_formatted,
+        )
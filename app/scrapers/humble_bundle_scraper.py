@@ -1,12 +1,13 @@
 import json
 import logging
+import os
 
 import requests
-import bs4
 
 from items.base_item import BaseItem
 from items.error_item import ErrorItem
 from items.scraped_item import ScrapedItem
+from parsing.script_extractor import extract_script_text
 from scrapers.base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -15,22 +16,32 @@ logger = logging.getLogger(__name__)
 class HumbleBundleScraper(BaseScraper):
     BASE_URL = "https://www.humblebundle.com"
     BUNDLES_URL = f"{BASE_URL}/bundles"
-    CATEGORY_NAMES = ["books", "games", "software"]
+    # Every category is embedded in the one bundles page, the list only selects which of them are reported
+    CATEGORY_NAMES = [
+        category.strip()
+        for category in os.environ.get("HUMBLE_BUNDLE_CATEGORIES", "books,games,software").split(",")
+        if category.strip()
+    ]
 
     def scrape(self) -> list[BaseItem]:
         try:
-            response = requests.get(self.BUNDLES_URL)
-            response.raise_for_status()
+            response = self.fetch(self.BUNDLES_URL)
         except requests.RequestException as e:
             logger.error(f"Error fetching Humble Bundle data: {e}")
-            return [ErrorItem(scraper=type(self), code=response.status_code, message=str(e))]
+            return [ErrorItem(scraper=type(self), code=self.get_status_code(e), message=str(e))]
+
+        if response.unchanged:
+            return []
 
         return self.parse_response(response.text)
 
     def parse_response(self, html: str) -> list[BaseItem]:
-        soup = bs4.BeautifulSoup(html, "html.parser")
+        bundles_json_text = extract_script_text(html, "landingPage-json-data")
+        if bundles_json_text is None:
+            logger.error("Script tag landingPage-json-data not found")
+            return [ErrorItem(scraper=type(self), message="JSON data not found")]
+
         try:
-            bundles_json_text = soup.find("script", id="landingPage-json-data").text
             bundles_json = json.loads(bundles_json_text)
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON data: {e}")
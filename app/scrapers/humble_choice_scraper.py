@@ -1,57 +1,77 @@
 import datetime
 import json
 import logging
+import os
+from typing import Optional
 
 import requests
-import bs4
 
 from items.base_item import BaseItem
 from items.error_item import ErrorItem
 from items.scraped_item import ScrapedItem
-from scrapers.base_scraper import BaseScraper
+from parsing.script_extractor import extract_script_text
+from scrapers.base_scraper import BaseScraper, ScrapeTarget
 
 logger = logging.getLogger(__name__)
 
 
 class HumbleChoiceScraper(BaseScraper):
+    SINGLE_PAGE = True
     BASE_URL = "https://www.humblebundle.com/membership"
 
+    def __init__(self):
+        # Months around the current one, an upcoming month is only listed once Humble has announced it
+        self.months_before = int(os.environ.get("HUMBLE_CHOICE_MONTHS_BEFORE", 0))
+        self.months_after = int(os.environ.get("HUMBLE_CHOICE_MONTHS_AFTER", 1))
+
     def scrape(self) -> list[BaseItem]:
+        return list(self.scrape_targets())
+
+    def get_targets(self) -> list[ScrapeTarget]:
+        return [
+            ScrapeTarget(url=self.generate_url(offset), page=offset)
+            for offset in range(-self.months_before, self.months_after + 1)
+        ]
+
+    def scrape_target(self, target: ScrapeTarget) -> list[BaseItem]:
         try:
-            url = self.generate_url()
-            response = requests.get(url)
-            response.raise_for_status()
+            response = self.fetch(target.url)
         except requests.RequestException as e:
-            if response.status_code == 404:
+            if self.get_status_code(e) == 404:
                 return []
             logger.error(f"Error fetching Humble Bundle data: {e}")
-            return [ErrorItem(scraper=type(self), code=response.status_code, message=str(e))]
+            return [ErrorItem(scraper=type(self), code=self.get_status_code(e), message=str(e))]
 
-        if url != response.url:
+        if target.url != response.url or response.unchanged:
             return []
 
-        return self.parse_response(response.text)
+        return self.parse_response(response.text, target.url)
 
-    def generate_url(self) -> str:
+    def generate_url(self, offset: int = 0) -> str:
         now = datetime.datetime.now()
+        month_index = now.year * 12 + now.month - 1 + offset
+        month = datetime.date(month_index // 12, month_index % 12 + 1, 1)
 
-        month_name = now.strftime("%B")
-        year = now.year
+        month_name = month.strftime("%B")
+        year = month.year
 
         return f"{self.BASE_URL}/{month_name.lower()}-{year}"
 
-    def parse_response(self, html: str) -> list[BaseItem]:
-        soup = bs4.BeautifulSoup(html, "html.parser")
+    def parse_response(self, html: str, url: Optional[str] = None) -> list[BaseItem]:
+        choices = extract_script_text(html, "webpack-monthly-product-data")
+        if choices is None:
+            logger.error("Script tag webpack-monthly-product-data not found")
+            return [ErrorItem(scraper=type(self), message="JSON data not found")]
+
         try:
-            choices = soup.find("script", id="webpack-monthly-product-data").text
             choices_json = json.loads(choices)
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON data: {e}")
             return [ErrorItem(scraper=type(self), message="JSON parsing error")]
 
-        return self.extract_items(choices_json)
+        return self.extract_items(choices_json, url or self.generate_url())
 
-    def extract_items(self, choices_json: dict) -> list[BaseItem]:
+    def extract_items(self, choices_json: dict, url: str) -> list[BaseItem]:
         scraped_items = []
 
         try:
@@ -61,7 +81,6 @@ class HumbleChoiceScraper(BaseScraper):
 
             for game_data in choices_data.values():
                 title = game_data["title"]
-                url = self.generate_url()
                 scraped_item = ScrapedItem(
                     name=title,
                     scraper=type(self),
@@ -1,7 +1,96 @@
-from scrapers.base_scraper import BaseScraper
+import logging
+from html.parser import HTMLParser
+from typing import Optional
+
+from items.base_item import BaseItem
+from items.error_item import ErrorItem
 from items.scraped_item import ScrapedItem
+from network.browser_pool import BrowserPool
+from scrapers.base_scraper import BaseScraper
+
+logger = logging.getLogger(__name__)
+
+
+class PromotionRowParser(HTMLParser):
+    # Collects the rows of the promotions table: the app id, the linked name, the texts of the other cells, such as
+    # the promotion type, and the dates of the cells carrying a data-time attribute, in document order
+    def __init__(self):
+        super().__init__()
+        self.rows: list[dict] = []
+        self.row: Optional[dict] = None
+        self.cell: Optional[list[str]] = None
+        self.in_name = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "tr" and attrs.get("data-appid"):
+            self.row = {"appid": attrs["data-appid"], "name": [], "cells": [], "times": []}
+        elif self.row is None:
+            return
+        elif tag == "a" and (attrs.get("href") or "").startswith("/app/") and not self.row["name"]:
+            self.in_name = True
+            # The name cell is not one of the cells describing the promotion
+            self.cell = None
+        elif tag == "td" and attrs.get("data-time"):
+            self.row["times"].append(attrs["data-time"])
+        elif tag == "td":
+            self.cell = []
+
+    def handle_data(self, data):
+        if self.row is None:
+            return
+        if self.in_name:
+            self.row["name"].append(data)
+        elif self.cell is not None:
+            self.cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self.in_name = False
+        elif tag == "td" and self.cell is not None:
+            self.row["cells"].append(" ".join("".join(self.cell).split()).lower())
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
 
 
 class SteamDBScraper(BaseScraper):
-    def scrape(self) -> list[ScrapedItem]:
-        return []
+    BASE_URL = "https://steamdb.info/upcoming/free/"
+    STORE_URL = "https://store.steampowered.com/app"
+    # The promotions table is built by scripts behind a browser check, plain requests only get the challenge
+    USES_BROWSER = True
+    WAIT_FOR = "tr[data-appid], .no-promotions"
+
+    def scrape(self) -> list[BaseItem]:
+        try:
+            html = BrowserPool.get().render(self.BASE_URL, wait_for=self.WAIT_FOR)
+        except Exception as e:
+            logger.error(f"Error rendering SteamDB page: {e}")
+            return [ErrorItem(scraper=type(self), message=str(e))]
+
+        return self.parse_response(html)
+
+    def parse_response(self, html: str) -> list[BaseItem]:
+        parser = PromotionRowParser()
+        parser.feed(html)
+        parser.close()
+
+        scraped_items = []
+        for row in parser.rows:
+            # Free weekends only lend the game, only promotions that let the game be kept are reported
+            if any("weekend" in cell for cell in row["cells"]):
+                continue
+            name = " ".join("".join(row["name"]).split())
+            if not name:
+                logger.warning(f"SteamDB promotion for app {row['appid']} has no name")
+                continue
+            scraped_items.append(ScrapedItem(
+                name=name,
+                scraper=type(self),
+                url=f"{self.STORE_URL}/{row['appid']}/",
+                price=0.0,
+                # The last date of a row is the end of the promotion
+                expiration_date=row["times"][-1] if row["times"] else None,
+            ))
+        return scraped_items
@@ -0,0 +1,208 @@
+import functools
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def notifier_salt(notifier: str) -> int:
+    return int(hashlib.sha1(notifier.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def delivery_key(content_hash: str, notifier: str) -> int:
+    # 64 bits of the content hash mixed with the notifier, collisions are negligible for millions of deliveries
+    return int(content_hash[:16], 16) ^ notifier_salt(notifier)
+
+
+class HashSetFilter:
+    # Exact membership: the keys loaded from the database as a sorted array plus a set of the ones added since
+    def __init__(self, keys: Iterable[int]):
+        self.keys = array("Q", sorted(keys))
+        self.added: set[int] = set()
+        self.count = len(self.keys)
+
+    def __contains__(self, key: int) -> bool:
+        index = bisect_left(self.keys, key)
+        return (index < len(self.keys) and self.keys[index] == key) or key in self.added
+
+    def add(self, key: int):
+        if key not in self:
+            self.added.add(key)
+            self.count += 1
+
+
+class BloomFilter:
+    HEADER = struct.Struct("<8sQQQQ")
+    MAGIC = b"WHBLOOM1"
+
+    def __init__(
+        self, size_bits: int, hash_count: int, capacity: int, bits: Optional[bytearray] = None, count: int = 0
+    ):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.capacity = capacity
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        size_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count, capacity)
+
+    def __contains__(self, key: int) -> bool:
+        # Double hashing over the two halves of the key, which is already a uniformly distributed digest
+        bits, size_bits = self.bits, self.size_bits
+        position, step = key & 0xFFFFFFFF, (key >> 32) | 1
+        for _ in range(self.hash_count):
+            position %= size_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+    def add(self, key: int):
+        bits, size_bits = self.bits, self.size_bits
+        position, step = key & 0xFFFFFFFF, (key >> 32) | 1
+        for _ in range(self.hash_count):
+            position %= size_bits
+            bits[position >> 3] |= 1 << (position & 7)
+            position += step
+        self.count += 1
+
+    def to_bytes(self) -> bytes:
+        header = self.HEADER.pack(self.MAGIC, self.size_bits, self.hash_count, self.capacity, self.count)
+        return header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> Optional["BloomFilter"]:
+        if len(content) < cls.HEADER.size:
+            return None
+        magic, size_bits, hash_count, capacity, count = cls.HEADER.unpack_from(content)
+        bits = bytearray(content[cls.HEADER.size:])
+        if magic != cls.MAGIC or len(bits) != (size_bits + 7) // 8:
+            return None
+        return cls(size_bits, hash_count, capacity, bits, count)
+
+
+class SentItemsFilter:
+    # Deliveries recorded in item_notifications, kept in memory so dedup does not ask SQLite about new items.
+    # SENT_FILTER=set holds exact keys built once per process, SENT_FILTER=bloom is persisted next to the database and
+    # its positives are confirmed in SQLite, a false positive costs a lookup instead of dropping a new item
+    _filter: Optional[Union[HashSetFilter, BloomFilter]] = None
+    _dirty = False
+    _lock = threading.RLock()
+
+    @staticmethod
+    def get_mode() -> str:
+        return os.environ.get("SENT_FILTER", "bloom").lower()
+
+    @staticmethod
+    def get_path() -> str:
+        return f"{os.environ.get('DATABASE_PATH', 'db.sqlite3')}.sent-filter"
+
+    @classmethod
+    def get(cls, conn: sqlite3.Connection) -> Optional[Union[HashSetFilter, BloomFilter]]:
+        mode = cls.get_mode()
+        if mode not in ("set", "bloom"):
+            return None
+        with cls._lock:
+            if cls._filter is None:
+                cls._filter = cls.load(conn, mode)
+            return cls._filter
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, mode: str) -> Union[HashSetFilter, BloomFilter]:
+        rows = conn.execute("SELECT COUNT(*) FROM item_notifications;").fetchone()[0]
+        if mode == "bloom":
+            bloom = cls.read()
+            # Deliveries recorded by another process, or rows pruned without invalidate(), make the file stale
+            if bloom is not None and bloom.count == rows and rows <= bloom.capacity:
+                logger.info(f"Loaded sent items bloom filter with {rows} deliveries")
+                return bloom
+
+        keys = (delivery_key(content_hash, notifier) for content_hash, notifier in conn.execute(
+            "SELECT content_hash, notifier FROM item_notifications;"
+        ))
+        if mode == "set":
+            logger.info(f"Built sent items filter with {rows} deliveries")
+            return HashSetFilter(keys)
+
+        false_positive_rate = float(os.environ.get("SENT_FILTER_FALSE_POSITIVE_RATE", 1e-6))
+        # Room for the filter to grow for a while before the false positive rate degrades and it is rebuilt
+        bloom = BloomFilter.for_capacity(max(rows * 2, 100_000), false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        cls._dirty = True
+        logger.info(f"Built sent items bloom filter with {rows} deliveries, {len(bloom.bits)} bytes")
+        return bloom
+
+    @classmethod
+    def read(cls) -> Optional[BloomFilter]:
+        try:
+            with open(cls.get_path(), "rb") as bloom_file:
+                return BloomFilter.from_bytes(bloom_file.read())
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Error reading sent items bloom filter: {e}")
+            return None
+
+    @classmethod
+    def is_sent(cls, sent_filter: Union[HashSetFilter, BloomFilter], content_hash: str, notifiers: list[str]) -> bool:
+        return all(delivery_key(content_hash, notifier) in sent_filter for notifier in notifiers)
+
+    @classmethod
+    def record(cls, deliveries: Iterable[tuple[str, str]]):
+        # Only new rows are counted so the bloom filter count keeps matching item_notifications
+        with cls._lock:
+            if cls._filter is None:
+                return
+            for content_hash, notifier in deliveries:
+                key = delivery_key(content_hash, notifier)
+                if isinstance(cls._filter, BloomFilter) and key in cls._filter:
+                    continue
+                cls._filter.add(key)
+                cls._dirty = True
+
+    @classmethod
+    def save(cls):
+        with cls._lock:
+            if not cls._dirty or not isinstance(cls._filter, BloomFilter):
+                return
+            path = cls.get_path()
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temporary_path, "wb") as bloom_file:
+                    bloom_file.write(cls._filter.to_bytes())
+                os.replace(temporary_path, path)
+                cls._dirty = False
+            except OSError as e:
+                logger.warning(f"Error saving sent items bloom filter: {e}")
+
+    @classmethod
+    def clear(cls):
+        # Forgets the in memory filter only, the next get() reloads it
+        with cls._lock:
+            cls._filter = None
+            cls._dirty = False
+
+    @classmethod
+    def invalidate(cls):
+        # Must follow every deletion from item_notifications, a bloom filter cannot forget keys
+        with cls._lock:
+            cls.clear()
+            try:
+                os.remove(cls.get_path())
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import threading
+from collections import Counter
+from enum import Enum
+from typing import Iterable, Optional
+
+from items.scraped_item import ScrapedItem, encode_content
+from metrics import Metrics
+from sqlitedb import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# Price and epoch expiration of a listed item, an item is unchanged while both stay the same
+SnapshotState = tuple[Optional[float], Optional[int]]
+
+
+class ItemChange(Enum):
+    ADDED = "added"
+    PRICE_CHANGED = "price_changed"
+    EXPIRY_CHANGED = "expiry_changed"
+    REMOVED = "removed"
+
+
+def item_key(name: str, url: Optional[str]) -> int:
+    # Identity of an item within its scraper, 60 bits so it is stored as a SQLite INTEGER
+    return int(hashlib.sha1(encode_content([name, url]).encode("utf-8")).hexdigest()[:15], 16)
+
+
+class SnapshotDiff:
+    # Items of one scraper in the current run, classified against its previous snapshot with dict lookups
+    def __init__(self, scraper: str, previous: dict[int, SnapshotState]):
+        self.scraper = scraper
+        self.previous = previous
+        self.seen: set[int] = set()
+        self.changed: dict[int, tuple[SnapshotState, str]] = {}
+        self.counts: Counter[ItemChange] = Counter()
+        # Only a scraper that listed everything tells which items are gone
+        self.complete = False
+
+    def classify(self, item: ScrapedItem) -> Optional[ItemChange]:
+        key = item_key(item.name, item.url)
+        self.seen.add(key)
+        state = (float(item.price) if item.price is not None else None, item.expires_at)
+        previous = self.previous.get(key)
+        if previous == state:
+            return None
+
+        if previous is None:
+            change = ItemChange.ADDED
+        elif previous[0] != state[0]:
+            change = ItemChange.PRICE_CHANGED
+        else:
+            change = ItemChange.EXPIRY_CHANGED
+        self.changed[key] = (state, item.content_hash)
+        self.counts[change] += 1
+        return change
+
+    def removed(self) -> list[int]:
+        if not self.complete:
+            return []
+        return [key for key in self.previous if key not in self.seen]
+
+
+class ScraperSnapshots:
+    # Snapshots are read from the database once per process and kept up to date in memory, so a daemon only writes
+    # the delta of every run
+    _snapshots: dict[str, dict[int, SnapshotState]] = {}
+    _lock = threading.RLock()
+
+    @classmethod
+    def diff(cls, scraper: str) -> SnapshotDiff:
+        with cls._lock:
+            snapshot = cls._snapshots.get(scraper)
+            if snapshot is None:
+                snapshot = cls._snapshots[scraper] = SQLiteDB().get_snapshot(scraper)
+            return SnapshotDiff(scraper, snapshot)
+
+    @classmethod
+    def save(cls, diff: SnapshotDiff, undelivered: Iterable[str] = ()):
+        # An undelivered item keeps its previous state, the next run sees it changed again and retries it
+        undelivered = set(undelivered)
+        changed = {key: state for key, (state, content_hash) in diff.changed.items() if content_hash not in undelivered}
+        removed = diff.removed()
+        diff.counts[ItemChange.REMOVED] = len(removed)
+
+        for change in ItemChange:
+            if diff.counts[change]:
+                Metrics.increment("item_changes", diff.counts[change], scraper=diff.scraper, change=change.value)
+        if not changed and not removed:
+            return
+        logger.info(f"{diff.scraper}: " + ", ".join(f"{diff.counts[change]} {change.value}" for change in ItemChange))
+
+        with cls._lock:
+            SQLiteDB().save_snapshot(diff.scraper, changed, removed)
+            snapshot = cls._snapshots.setdefault(diff.scraper, {})
+            snapshot.update(changed)
+            for key in removed:
+                snapshot.pop(key, None)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._snapshots.clear()
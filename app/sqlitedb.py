@@ -1,53 +1,217 @@
 import os
+import queue
 import sqlite3
 import logging
-from typing import Optional
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Union
 
+from items.item_batch import ItemBatch
 from items.scraped_item import ScrapedItem
+from metrics import Metrics
+from migrations import MIGRATIONS
+from sent_filter import SentItemsFilter
 
 logger = logging.getLogger(__name__)
 
+Write = Callable[[sqlite3.Connection], Any]
+
+# Interpolated into the PRAGMA, anything else is rejected
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+class DatabaseWriter:
+    # A single thread owns the write connection. Writes queued while a transaction is running are committed together,
+    # and BEGIN IMMEDIATE takes the write lock upfront so other processes wait in busy_timeout instead of failing
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_batch: int):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.queue: queue.Queue[Optional[tuple[Write, Future]]] = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def submit(self, write: Write) -> Any:
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="sqlite-writer", daemon=True)
+                self.thread.start()
+            self.queue.put((write, future))
+        return future.result()
+
+    def stop(self):
+        with self.lock:
+            if self.thread is None:
+                return
+            self.queue.put(None)
+            thread, self.thread = self.thread, None
+        thread.join()
+
+    def run(self):
+        conn = self.connect()
+        # Transactions are opened explicitly, sqlite3 would otherwise start a deferred one before the first write
+        conn.isolation_level = None
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = None in batch
+                batch = [write for write in batch if write is not None]
+                if batch:
+                    self.commit(conn, batch)
+        finally:
+            conn.close()
+
+    def commit(self, conn: sqlite3.Connection, batch: list[tuple[Write, Future]]):
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            results = [write(conn) for write, _ in batch]
+            conn.execute("COMMIT;")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            if len(batch) > 1:
+                # One failing write must not take the others of the batch down with it
+                for write in batch:
+                    self.commit(conn, [write])
+                return
+            batch[0][1].set_exception(e)
+            return
+
+        Metrics.increment("db_write_batches")
+        Metrics.increment("db_writes", len(batch))
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+# Lives in the thread-local storage of one thread and goes away with it
+class ThreadConnection:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
 
 class SQLiteDB:
+    # Every thread reads through its own connection, all writes go through the writer thread.
+    # WAL lets the readers run next to the writer, and several processes can share the file
     _instance = None
+    _lock = threading.RLock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(SQLiteDB, cls).__new__(cls)
-        return cls._instance
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(SQLiteDB, cls).__new__(cls)
+                instance.initialized = False
+                cls._instance = instance
+            return cls._instance
 
     def __init__(self):
-        self.conn = None
+        with self._lock:
+            if self.initialized:
+                return
+            self.path = os.environ.get("DATABASE_PATH", "db.sqlite3")
+            self.busy_timeout = float(os.environ.get("DATABASE_BUSY_TIMEOUT", 30))
+            self.synchronous = self.get_synchronous()
+            self.local = threading.local()
+            self.connections: set[sqlite3.Connection] = set()
+            self.writer = DatabaseWriter(self.connect, int(os.environ.get("DATABASE_WRITE_BATCH", 64)))
+            self.apply_migrations()
+            self.initialized = True
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        holder = getattr(self.local, "holder", None)
+        if holder is None:
+            holder = self.local.holder = ThreadConnection(self.connect())
+            with self._lock:
+                self.connections.add(holder.conn)
+            # The thread-local holder is dropped when its thread exits, the short lived pool threads would otherwise
+            # leave a connection behind each
+            weakref.finalize(holder, self.release, holder.conn)
+        return holder.conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self.connections.discard(conn)
+        conn.close()
+
+    def connect(self) -> sqlite3.Connection:
         try:
-            self.conn = sqlite3.connect(os.environ.get("DATABASE_PATH", "db.sqlite3"))
-            self.create_table()
+            # timeout is SQLite's busy_timeout: a locked database is retried for that long before raising.
+            # A connection is only used by the thread it was made for, close() is the exception
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            # synchronous is per connection; NORMAL is durable enough in WAL mode and avoids an fsync per commit
+            conn.execute(f"PRAGMA synchronous = {self.synchronous};")
+            return conn
         except sqlite3.Error as e:
             logging.error(f"Error connecting to database: {e}")
             raise
 
-    def create_table(self):
+    @staticmethod
+    def get_synchronous() -> str:
+        synchronous = os.environ.get("DATABASE_SYNCHRONOUS", "NORMAL").strip().upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            logger.warning(f"Invalid DATABASE_SYNCHRONOUS {synchronous!r}, using NORMAL")
+            return "NORMAL"
+        return synchronous
+
+    @classmethod
+    def close(cls):
+        # Waits for the queued writes, the next SQLiteDB() connects again
+        with cls._lock:
+            instance, cls._instance = cls._instance, None
+        if instance is None or not instance.initialized:
+            return
+        instance.writer.stop()
+        with cls._lock:
+            connections, instance.connections = instance.connections, set()
+        for conn in connections:
+            conn.close()
+
+    def apply_migrations(self):
         if not self.conn:
             logger.error("No connection to database")
             return
         try:
-            query = """
-                CREATE TABLE IF NOT EXISTS scraped_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    scraper TEXT NOT NULL,
-                    url TEXT,
-                    price REAL,
-                    expiration_date TIMESTAMP,
-                    creation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    sent BOOLEAN DEFAULT FALSE
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
-            """
-            self.conn.execute(query)
+            """)
             self.conn.commit()
+
+            for migration in MIGRATIONS:
+                if migration.transactional:
+                    self.conn.execute("BEGIN IMMEDIATE;")
+                if self.get_schema_version() >= migration.version:
+                    self.conn.rollback()
+                    continue
+
+                logger.info(f"Applying migration {migration.version}: {migration.description}")
+                migration.apply(self.conn)
+                self.conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?);",
+                    (migration.version, migration.description),
+                )
+                self.conn.commit()
         except sqlite3.Error as e:
-            logging.error(f"Error creating table: {e}")
+            self.conn.rollback()
+            logging.error(f"Error applying migrations: {e}")
             raise
 
+    def get_schema_version(self) -> int:
+        cursor = self.conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+        return cursor.fetchone()[0]
+
+    @Metrics.timed("db_item_already_sent")
     def item_already_sent(self, item: ScrapedItem) -> bool:
         if not self.conn:
             logger.error("No connection to database")
@@ -55,39 +219,357 @@ class SQLiteDB:
         try:
             query = """
                 SELECT 1 FROM scraped_items
-                WHERE name = ? AND scraper = ? AND url = ? 
-                AND (price = ? OR (price IS NULL AND ? IS NULL))
-                AND (expiration_date = ? OR (expiration_date IS NULL AND ? IS NULL))
-                AND sent = TRUE;
+                WHERE content_hash = ? AND sent = TRUE;
             """
-            cursor = self.conn.execute(
-                query,
-                (
-                    item.name,
-                    item.scraper.__name__,
-                    item.url,
-                    item.price,
-                    item.price,
-                    item.expiration_date,
-                    item.expiration_date,
-                ),
-            )
+            cursor = self.conn.execute(query, (item.content_hash,))
             result = cursor.fetchone()
             return result is not None
         except sqlite3.Error as e:
             logging.error(f"Error checking if item exists in database: {e}")
             raise
 
-    def add_scraped_item(self, item: ScrapedItem) -> Optional[bool]:
+    @Metrics.timed("db_filter_already_sent")
+    def filter_already_sent(self, items: list[ScrapedItem], notifiers: Optional[list[str]] = None) -> list[ScrapedItem]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return items
+        if not items:
+            return []
+        if notifiers:
+            deliveries = self.get_deliveries(items, notifiers)
+            return [
+                item for item in items
+                if any((item.content_hash, notifier) not in deliveries for notifier in notifiers)
+            ]
+        try:
+            with self.conn:
+                self.load_candidates(items)
+                query = """
+                    SELECT c.position FROM candidate_items c
+                    JOIN scraped_items s ON s.content_hash = c.content_hash
+                    WHERE s.sent = TRUE;
+                """
+                sent_positions = {row[0] for row in self.conn.execute(query)}
+                self.conn.execute("DELETE FROM candidate_items;")
+
+            return [item for position, item in enumerate(items) if position not in sent_positions]
+        except sqlite3.Error as e:
+            logging.error(f"Error filtering already sent items in database: {e}")
+            raise
+
+    @Metrics.timed("db_get_deliveries")
+    def get_deliveries(self, items: list[ScrapedItem], notifiers: list[str]) -> set[tuple[str, str]]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return set()
+        if not items or not notifiers:
+            return set()
+        try:
+            with self.conn:
+                self.load_candidates(items)
+                query = f"""
+                    SELECT DISTINCT n.content_hash, n.notifier FROM candidate_items c
+                    JOIN item_notifications n ON n.content_hash = c.content_hash
+                    WHERE n.notifier IN ({", ".join("?" for _ in notifiers)});
+                """
+                deliveries = set(self.conn.execute(query, notifiers))
+                self.conn.execute("DELETE FROM candidate_items;")
+            return deliveries
+        except sqlite3.Error as e:
+            logging.error(f"Error reading deliveries from database: {e}")
+            raise
+
+    def load_candidates(self, items: list[ScrapedItem]):
+        self.conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS candidate_items (
+                position INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            );
+        """)
+        self.conn.execute("DELETE FROM candidate_items;")
+        self.conn.executemany(
+            "INSERT INTO candidate_items (position, content_hash) VALUES (?, ?);",
+            ((position, item.content_hash) for position, item in enumerate(items)),
+        )
+
+    @Metrics.timed("db_record_deliveries")
+    def record_deliveries(self, deliveries: list[tuple[ScrapedItem, str]]):
+        try:
+            def write(conn: sqlite3.Connection):
+                conn.executemany(
+                    "INSERT OR IGNORE INTO item_notifications (content_hash, notifier) VALUES (?, ?);",
+                    ((item.content_hash, notifier) for item, notifier in deliveries),
+                )
+                conn.executemany(
+                    "UPDATE scraped_items SET sent = TRUE WHERE content_hash = ?;",
+                    {(item.content_hash,) for item, _ in deliveries},
+                )
+
+            self.writer.submit(write)
+            SentItemsFilter.record((item.content_hash, notifier) for item, notifier in deliveries)
+        except sqlite3.Error as e:
+            logging.error(f"Error recording deliveries in database: {e}")
+            raise
+
+    @Metrics.timed("db_get_snapshot")
+    def get_snapshot(self, scraper: str) -> dict[int, tuple[Optional[float], Optional[int]]]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return {}
+        try:
+            query = "SELECT item_key, price, expires_at FROM item_snapshots WHERE scraper = ?;"
+            return {key: (price, expires_at) for key, price, expires_at in self.conn.execute(query, (scraper,))}
+        except sqlite3.Error as e:
+            logging.error(f"Error reading snapshot from database: {e}")
+            raise
+
+    @Metrics.timed("db_save_snapshot")
+    def save_snapshot(
+        self,
+        scraper: str,
+        changed: dict[int, tuple[Optional[float], Optional[int]]],
+        removed: list[int],
+    ):
+        try:
+            def write(conn: sqlite3.Connection):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO item_snapshots (scraper, item_key, price, expires_at) VALUES (?, ?, ?, ?);",
+                    ((scraper, key, price, expires_at) for key, (price, expires_at) in changed.items()),
+                )
+                conn.executemany(
+                    "DELETE FROM item_snapshots WHERE scraper = ? AND item_key = ?;",
+                    ((scraper, key) for key in removed),
+                )
+
+            self.writer.submit(write)
+        except sqlite3.Error as e:
+            logging.error(f"Error saving snapshot in database: {e}")
+            raise
+
+    def get_host_circuit(self, host: str) -> Optional[tuple[str, int, float]]:
         if not self.conn:
             logger.error("No connection to database")
             return None
+        try:
+            query = "SELECT state, failures, opened_until FROM host_circuits WHERE host = ?;"
+            return self.conn.execute(query, (host,)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Error reading circuit state from database: {e}")
+            raise
+
+    def save_host_circuit(self, host: str, state: str, failures: int, opened_until: float):
         try:
             query = """
-                INSERT INTO scraped_items (name, scraper, url, price, expiration_date)
-                VALUES (?, ?, ?, ?, ?);
+                INSERT OR REPLACE INTO host_circuits (host, state, failures, opened_until, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP);
             """
-            self.conn.execute(
+            self.writer.submit(lambda conn: conn.execute(query, (host, state, failures, opened_until)))
+        except sqlite3.Error as e:
+            logging.error(f"Error saving circuit state in database: {e}")
+            raise
+
+    def enqueue_scrape_jobs(self, run_id: str, scrapers: list[str]):
+        try:
+            query = "INSERT INTO scrape_jobs (run_id, scraper, enqueued_at) VALUES (?, ?, ?);"
+            now = time.time()
+            self.writer.submit(lambda conn: conn.executemany(query, ((run_id, scraper, now) for scraper in scrapers)))
+        except sqlite3.Error as e:
+            logging.error(f"Error enqueuing scrape jobs in database: {e}")
+            raise
+
+    def claim_scrape_job(
+        self,
+        worker: str,
+        scrapers: list[str],
+        lease: float,
+        max_attempts: int,
+    ) -> Optional[tuple[int, str, str, int]]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return None
+        try:
+            query = f"""
+                SELECT id, run_id, scraper, attempts FROM scrape_jobs
+                WHERE (state = 'pending' OR (state = 'leased' AND lease_until < ?))
+                AND attempts < ? AND scraper IN ({", ".join("?" for _ in scrapers)})
+                ORDER BY id
+                LIMIT 1;
+            """
+
+            # Idle workers poll through their read connection and only take the write lock when there is a job.
+            # It is read again and leased in the same BEGIN IMMEDIATE transaction, two workers never get the same job
+            if self.conn.execute(query, (time.time(), max_attempts, *scrapers)).fetchone() is None:
+                return None
+
+            def write(conn: sqlite3.Connection):
+                now = time.time()
+                job = conn.execute(query, (now, max_attempts, *scrapers)).fetchone()
+                if job is None:
+                    return None
+                conn.execute(
+                    """
+                    UPDATE scrape_jobs SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                    WHERE id = ?;
+                    """,
+                    (worker, now + lease, job[0]),
+                )
+                return job[0], job[1], job[2], job[3] + 1
+
+            return self.writer.submit(write)
+        except sqlite3.Error as e:
+            logging.error(f"Error claiming scrape job in database: {e}")
+            raise
+
+    def renew_scrape_job_lease(self, job_id: int, worker: str, lease: float) -> bool:
+        try:
+            query = """
+                UPDATE scrape_jobs SET lease_until = ?
+                WHERE id = ? AND worker = ? AND state = 'leased';
+            """
+            lease_until = time.time() + lease
+            return self.writer.submit(lambda conn: conn.execute(query, (lease_until, job_id, worker)).rowcount) > 0
+        except sqlite3.Error as e:
+            logging.error(f"Error renewing scrape job lease in database: {e}")
+            raise
+
+    def complete_scrape_job(
+        self,
+        job_id: int,
+        worker: str,
+        rows: list[tuple],
+        listed_partially: bool,
+        cached_urls: Optional[str] = None,
+    ) -> bool:
+        try:
+            # Only the worker still holding the lease reports, the results of a worker that lost it are dropped
+            def write(conn: sqlite3.Connection):
+                cursor = conn.execute(
+                    """
+                    UPDATE scrape_jobs SET state = 'done', listed_partially = ?, cached_urls = ?, finished_at = ?
+                    WHERE id = ? AND worker = ? AND state = 'leased';
+                    """,
+                    (listed_partially, cached_urls, time.time(), job_id, worker),
+                )
+                if cursor.rowcount == 0:
+                    return False
+                conn.executemany(
+                    """
+                    INSERT INTO scrape_job_items
+                        (job_id, position, name, url, price, expiration_date, error, error_code)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+                    """,
+                    ((job_id, *row) for row in rows),
+                )
+                return True
+
+            return self.writer.submit(write)
+        except sqlite3.Error as e:
+            logging.error(f"Error completing scrape job in database: {e}")
+            raise
+
+    def fail_scrape_jobs(self, run_id: str, error: str, max_attempts: Optional[int] = None) -> int:
+        try:
+            # With max_attempts only the jobs whose last lease expired are failed, otherwise every unfinished one
+            query = """
+                UPDATE scrape_jobs SET state = 'failed', error = ?, finished_at = ?
+                WHERE run_id = ? AND state IN ('pending', 'leased')
+                AND (? IS NULL OR (state = 'leased' AND lease_until < ? AND attempts >= ?));
+            """
+
+            def write(conn: sqlite3.Connection):
+                now = time.time()
+                return conn.execute(query, (error, now, run_id, max_attempts, now, max_attempts)).rowcount
+
+            return self.writer.submit(write)
+        except sqlite3.Error as e:
+            logging.error(f"Error failing scrape jobs in database: {e}")
+            raise
+
+    def get_scrape_jobs(
+        self, run_id: str
+    ) -> list[tuple[int, str, str, int, Optional[str], bool, Optional[str], Optional[str]]]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return []
+        try:
+            query = """
+                SELECT id, scraper, state, attempts, worker, listed_partially, error, cached_urls FROM scrape_jobs
+                WHERE run_id = ?
+                ORDER BY id;
+            """
+            return self.conn.execute(query, (run_id,)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Error reading scrape jobs from database: {e}")
+            raise
+
+    def get_scrape_job_items(self, job_id: int, after_position: int, limit: int) -> list[tuple]:
+        if not self.conn:
+            logger.error("No connection to database")
+            return []
+        try:
+            query = """
+                SELECT position, name, url, price, expiration_date, error, error_code FROM scrape_job_items
+                WHERE job_id = ? AND position > ?
+                ORDER BY position
+                LIMIT ?;
+            """
+            return self.conn.execute(query, (job_id, after_position, limit)).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Error reading scrape job items from database: {e}")
+            raise
+
+    def delete_scrape_jobs(self, run_id: Optional[str] = None, enqueued_before: Optional[float] = None):
+        try:
+            jobs = "SELECT id FROM scrape_jobs WHERE run_id = ? OR enqueued_at < ?"
+
+            def write(conn: sqlite3.Connection):
+                conn.execute(f"DELETE FROM scrape_job_items WHERE job_id IN ({jobs});", (run_id, enqueued_before))
+                conn.execute(f"DELETE FROM scrape_jobs WHERE id IN ({jobs});", (run_id, enqueued_before))
+
+            self.writer.submit(write)
+        except sqlite3.Error as e:
+            logging.error(f"Error deleting scrape jobs from database: {e}")
+            raise
+
+    @Metrics.timed("db_add_scraped_items")
+    def add_scraped_items(self, items: Union[list[ScrapedItem], ItemBatch]):
+        try:
+            batch = items if isinstance(items, ItemBatch) else ItemBatch.from_items(items)
+            query = """
+                INSERT OR IGNORE INTO scraped_items
+                    (name, scraper, url, price, expiration_date, expires_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """
+            self.writer.submit(lambda conn: conn.executemany(query, batch.rows()))
+        except sqlite3.Error as e:
+            logging.error(f"Error adding items to database: {e}")
+            raise
+
+    @Metrics.timed("db_mark_items_as_sent")
+    def mark_items_as_sent(self, items: list[ScrapedItem]):
+        try:
+            query = """
+                UPDATE scraped_items
+                SET sent = TRUE
+                WHERE scraper = ? AND name = ? AND url = ?;
+            """
+            self.writer.submit(lambda conn: conn.executemany(
+                query,
+                {(item.scraper.__name__, item.name, item.url) for item in items},
+            ))
+        except sqlite3.Error as e:
+            logging.error(f"Error marking items as sent in database: {e}")
+            raise
+
+    @Metrics.timed("db_add_scraped_item")
+    def add_scraped_item(self, item: ScrapedItem) -> Optional[bool]:
+        try:
+            query = """
+                INSERT OR IGNORE INTO scraped_items
+                    (name, scraper, url, price, expiration_date, expires_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """
+            self.writer.submit(lambda conn: conn.execute(
                 query,
                 (
                     item.name,
@@ -95,33 +577,31 @@ class SQLiteDB:
                     item.url,
                     item.price,
                     item.expiration_date,
+                    item.expires_at,
+                    item.content_hash,
                 ),
-            )
-            self.conn.commit()
+            ))
             return True
         except sqlite3.Error as e:
             logging.error(f"Error adding item to database: {e}")
             raise
 
+    @Metrics.timed("db_mark_item_as_sent")
     def mark_item_as_sent(self, item: ScrapedItem):
-        if not self.conn:
-            logger.error("No connection to database")
-            return
         try:
             query = """
                 UPDATE scraped_items
                 SET sent = TRUE
                 WHERE name = ? AND scraper = ? AND url = ?;
             """
-            self.conn.execute(
+            self.writer.submit(lambda conn: conn.execute(
                 query,
                 (
                     item.name,
                     item.scraper.__name__,
                     item.url,
                 ),
-            )
-            self.conn.commit()
+            ))
         except sqlite3.Error as e:
             logging.error(f"Error marking item as sent in database: {e}")
             raise
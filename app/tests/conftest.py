@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+# The application imports its modules from the app folder, as main.py does when run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from items.scraped_item import ScrapedItem  # noqa: E402
+from scrapers.base_scraper import BaseScraper  # noqa: E402
+
+
+class StoreScraper(BaseScraper):
+    # Stands in for a real scraper, tests hand its results to the pipeline themselves
+    def scrape(self) -> list:
+        return []
+
+
+def create_items(count: int, scraper: type[BaseScraper] = StoreScraper, **fields) -> list[ScrapedItem]:
+    # Bundles named and linked after their position, priced after it unless the test sets the fields
+    return [
+        ScrapedItem(scraper=scraper, name=f"Bundle {index}", url=f"https://store/{index}", **{"price": index, **fields})
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    from sqlitedb import SQLiteDB
+
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "db.sqlite3"))
+    monkeypatch.setenv("SENT_FILTER", "off")
+    SQLiteDB.close()
+    yield SQLiteDB()
+    SQLiteDB.close()
+
+
+@pytest.fixture
+def host_limits_disabled(monkeypatch):
+    # Fresh per host state without rate limits or circuit breakers, tests that need them turn them on again
+    from network.host_limits import HostLimits
+
+    monkeypatch.setenv("HTTP_HOST_RATE", "0")
+    monkeypatch.setenv("HTTP_CIRCUIT_FAILURES", "0")
+    monkeypatch.setattr(HostLimits, "_semaphores", {})
+    monkeypatch.setattr(HostLimits, "_buckets", {})
+    monkeypatch.setattr(HostLimits, "_breakers", {})
@@ -0,0 +1,96 @@
+import base64
+import socketserver
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SMTPServerState:
+    username: str = "user@example.com"
+    password: str = "secret"
+    pipelining: bool = True
+    refused: set[str] = field(default_factory=set)
+    # The next MAIL commands are answered by closing the connection
+    drops: int = 0
+    connections: int = 0
+    messages: list[tuple[str, list[str], str]] = field(default_factory=list)
+
+
+class SMTPRequestHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT
+    state: SMTPServerState
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        state = self.server.state
+        state.connections += 1
+        self.reply("220 localhost ESMTP test")
+        sender, recipients = None, []
+        while line := self.rfile.readline():
+            command = line.decode().rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                extensions = ["AUTH PLAIN"] + (["PIPELINING"] if state.pipelining else [])
+                for extension in ["localhost", *extensions[:-1]]:
+                    self.reply(f"250-{extension}")
+                self.reply(f"250 {extensions[-1]}")
+            elif verb == "AUTH":
+                _, username, password = base64.b64decode(command.split()[2]).decode().split("\0")
+                if (username, password) == (state.username, state.password):
+                    self.reply("235 Authentication successful")
+                else:
+                    self.reply("535 Authentication credentials invalid")
+            elif verb == "MAIL":
+                if state.drops:
+                    state.drops -= 1
+                    return
+                sender, recipients = command.split(":", 1)[1].strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.split(":", 1)[1].strip("<>")
+                if recipient in state.refused:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(data.decode())
+                state.messages.append((sender, recipients, "".join(lines)))
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer:
+    def __init__(self, state: SMTPServerState = None):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPRequestHandler)
+        self.server.daemon_threads = True
+        self.server.state = state or SMTPServerState()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def state(self) -> SMTPServerState:
+        return self.server.state
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def __enter__(self) -> "LocalSMTPServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
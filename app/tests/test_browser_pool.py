@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from network.browser_pool import BrowserPool, BrowserSession
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_calls = 0
+        self.page_source = ""
+
+    def get(self, url: str):
+        self.page_source = f"<html>{url}</html>"
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Chrome is not needed to check how sessions are leased, reused and recycled
+    pool = BrowserPool(size=2, max_pages=3, lease_timeout=0.2)
+    drivers = []
+
+    def start_session():
+        drivers.append(FakeDriver())
+        return BrowserSession(drivers[-1])
+
+    monkeypatch.setattr(pool, "start_session", start_session)
+    pool.drivers = drivers
+    yield pool
+    pool.shutdown()
+
+
+def render_page(pool: BrowserPool) -> BrowserSession:
+    with pool.session() as browser:
+        browser.pages += 1
+        return browser
+
+
+def test_session_is_reused_until_it_rendered_max_pages(pool):
+    browsers = [render_page(pool) for _ in range(4)]
+
+    assert browsers[0] is browsers[1] is browsers[2]
+    assert browsers[3] is not browsers[0]
+    assert [driver.quit_calls for driver in pool.drivers] == [1, 0]
+
+
+def test_session_that_failed_is_recycled(pool):
+    with pytest.raises(RuntimeError):
+        with pool.session():
+            raise RuntimeError("page crashed")
+
+    browser = render_page(pool)
+    assert pool.drivers[0].quit_calls == 1
+    assert browser.driver is pool.drivers[1]
+
+
+def test_lease_times_out_when_every_session_is_in_use(pool):
+    release = threading.Event()
+    leased = threading.Barrier(3)
+
+    def hold():
+        with pool.session():
+            leased.wait()
+            release.wait(5)
+
+    threads = [threading.Thread(target=hold) for _ in range(pool.size)]
+    for thread in threads:
+        thread.start()
+    leased.wait()
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.session():
+                pass
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert len(pool.drivers) == pool.size
+
+
+def test_shutdown_quits_idle_sessions_and_sessions_in_use_once_released(pool):
+    with pool.session() as in_use:
+        with pool.session() as idle:
+            pass
+        pool.shutdown()
+        assert (in_use.driver.quit_calls, idle.driver.quit_calls) == (0, 1)
+    assert in_use.driver.quit_calls == 1
+
+
+def test_render_returns_the_page_source(pool, host_limits_disabled):
+    pytest.importorskip("selenium")
+    assert pool.render("https://steamdb.info/upcoming/free/") == "<html>https://steamdb.info/upcoming/free/</html>"
+    assert render_page(pool).pages == 2
+
+
+def test_warm_reports_a_browser_that_cannot_start(pool, monkeypatch, caplog):
+    def start_session():
+        raise FileNotFoundError("chromedriver not found")
+
+    monkeypatch.setattr(pool, "start_session", start_session)
+    pool.warm()
+
+    assert pool.idle.empty()
+    assert "chromedriver not found" in caplog.text
@@ -0,0 +1,135 @@
+import http.server
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+from network.host_limits import CircuitBreaker, CircuitOpenError, HostLimits, TokenBucket
+from scrapers.base_scraper import BaseScraper
+
+APP_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StatusRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Answers every request with the status the test sets, and counts the requests that reached it
+    status = 200
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StatusRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StatusRequestHandler.status = 200
+    StatusRequestHandler.requests = 0
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def circuits(database, host_limits_disabled, monkeypatch):
+    monkeypatch.setenv("HTTP_CIRCUIT_FAILURES", "2")
+    monkeypatch.setenv("HTTP_CIRCUIT_COOLDOWN", "0.3")
+
+
+def get(url: str) -> requests.Response:
+    with requests.Session() as session:
+        return BaseScraper.request(session, url)
+
+
+def fail(url: str, times: int):
+    StatusRequestHandler.status = 503
+    for _ in range(times):
+        with pytest.raises(requests.HTTPError):
+            get(url)
+
+
+def test_circuit_opens_after_failures_in_a_row_and_rejects_requests(server_url):
+    fail(server_url, 2)
+
+    StatusRequestHandler.status = 200
+    with pytest.raises(CircuitOpenError):
+        get(server_url)
+    assert StatusRequestHandler.requests == 2
+
+
+def test_circuit_lets_one_trial_through_after_the_cooldown_and_closes_on_success(server_url):
+    fail(server_url, 2)
+    breaker = HostLimits.get_breaker(HostLimits.get_host(server_url))
+    time.sleep(0.3)
+
+    StatusRequestHandler.status = 200
+    assert get(server_url).status_code == 200
+    assert (breaker.state, breaker.failures) == (CircuitBreaker.CLOSED, 0)
+    assert get(server_url).status_code == 200
+
+
+def test_requests_fail_fast_while_the_trial_is_in_flight():
+    breaker = CircuitBreaker("store", failure_threshold=1, cooldown=10)
+    breaker.record_failure(now=0)
+
+    assert not breaker.allow(now=5)
+    assert breaker.allow(now=10)
+    assert not breaker.allow(now=10)
+
+
+def test_failed_trial_opens_the_circuit_again(server_url):
+    fail(server_url, 2)
+    time.sleep(0.3)
+
+    fail(server_url, 1)
+    with pytest.raises(CircuitOpenError):
+        get(server_url)
+    assert StatusRequestHandler.requests == 3
+
+
+def test_missing_page_does_not_count_against_the_host(server_url):
+    StatusRequestHandler.status = 404
+    for _ in range(3):
+        with pytest.raises(requests.HTTPError):
+            get(server_url)
+
+    StatusRequestHandler.status = 200
+    assert get(server_url).status_code == 200
+
+
+def test_open_circuit_is_loaded_by_another_process(server_url, database):
+    fail(server_url, 2)
+
+    # A cron run started meanwhile fails fast instead of trying the host again
+    script = (
+        "from network.host_limits import CircuitOpenError, HostLimits\n"
+        f"try:\n    HostLimits.before_request({server_url!r})\n"
+        "except CircuitOpenError as e:\n    print(e)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=APP_FOLDER, env=os.environ, capture_output=True, text=True, timeout=60
+    )
+    assert result.stdout.startswith(f"Circuit for {HostLimits.get_host(server_url)} is open until"), result.stderr
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    # Four requests past the burst at 20 per second
+    assert time.monotonic() - start >= 0.19
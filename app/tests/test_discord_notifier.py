@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from benchmarks.mock_webhook_server import MockWebhookServer
+from factories.notifier_enums import NotifierEnum
+from factories.notifier_factory import NotifierFactory
+from notifications.base_notifier import NotifierNotConfiguredError
+from notifications.discord_notifier import DiscordNotifier
+
+from .conftest import StoreScraper, create_items
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    def start(count: int = 1, limit: int = 5, reset_after: float = 0.3, max_wait: float = 5) -> MockWebhookServer:
+        server = MockWebhookServer(limit, reset_after).__enter__()
+        servers.append(server)
+        urls = [server.webhook_url(f"webhook-{index}") for index in range(count)]
+        monkeypatch.setenv("DISCORD_WEBHOOK_URL", ",".join(urls))
+        monkeypatch.setenv("DISCORD_MAX_RATE_LIMIT_WAIT", str(max_wait))
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.__exit__()
+
+
+def test_items_are_batched_into_as_few_messages_as_discord_accepts(webhooks):
+    server = webhooks(count=2, limit=10)
+    items = create_items(25)
+
+    delivered = DiscordNotifier().notify({StoreScraper: items})
+
+    assert delivered == items
+    assert len(server.messages) == 2
+    for messages in server.messages.values():
+        assert [len(message["embeds"]) for message in messages] == [10, 10, 5]
+        assert [embed["title"] for message in messages for embed in message["embeds"]] == [item.name for item in items]
+        # Only the first message of a webhook carries the summary
+        assert ["content" in message for message in messages] == [True, False, False]
+
+
+def test_rate_limited_message_is_sent_again_once_the_bucket_resets(webhooks):
+    server = webhooks(limit=5, reset_after=0.3)
+    # Another client used up the bucket of the webhook before this digest
+    route = "/api/webhooks/webhook-0/token"
+    server.server.buckets[route] = (0, time.monotonic() + 0.3)
+    items = create_items(15)
+
+    delivered = DiscordNotifier().notify({StoreScraper: items})
+
+    assert delivered == items
+    assert server.server.rate_limited == 1
+    assert [len(message["embeds"]) for message in server.messages[route]] == [10, 5]
+
+
+def test_items_of_messages_still_rate_limited_after_the_longest_wait_are_not_delivered(webhooks):
+    server = webhooks(limit=1, reset_after=30, max_wait=0.5)
+    items = create_items(25)
+
+    start = time.monotonic()
+    delivered = DiscordNotifier().notify({StoreScraper: items})
+
+    assert time.monotonic() - start < 5
+    assert delivered == items[:10]
+    assert sum(len(messages) for messages in server.messages.values()) == 1
+
+
+def test_notifier_without_webhooks_is_left_out_of_the_run(monkeypatch, caplog):
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "")
+
+    with pytest.raises(NotifierNotConfiguredError):
+        DiscordNotifier()
+    assert NotifierFactory.get_notifiers([NotifierEnum.DISCORD]) == []
+    assert "DISCORD_WEBHOOK_URL is not configured" in caplog.text
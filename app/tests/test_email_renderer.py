@@ -0,0 +1,54 @@
+import datetime
+import email
+import io
+
+from items.error_item import ErrorItem
+from items.scraped_item import ScrapedItem
+from notifications.email_renderer import EmailRenderer
+
+from .conftest import StoreScraper
+
+
+NOW = datetime.datetime(2030, 1, 1)
+
+
+def render_bodies(scraped_data: dict) -> tuple[str, str]:
+    renderer = EmailRenderer(NOW)
+    digest = renderer.group(scraped_data)
+    html_body, text_body = io.StringIO(), io.StringIO()
+    renderer.write_html(digest, html_body)
+    renderer.write_text(digest, text_body)
+    return html_body.getvalue(), text_body.getvalue()
+
+
+def test_message_carries_both_bodies_encoded_into_its_parts():
+    # Enough items for the bodies to be flushed in several blocks, with characters that take several bytes
+    scraped_data = {
+        StoreScraper: [
+            ScrapedItem(scraper=StoreScraper, name=f"Bündle <{index}> 🎁", url=f"https://store/{index}", price=index,
+                        expiration_date="2030-01-03T12:00:00")
+            for index in range(2000)
+        ] + [ErrorItem(scraper=StoreScraper, message="Timeout & retry", code=504)],
+    }
+    headers = {"Subject": "WebHunter Scraping Report", "From": "from@example.com", "To": "to@example.com"}
+
+    message = email.message_from_string(EmailRenderer(NOW).render_message(scraped_data, headers))
+
+    assert message["Subject"] == "WebHunter Scraping Report"
+    assert message["To"] == "to@example.com"
+    assert message.get_content_type() == "multipart/alternative"
+    text_part, html_part = message.get_payload()
+    html_body, text_body = render_bodies(scraped_data)
+    assert text_part.get_content_type() == "text/plain"
+    assert text_part.get_payload(decode=True).decode("utf-8") == text_body
+    assert html_part.get_payload(decode=True).decode("utf-8") == html_body
+    assert "Bündle &lt;1999&gt; 🎁" in html_body
+
+
+def test_item_without_url_is_rendered():
+    item = ScrapedItem(scraper=StoreScraper, name="Bundle", url=None)
+
+    html_body, text_body = render_bodies({StoreScraper: [item]})
+
+    assert "<a href=''>Bundle</a>" in html_body
+    assert "  - Bundle \n" in text_body
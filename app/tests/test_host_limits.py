@@ -0,0 +1,71 @@
+import http.server
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from network.host_limits import HostLimits
+from scrapers.base_scraper import BaseScraper
+
+
+class SlowRequestHandler(http.server.BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_GET(self):
+        with self.lock:
+            type(self).in_flight += 1
+            type(self).max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            type(self).in_flight -= 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    SlowRequestHandler.max_in_flight = 0
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def host_limits(host_limits_disabled, monkeypatch):
+    monkeypatch.setenv("HTTP_HOST_CONCURRENCY", "2")
+
+
+def test_every_request_takes_a_slot_of_its_host(server_url):
+    # Requests of different scrapers, some inside a slot held around a whole target, never exceed the cap
+    def scrape(index: int):
+        with requests.Session() as session:
+            if index % 2:
+                with HostLimits.slot(server_url):
+                    BaseScraper.request(session, f"{server_url}/{index}")
+                    BaseScraper.request(session, f"{server_url}/{index}/next")
+            else:
+                BaseScraper.request(session, f"{server_url}/{index}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(scrape, range(16)))
+
+    assert SlowRequestHandler.max_in_flight == 2
+
+
+def test_a_thread_holding_the_slot_does_not_wait_for_another(server_url, monkeypatch):
+    monkeypatch.setenv("HTTP_HOST_CONCURRENCY", "1")
+    with requests.Session() as session, HostLimits.slot(server_url):
+        assert BaseScraper.request(session, server_url).status_code == 200
+    assert HostLimits.get_semaphore(HostLimits.get_host(server_url)).acquire(blocking=False)
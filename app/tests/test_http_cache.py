@@ -0,0 +1,93 @@
+from http import HTTPStatus
+
+import pytest
+
+import main
+from benchmarks.fixture_server import FixtureServer
+from items.scraped_item import ScrapedItem
+from notifications.base_notifier import BaseNotifier
+from pipeline import PersistStage
+from scrapers.base_scraper import BaseScraper
+
+from .conftest import StoreScraper
+
+
+class OtherStoreScraper(StoreScraper):
+    pass
+
+
+class PartialNotifier(BaseNotifier):
+    # Delivers everything but the items of StoreScraper
+    def notify(self, scraped_data):
+        return [
+            item for scraper_class, items in scraped_data.items() if scraper_class is not StoreScraper for item in items
+        ]
+
+
+@pytest.fixture(autouse=True)
+def http_cache(host_limits_disabled, tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTP_CACHE_FOLDER", str(tmp_path / "cache"))
+    monkeypatch.setattr(BaseScraper, "_http_cache", None)
+    monkeypatch.setattr(BaseScraper, "_http_cache_loaded", False)
+    return BaseScraper.get_http_cache()
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as server:
+        yield server
+
+
+def test_unchanged_page_is_read_from_the_cache(server):
+    url = f"{server.url}/bundles"
+    response = StoreScraper().fetch(url)
+    assert response.status_code == HTTPStatus.OK
+    assert not StoreScraper().listed_partially
+
+    scraper = StoreScraper()
+    cached_response = scraper.fetch(url)
+    assert cached_response.status_code == HTTPStatus.NOT_MODIFIED
+    assert cached_response.content == response.content
+    assert scraper.listed_partially
+
+    server.update("/bundles", "<html>changed</html>")
+    scraper = StoreScraper()
+    response = scraper.fetch(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response.content == b"<html>changed</html>"
+    assert not scraper.listed_partially
+
+
+def test_cache_of_a_scraper_whose_items_failed_is_invalidated(server, http_cache, database, monkeypatch):
+    failing_scraper, other_scraper = StoreScraper(), StoreScraper()
+    failing_scraper.fetch(f"{server.url}/bundles")
+    other_scraper.fetch(f"{server.url}/membership/")
+
+    def fail(stage, items):
+        if any(isinstance(item, ScrapedItem) for item in items):
+            raise RuntimeError("database is locked")
+        return items
+
+    monkeypatch.setattr(PersistStage, "process", fail)
+    item = ScrapedItem(scraper=StoreScraper, name="Bundle", url=f"{server.url}/bundles/1", price=1)
+    main.execute_scrapers([failing_scraper], results=[(failing_scraper, [item], None)])
+
+    # The next run fetches the full page again instead of trusting a 304 for items that were never stored
+    assert http_cache.conditional_headers(f"{server.url}/bundles") == {}
+    assert StoreScraper().fetch(f"{server.url}/bundles").status_code == HTTPStatus.OK
+    assert http_cache.conditional_headers(f"{server.url}/membership/")
+
+
+def test_cache_of_a_scraper_whose_items_went_undelivered_is_invalidated(server, http_cache, database):
+    undelivered_scraper, delivered_scraper = StoreScraper(), OtherStoreScraper()
+    undelivered_scraper.fetch(f"{server.url}/bundles")
+    delivered_scraper.fetch(f"{server.url}/membership/")
+    results = [
+        (scraper, [ScrapedItem(scraper=type(scraper), name="Bundle", url=f"{server.url}/{index}", price=1)], None)
+        for index, scraper in enumerate([undelivered_scraper, delivered_scraper])
+    ]
+
+    main.run([undelivered_scraper, delivered_scraper], [PartialNotifier()], metrics_folder=None, results=results)
+
+    assert http_cache.conditional_headers(f"{server.url}/bundles") == {}
+    assert http_cache.conditional_headers(f"{server.url}/membership/")
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from factories.scraper_factory import ScraperFactory
+from job_queue import DONE, FAILED, JobCoordinator, JobFailedError, JobWorker, to_row
+
+from .conftest import StoreScraper, create_items
+
+
+ITEMS = create_items(3)
+
+
+@pytest.fixture
+def coordinator(database):
+    return JobCoordinator(max_attempts=2, poll_interval=0.05, run_timeout=5, chunk_size=2)
+
+
+def test_job_of_a_worker_that_stopped_renewing_its_lease_is_claimed_again(coordinator, database):
+    run_id = coordinator.enqueue(["store"])
+    job_id, _, _, attempts = database.claim_scrape_job("worker-1", ["store"], 0.2, coordinator.max_attempts)
+    assert attempts == 1
+    assert database.claim_scrape_job("worker-2", ["store"], 0.2, coordinator.max_attempts) is None
+
+    time.sleep(0.3)
+    assert database.claim_scrape_job("worker-2", ["store"], 5, coordinator.max_attempts) == (job_id, run_id, "store", 2)
+    # The first worker comes back too late, its lease and its results are gone
+    assert not database.renew_scrape_job_lease(job_id, "worker-1", 5)
+    assert not database.complete_scrape_job(job_id, "worker-1", [to_row(0, ITEMS[0])], False)
+    rows = [to_row(position, item) for position, item in enumerate(ITEMS)]
+    assert database.complete_scrape_job(job_id, "worker-2", rows, False)
+
+    jobs = coordinator.wait(run_id)
+    assert [(job.state, job.worker, job.attempts) for job in jobs] == [(DONE, "worker-2", 2)]
+    results = list(coordinator.results(jobs, {"store": StoreScraper()}))
+    assert [[item.name for item in items] for _, items, _ in results] == [["Bundle 0", "Bundle 1"], ["Bundle 2"]]
+
+
+def test_job_whose_lease_expired_on_its_last_attempt_fails(coordinator, database):
+    run_id = coordinator.enqueue(["store"])
+    for attempt in range(coordinator.max_attempts):
+        assert database.claim_scrape_job(f"worker-{attempt}", ["store"], 0.1, coordinator.max_attempts)
+        time.sleep(0.2)
+    assert database.claim_scrape_job("worker-3", ["store"], 0.1, coordinator.max_attempts) is None
+
+    jobs = coordinator.wait(run_id)
+    assert [(job.state, job.error) for job in jobs] == [(FAILED, "Lease expired after 2 attempts")]
+    [(_, items, error)] = coordinator.results(jobs, {"store": StoreScraper()})
+    assert items == []
+    assert isinstance(error, JobFailedError)
+
+
+def test_heartbeat_keeps_the_lease_of_a_job_that_outlives_it(coordinator, database, monkeypatch):
+    worker = JobWorker(["store"], lease=0.3, max_attempts=coordinator.max_attempts, name="worker-1")
+    monkeypatch.setattr(ScraperFactory, "get_scraper", staticmethod(lambda scraper: StoreScraper()))
+    scraping = threading.Event()
+
+    def scrape(scraper):
+        scraping.set()
+        scraper.cached_urls.add("https://store/bundles")
+        time.sleep(1)
+        return ITEMS
+
+    monkeypatch.setattr(worker, "scrape", scrape)
+    run_id = coordinator.enqueue(["store"])
+    thread = threading.Thread(target=lambda: worker.run_job(worker.claim()))
+    thread.start()
+    scraping.wait(5)
+    try:
+        # Well past the lease, nobody else may take the job while its worker is alive
+        time.sleep(0.6)
+        assert database.claim_scrape_job("worker-2", ["store"], 5, coordinator.max_attempts) is None
+    finally:
+        thread.join()
+
+    jobs = coordinator.wait(run_id)
+    assert [(job.state, job.worker, job.attempts) for job in jobs] == [(DONE, "worker-1", 1)]
+    # The coordinator learns which cached pages to drop should the items go undelivered
+    scraper = StoreScraper()
+    list(coordinator.results(jobs, {"store": scraper}))
+    assert scraper.cached_urls == {"https://store/bundles"}
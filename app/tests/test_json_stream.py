@@ -0,0 +1,56 @@
+import json
+import random
+
+import pytest
+
+from parsing.json_stream import iter_array_items
+
+
+def split(text: str, size: int) -> list[bytes]:
+    data = text.encode("utf-8")
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+PAYLOADS = [
+    '{"pickandmix":[1.5,2]}',
+    '{"pickandmix": [ -12.75e-3 , 1E+2, 0, true, false, null ] }',
+    '{"other": {"pickandmix": [9]}, "list": [1, [2, "]"]], "text": "a \\" } ] b", "pickandmix": [{"name": "x"}]}',
+    '{"pickandmix":[{"name":"Caf\\u00e9 ☃ \U0001F3AE","price":12.99,"tags":["a","b"]},{"name":"Second"}],"n":1}',
+    '{"pickandmix": []}',
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 6, 9, 64])
+def test_chunked_input_matches_json_loads(payload, size):
+    assert list(iter_array_items(split(payload, size), "pickandmix")) == json.loads(payload)["pickandmix"]
+
+
+def test_random_chunk_boundaries():
+    generator = random.Random(7)
+    for _ in range(500):
+        items = [
+            generator.choice([
+                round(generator.uniform(-1000, 1000), generator.randint(0, 6)),
+                generator.randint(-10 ** 6, 10 ** 6),
+                generator.choice([True, False, None]),
+                {"name": "item é", "price": generator.uniform(0, 50)},
+            ])
+            for _ in range(generator.randint(0, 8))
+        ]
+        payload = json.dumps({"before": [1.25, {"x": "}"}], "pickandmix": items, "after": 3.5})
+        data = payload.encode("utf-8")
+        cuts = sorted(generator.sample(range(1, len(data)), min(len(data) - 1, generator.randint(1, 20))))
+        chunks = [data[start:end] for start, end in zip([0, *cuts], [*cuts, len(data)])]
+        assert list(iter_array_items(chunks, "pickandmix")) == items
+
+
+@pytest.mark.parametrize("payload", ['{}', '{"other": [1, 2]}', '{"pickandmixes": []}'])
+def test_missing_key_raises(payload):
+    with pytest.raises(KeyError):
+        list(iter_array_items(split(payload, 3), "pickandmix"))
+
+
+def test_value_that_is_not_an_array_raises():
+    with pytest.raises(ValueError):
+        list(iter_array_items(split('{"pickandmix": {"name": "x"}}', 4), "pickandmix"))
@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from items.item_batch import ItemBatch
+from maintenance import AUTO_VACUUM_INCREMENTAL, Maintenance
+
+from .conftest import create_items
+
+
+def test_prunes_expired_rows_in_chunks_and_archives_them(database, tmp_path):
+    database.add_scraped_items(create_items(25, price=1.0, expiration_date="2000-01-01T00:00:00"))
+    database.add_scraped_items(create_items(5, price=1.0, expiration_date="2999-01-01T00:00:00"))
+
+    report = Maintenance(database, archive_folder=str(tmp_path / "archive"), chunk_size=10, pause=0).run()
+
+    assert (report.archived, report.deleted) == (25, 25)
+    assert database.conn.execute("SELECT COUNT(*) FROM scraped_items;").fetchone()[0] == 5
+    [archive] = (tmp_path / "archive").iterdir()
+    with gzip.open(archive, "rt", encoding="utf-8") as lines:
+        assert {json.loads(line)["expiration_date"] for line in lines} == {"2000-01-01T00:00:00"}
+
+
+def test_full_vacuum_is_opt_in(database):
+    database.add_scraped_items(create_items(50, price=1.0, expiration_date="2000-01-01T00:00:00"))
+    auto_vacuum = lambda: database.conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+
+    report = Maintenance(database, archive_folder=None, pause=0).run()
+    assert not report.full_vacuum
+    assert auto_vacuum() != AUTO_VACUUM_INCREMENTAL
+
+    report = Maintenance(database, archive_folder=None, pause=0).run(full_vacuum=True)
+    assert report.full_vacuum
+    assert auto_vacuum() == AUTO_VACUUM_INCREMENTAL
+
+
+def test_delivery_of_content_scraped_again_meanwhile_is_kept(database, monkeypatch):
+    orphaned, rescraped = create_items(2, price=1.0, expiration_date="2999-01-01T00:00:00")
+    database.record_deliveries([(orphaned, "Notifier"), (rescraped, "Notifier")])
+    delete_orphan_deliveries = Maintenance.delete_orphan_deliveries
+
+    def scrape_again_first(conn, orphans):
+        # A scraper stores the content between the read of the orphans and their deletion
+        conn.executemany(
+            """
+            INSERT INTO scraped_items (name, scraper, url, price, expiration_date, expires_at, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            ItemBatch.from_items([rescraped]).rows(),
+        )
+        return delete_orphan_deliveries(conn, orphans)
+
+    monkeypatch.setattr(Maintenance, "delete_orphan_deliveries", staticmethod(scrape_again_first))
+    report = Maintenance(database, archive_folder=None, pause=0).run(vacuum=False)
+
+    assert report.deliveries_deleted == 1
+    assert database.get_deliveries([orphaned, rescraped], ["Notifier"]) == {(rescraped.content_hash, "Notifier")}
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import main
+from notifications.base_notifier import BaseNotifier
+
+from .conftest import StoreScraper, create_items
+
+
+class SlowNotifier(BaseNotifier):
+    def __init__(self):
+        self.release = threading.Event()
+
+    def notify(self, scraped_data):
+        self.release.wait(5)
+        return None
+
+
+def wait_for_deliveries(database, items, notifier_names, count):
+    deadline = time.monotonic() + 5
+    while len(deliveries := database.get_deliveries(items, notifier_names)) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return deliveries
+
+
+def test_deliveries_of_a_notifier_that_timed_out_are_recorded_once_it_finishes(database):
+    items = create_items(1)
+    notifier = SlowNotifier()
+
+    undelivered = main.execute_notifiers([notifier], {StoreScraper: items}, timeout=0.1)
+    assert undelivered == {items[0].content_hash}
+    assert not database.get_deliveries(items, ["SlowNotifier"])
+
+    notifier.release.set()
+    assert wait_for_deliveries(database, items, ["SlowNotifier"], 1) == {(items[0].content_hash, "SlowNotifier")}
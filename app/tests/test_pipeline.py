@@ -0,0 +1,112 @@
+import threading
+import time
+
+import main
+from pipeline import ItemPipeline, PipelineStage, ScraperRunner
+
+from .conftest import StoreScraper, create_items
+
+
+class CountingScraper(StoreScraper):
+    def __init__(self, count: int, delay: float = 0):
+        super().__init__()
+        self.count = count
+        self.delay = delay
+        self.produced = 0
+
+    def scrape_iter(self):
+        time.sleep(self.delay)
+        for item in create_items(self.count, scraper=type(self)):
+            self.produced += 1
+            yield item
+
+
+class SlowScraper(CountingScraper):
+    pass
+
+
+class FailingScraper(CountingScraper):
+    def scrape_iter(self):
+        yield from super().scrape_iter()
+        raise ValueError("page layout changed")
+
+
+class StuckScraper(StoreScraper):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def scrape_iter(self):
+        self.release.wait(5)
+        return iter(())
+
+
+class RecordingStage(PipelineStage):
+    def __init__(self, keep: bool = True):
+        self.keep = keep
+        self.calls = []
+
+    def process(self, items):
+        self.calls.append(items)
+        return items if self.keep else []
+
+
+def test_items_reach_the_pipeline_in_chunks():
+    scraper = CountingScraper(7)
+
+    results = list(ScraperRunner([scraper], max_workers=1, timeout=5, chunk_size=3).run())
+
+    assert [len(items) for _, items, _ in results] == [3, 3, 1]
+    assert all(error is None for _, _, error in results)
+
+
+def test_items_yielded_before_a_failure_are_delivered_with_the_error():
+    scraper = FailingScraper(4)
+
+    results = list(ScraperRunner([scraper], max_workers=1, timeout=5, chunk_size=3).run())
+
+    assert [len(items) for _, items, _ in results] == [3, 1, 0]
+    assert isinstance(results[-1][2], ValueError)
+
+
+def test_scraper_waits_for_a_slow_consumer():
+    scraper = CountingScraper(1000)
+    runner = ScraperRunner([scraper], max_workers=1, timeout=5, chunk_size=1)
+    results = runner.run()
+
+    next(results)
+    time.sleep(0.3)
+    # The queue is full, the worker holds one more chunk while it waits for room
+    assert scraper.produced <= runner.events.maxsize + 2
+    assert sum(len(items) for _, items, _ in results) == 999
+    assert scraper.produced == 1000
+
+
+def test_stuck_scraper_times_out_without_holding_back_the_others():
+    stuck, scraper = StuckScraper(), CountingScraper(2)
+
+    started = time.monotonic()
+    results = list(ScraperRunner([stuck, scraper], max_workers=2, timeout=0.3, chunk_size=10).run())
+    stuck.release.set()
+
+    assert time.monotonic() - started < 2
+    assert [(result_scraper, len(items)) for result_scraper, items, _ in results] == [(scraper, 2), (stuck, 0)]
+    assert isinstance(results[-1][2], TimeoutError)
+    assert "timed out after 0.3 seconds" in str(results[-1][2])
+
+
+def test_scraped_data_follows_the_scraper_order_not_the_completion_order(database):
+    slow, fast = SlowScraper(2, delay=0.2), CountingScraper(3)
+
+    scraped_data = main.execute_scrapers([slow, fast], max_workers=2, timeout=5)
+
+    assert list(scraped_data) == [SlowScraper, CountingScraper]
+    assert [len(items) for items in scraped_data.values()] == [2, 3]
+
+
+def test_pipeline_stops_once_a_stage_drops_every_item():
+    dropping, after = RecordingStage(keep=False), RecordingStage()
+
+    assert ItemPipeline([dropping, after]).process(create_items(2)) == []
+    assert len(dropping.calls) == 1
+    assert after.calls == []
@@ -0,0 +1,99 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from scheduler import ScheduleEntry, Scheduler
+
+
+class RecordingRun:
+    def __init__(self):
+        self.runs = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, scraper_enums):
+        self.started.set()
+        self.release.wait(5)
+        self.runs.append(scraper_enums)
+
+
+@pytest.fixture
+def run():
+    return RecordingRun()
+
+
+@pytest.fixture
+def signal_handlers():
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+def run_at(scheduler: Scheduler, now: float):
+    scheduler.run_due(now)
+    for future in set(scheduler.in_flight.values()):
+        future.result(5)
+
+
+def test_every_scraper_runs_at_its_own_interval(run, monkeypatch):
+    monkeypatch.setenv("SCRAPER_INTERVAL_STEAM", "30")
+    entries = [ScheduleEntry.from_env(name, interval=10, jitter=0) for name in ("epic", "steam")]
+    scheduler = Scheduler(entries, run)
+
+    for now in range(0, 70, 10):
+        run_at(scheduler, now)
+    scheduler.shutdown()
+
+    assert run.runs == [["epic", "steam"], ["epic"], ["epic"], ["epic", "steam"], ["epic"], ["epic"], ["epic", "steam"]]
+
+
+def test_runs_are_spread_over_the_jitter_window():
+    entry = ScheduleEntry("epic", interval=10, jitter=5)
+
+    next_runs = set()
+    for _ in range(50):
+        entry.reschedule(100)
+        next_runs.add(entry.next_run)
+
+    assert all(110 <= next_run <= 115 for next_run in next_runs)
+    assert len(next_runs) > 1
+
+
+def test_scraper_still_in_flight_is_skipped(run):
+    scheduler = Scheduler([ScheduleEntry("epic", interval=10, jitter=0)], run)
+    run.release.clear()
+
+    scheduler.run_due(0)
+    assert run.started.wait(5)
+    scheduler.run_due(10)
+    run.release.set()
+    scheduler.shutdown()
+
+    assert run.runs == [["epic"]]
+    assert scheduler.entries[0].next_run == 20
+
+
+def test_sigterm_during_a_run_lets_it_finish_and_stops(run, signal_handlers):
+    scheduler = Scheduler([ScheduleEntry("epic", interval=0.05, jitter=0)], run)
+    scheduler.install_signal_handlers()
+    run.release.clear()
+
+    def terminate_during_run():
+        run.started.wait(5)
+        os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(0.2)
+        run.release.set()
+
+    threading.Thread(target=terminate_during_run, daemon=True).start()
+    started = time.monotonic()
+    scheduler.run_forever()
+
+    # The interrupted run completed before the scheduler returned, and no run was scheduled after the signal
+    assert scheduler.stopping.is_set()
+    assert run.runs == [["epic"]]
+    assert time.monotonic() - started < 2
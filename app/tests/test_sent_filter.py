@@ -0,0 +1,45 @@
+import pytest
+
+from pipeline import DedupStage
+from sent_filter import SentItemsFilter, delivery_key
+from sqlitedb import SQLiteDB
+
+from .conftest import create_items
+
+
+ITEMS = create_items(3)
+
+
+@pytest.fixture
+def load_filter(database, monkeypatch):
+    def load(mode: str):
+        monkeypatch.setenv("SENT_FILTER", mode)
+        SentItemsFilter.clear()
+        database.record_deliveries([(ITEMS[0], "Notifier")])
+        return SentItemsFilter.get(database.conn)
+
+    yield load
+    SentItemsFilter.clear()
+
+
+@pytest.mark.parametrize("mode", ["bloom", "set"])
+def test_items_missing_from_the_filter_are_new_without_a_lookup(load_filter, monkeypatch, mode):
+    load_filter(mode)
+    looked_up = []
+    filter_already_sent = SQLiteDB.filter_already_sent
+
+    def record_lookup(db, items, notifiers=None):
+        looked_up.extend(items)
+        return filter_already_sent(db, items, notifiers)
+
+    monkeypatch.setattr(SQLiteDB, "filter_already_sent", record_lookup)
+
+    assert DedupStage(["Notifier"]).process(ITEMS) == ITEMS[1:]
+    assert all(item is ITEMS[0] for item in looked_up)
+
+
+def test_false_positive_of_the_bloom_filter_is_still_notified(load_filter):
+    # A key that collides with the one of a delivered item, but was never delivered itself
+    load_filter("bloom").add(delivery_key(ITEMS[1].content_hash, "Notifier"))
+
+    assert DedupStage(["Notifier"]).process(ITEMS) == ITEMS[1:]
@@ -0,0 +1,99 @@
+import smtplib
+import socket
+
+import pytest
+
+from notifications import smtp_delivery
+from notifications.smtp_delivery import OutgoingEmail, SMTPDeliveryEngine
+from notifications.smtp_parameters import SMTPParameters
+from tests.smtp_server import LocalSMTPServer
+
+
+@pytest.fixture
+def smtp_server():
+    with LocalSMTPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(smtp_delivery.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def create_parameters(port: int, password: str = "secret") -> SMTPParameters:
+    return SMTPParameters(
+        host="127.0.0.1",
+        port=port,
+        username="user@example.com",
+        password=password,
+        to=["a@example.com", "b@example.com"],
+        starttls=False,
+        timeout=5,
+    )
+
+
+def create_email(*recipients: str) -> OutgoingEmail:
+    return OutgoingEmail(recipients=list(recipients), message="Subject: test\r\n\r\nbody\r\n")
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_sends_every_email_over_one_connection(smtp_server, pipelining):
+    smtp_server.state.pipelining = pipelining
+    with SMTPDeliveryEngine(create_parameters(smtp_server.port)) as engine:
+        results = engine.send([create_email("a@example.com"), create_email("b@example.com", "c@example.com")])
+
+    assert all(result.delivered for result in results)
+    assert smtp_server.state.connections == 1
+    assert [recipients for _, recipients, _ in smtp_server.state.messages] == [
+        ["a@example.com"],
+        ["b@example.com", "c@example.com"],
+    ]
+
+
+def test_reports_refused_recipients(smtp_server):
+    smtp_server.state.refused = {"b@example.com"}
+    with SMTPDeliveryEngine(create_parameters(smtp_server.port)) as engine:
+        [partially_refused, refused] = engine.send([
+            create_email("a@example.com", "b@example.com"),
+            create_email("b@example.com"),
+        ])
+
+    assert partially_refused.delivered
+    assert partially_refused.refused["b@example.com"][0] == 550
+    assert isinstance(refused.error, smtplib.SMTPRecipientsRefused)
+    assert len(smtp_server.state.messages) == 1
+
+
+def test_authentication_failure_is_reported_not_raised(smtp_server, sleeps):
+    with SMTPDeliveryEngine(create_parameters(smtp_server.port, password="wrong")) as engine:
+        [result] = engine.send([create_email("a@example.com")])
+
+    assert isinstance(result.error, smtplib.SMTPAuthenticationError)
+    assert engine.server is None
+    assert sleeps == []
+
+
+def test_reconnects_after_disconnect(smtp_server, sleeps):
+    smtp_server.state.drops = 1
+    with SMTPDeliveryEngine(create_parameters(smtp_server.port), backoff_factor=0.5) as engine:
+        [result] = engine.send([create_email("a@example.com")])
+
+    assert result.delivered
+    assert smtp_server.state.connections == 2
+    assert len(smtp_server.state.messages) == 1
+    assert sleeps == [0.5]
+
+
+def test_gives_up_with_backoff_when_unreachable(sleeps):
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+
+    with SMTPDeliveryEngine(create_parameters(port), max_attempts=3, backoff_factor=1) as engine:
+        [result] = engine.send([create_email("a@example.com")])
+
+    assert isinstance(result.error, OSError)
+    assert not isinstance(result.error, smtplib.SMTPException)
+    assert sleeps == [1, 2]
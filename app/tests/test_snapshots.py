@@ -0,0 +1,68 @@
+from dataclasses import replace
+
+import pytest
+
+import main
+from items.scraped_item import ScrapedItem
+from pipeline import PersistStage, SnapshotStage
+from scrapers.base_scraper import BaseScraper
+from snapshots import ScraperSnapshots
+
+from .conftest import StoreScraper, create_items
+
+
+@pytest.fixture
+def snapshots(database):
+    ScraperSnapshots.clear()
+    yield
+    ScraperSnapshots.clear()
+
+
+def priced_items(*prices: float) -> list[ScrapedItem]:
+    return [replace(item, price=price) for item, price in zip(create_items(len(prices)), prices)]
+
+
+def execute(scraper: BaseScraper, chunks: list[list[ScrapedItem]]) -> tuple[dict, SnapshotStage]:
+    snapshot_stage = SnapshotStage()
+    scraped_data = main.execute_scrapers(
+        [scraper],
+        snapshot_stage=snapshot_stage,
+        results=[(scraper, chunk, None) for chunk in chunks],
+    )
+    return scraped_data, snapshot_stage
+
+
+def test_unchanged_items_are_dropped_and_removed_ones_forgotten(snapshots, database):
+    scraper = StoreScraper()
+    scraped_data, snapshot_stage = execute(scraper, [priced_items(1, 2, 3)])
+    assert len(scraped_data[StoreScraper]) == 3
+    snapshot_stage.save(set())
+
+    scraped_data, snapshot_stage = execute(scraper, [priced_items(1, 5)])
+    assert [item.price for item in scraped_data[StoreScraper]] == [5]
+    snapshot_stage.save(set())
+    assert sorted(price for price, _ in database.get_snapshot("StoreScraper").values()) == [1, 5]
+
+
+def test_items_of_a_failed_chunk_are_kept_out_of_the_snapshot(snapshots, database, monkeypatch):
+    scraper = StoreScraper()
+    process = PersistStage.process
+    calls = []
+
+    def fail_first_chunk(stage, items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return process(stage, items)
+
+    monkeypatch.setattr(PersistStage, "process", fail_first_chunk)
+    items = priced_items(1, 2, 3, 4)
+    scraped_data, snapshot_stage = execute(scraper, [items[:2], items[2:]])
+    snapshot_stage.save(set())
+
+    assert sorted(price for price, _ in database.get_snapshot("StoreScraper").values()) == [3, 4]
+    # The next run sees the items of the failed chunk as new again
+    monkeypatch.setattr(PersistStage, "process", process)
+    ScraperSnapshots.clear()
+    scraped_data, _ = execute(scraper, [items])
+    assert [item.price for item in scraped_data[StoreScraper]] == [1, 2]
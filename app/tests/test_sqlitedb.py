@@ -0,0 +1,21 @@
+import logging
+
+import pytest
+
+from sqlitedb import SQLiteDB
+
+
+@pytest.mark.parametrize(
+    "synchronous, expected, warned",
+    [("full", 2, False), ("EXTRA", 3, False), ("NORMAL; DROP TABLE scraped_items", 1, True), ("fast", 1, True)],
+)
+def test_synchronous_mode_is_validated(database, monkeypatch, caplog, synchronous, expected, warned):
+    monkeypatch.setenv("DATABASE_SYNCHRONOUS", synchronous)
+    SQLiteDB.close()
+
+    with caplog.at_level(logging.WARNING, logger="sqlitedb"):
+        db = SQLiteDB()
+
+    assert db.conn.execute("PRAGMA synchronous;").fetchone()[0] == expected
+    assert db.conn.execute("SELECT COUNT(*) FROM scraped_items;").fetchone()[0] == 0
+    assert ("Invalid DATABASE_SYNCHRONOUS" in caplog.text) == warned
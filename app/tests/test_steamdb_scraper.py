@@ -0,0 +1,24 @@
+from benchmarks.fixtures import steamdb_rendered_page, steamdb_row
+from scrapers.steamdb_scraper import SteamDBScraper
+
+
+def test_free_weekends_are_skipped():
+    items = SteamDBScraper().parse_response(steamdb_rendered_page(8))
+
+    assert [item.name for item in items] == [f"Free Game {index}" for index in (0, 1, 2, 4, 5, 6)]
+    assert items[0].url == "https://store.steampowered.com/app/1000/"
+    assert items[0].expiration_date == "2030-01-08T17:00:00+00:00"
+
+
+def test_game_named_after_a_weekend_is_kept():
+    promotion = {
+        "appid": 42,
+        "name": "Weekend Warriors",
+        "type": "Keep",
+        "start": "2030-01-01T17:00:00+00:00",
+        "end": "2030-01-08T17:00:00+00:00",
+    }
+
+    items = SteamDBScraper().parse_response(f"<table>{steamdb_row(promotion)}</table>")
+
+    assert [item.name for item in items] == ["Weekend Warriors"]